@@ -0,0 +1,61 @@
+"""
+Realistic input corpora shared by the benchmark scripts
+"""
+
+import json
+import uuid
+
+SHORT_CHATS = [
+    "I'm worried about my diet and want to eat healthier",
+    "How often should I shower?",
+    "My friends are pressuring me to try smoking, what should I do?",
+    "I want to start exercising but don't know where to begin",
+    "Is it normal to feel tired all the time?",
+    "Someone at school is bullying me, what should I do?",
+    "How can I grow up healthy and confident?",
+    "What are some good snacks?",
+    "How do I talk to my parents about puberty?",
+    "What should I do if I get hurt playing sports?",
+]
+
+_PARAGRAPH = (
+    "Eating a balanced diet is one of the best things you can do for your growing body. "
+    "Try to fill half your plate with fruits and vegetables, a quarter with lean protein such as "
+    "beans, eggs, fish or chicken, and a quarter with whole grains like brown rice or oats. "
+    "Drinking plenty of water keeps you focused at school and helps during sports. "
+    "It's okay to enjoy treats sometimes - the goal is balance, not perfection. "
+    "If you ever feel worried about food or your weight, talk to a parent, school nurse or doctor. "
+)
+
+LONG_ANSWERS = [
+    _PARAGRAPH * 6,
+    (_PARAGRAPH + "Getting enough sleep, around 8 to 10 hours a night, also supports healthy growth. ") * 5,
+    ("Regular exercise improves mood, sleep and concentration. " * 20) + _PARAGRAPH * 2,
+]
+
+def build_mcq_items(count: int = 20, topic: str = "nutrition", difficulty: str = "medium") -> list:
+    """Build `count` valid MCQ dictionaries as Gemini would return them"""
+    items = []
+    for i in range(count):
+        correct = "ABCD"[i % 4]
+        items.append({
+            "id": str(uuid.UUID(int=i + 1)),
+            "topic": topic,
+            "difficulty": difficulty,
+            "question": f"Which of these foods is the best source of nutrient number {i} for a growing teen?",
+            "options": [
+                {"label": label, "text": f"Food choice {label}{i}", "is_correct": label == correct}
+                for label in "ABCD"
+            ],
+            "explanation": f"Option {correct} provides the most of this nutrient per serving while staying low in added sugar.",
+            "distractor_rationale": [
+                f"Option {label} is less nutrient-dense than the correct choice." for label in "ABCD"
+            ],
+            "source": "GENERATED",
+            "estimated_confidence": 0.85,
+        })
+    return items
+
+def build_mcq_response(count: int = 20) -> str:
+    """A Gemini-style response: a fenced JSON array of `count` MCQs"""
+    return "```json\n" + json.dumps(build_mcq_items(count), indent=2) + "\n```"
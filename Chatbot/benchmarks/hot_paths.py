@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the per-request CPU hot paths.
+
+Records ops/s and peak allocated bytes per call for each case. Absolute
+ops/s swing with the machine and whatever else it is running, so each case's
+rounds are interleaved with rounds of a fixed pure-Python calibration
+workload, and the gate compares the case's speed relative to that
+calibration against the same ratio in a stored baseline; it exits non-zero
+when a case got slower relative to calibration by more than the allowed
+margin.
+
+    python benchmarks/hot_paths.py                  # compare with baseline
+    python benchmarks/hot_paths.py --save-baseline  # record a new baseline
+    python benchmarks/hot_paths.py -k filter        # only matching cases
+
+test_hot_paths.py runs the same comparison under pytest.
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-placeholder")
+
+from benchmarks.corpora import SHORT_CHATS, LONG_ANSWERS, build_mcq_items, build_mcq_response
+from services.content_filter import ContentFilter
+from services.gemini_service import GeminiService
+from utils.cache import CacheManager
+from utils.logger import logger
+from models.chat_models import ChatResponse
+from mcq import MCQService, MCQItem, MCQModerator, Difficulty
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+CALIBRATION_TEXT = " ".join(SHORT_CHATS + LONG_ANSWERS)
+
+def calibration():
+    """Fixed interpreter-bound work (tokenizing, counting, formatting) the cases are measured against"""
+    counts = {}
+    for word in re.findall(r"[a-z']+", CALIBRATION_TEXT.lower()):
+        counts[word] = counts.get(word, 0) + 1
+    json.dumps(sorted(counts.items()))
+
+def build_cases(workdir: str) -> dict:
+    """Return {name: (callable, calls_per_invocation)}"""
+    content_filter = ContentFilter()
+    gemini_service = GeminiService()
+    cache_manager = CacheManager()
+    mcq_service = MCQService(gemini_service, os.path.join(workdir, "bench_mcq.db"))
+
+    mcq_response = build_mcq_response(20)
+    mcq_json = mcq_service.extract_json_from_response(mcq_response)
+    mcq_dicts = build_mcq_items(20)
+    mcq_items = [MCQItem(**data) for data in mcq_dicts]
+    moderator = MCQModerator(content_filter)
+
+    def filter_short_uncached():
+        for message in SHORT_CHATS:
+            content_filter._scan(message)
+
+    def filter_short_cached():
+        for message in SHORT_CHATS:
+            content_filter.is_safe_content(message)
+
+    def filter_long_response():
+        for answer in LONG_ANSWERS:
+            content_filter.filter_response(answer)
+
+    def identify_topic():
+        for message in SHORT_CHATS:
+            gemini_service.identify_topic(message)
+
+    def topic_prompt():
+        for message in SHORT_CHATS:
+            gemini_service.get_topic_prompt("nutrition", message)
+
+    def cache_key():
+        for message in SHORT_CHATS:
+            cache_manager._generate_cache_key(message)
+
+    def extract_json():
+        mcq_service.extract_json_from_response(mcq_response)
+
+    def parse_mcqs():
+        mcq_service.parse_and_validate_mcqs(mcq_json, "nutrition", Difficulty.MEDIUM)
+
+    def moderate_mcqs():
+        content_filter.clear_cache()
+        moderator.moderate(mcq_items)
+
+    def build_mcq_item():
+        for data in mcq_dicts:
+            MCQItem(**data)
+
+    def build_chat_response():
+        for answer in LONG_ANSWERS:
+            ChatResponse(response=answer, is_safe=True, filtered=False, processing_time=0.01,
+                         topic="nutrition", follow_up_questions=SHORT_CHATS[:3])
+
+    return {
+        "content_filter.is_safe_content[uncached]": (filter_short_uncached, len(SHORT_CHATS)),
+        "content_filter.is_safe_content[cached]": (filter_short_cached, len(SHORT_CHATS)),
+        "content_filter.filter_response[long]": (filter_long_response, len(LONG_ANSWERS)),
+        "gemini.identify_topic": (identify_topic, len(SHORT_CHATS)),
+        "gemini.get_topic_prompt": (topic_prompt, len(SHORT_CHATS)),
+        "cache._generate_cache_key": (cache_key, len(SHORT_CHATS)),
+        "mcq.extract_json_from_response[20]": (extract_json, 1),
+        "mcq.parse_and_validate_mcqs[20]": (parse_mcqs, 1),
+        "mcq.moderate[20]": (moderate_mcqs, 1),
+        "pydantic.MCQItem": (build_mcq_item, len(mcq_dicts)),
+        "pydantic.ChatResponse": (build_chat_response, len(LONG_ANSWERS)),
+    }
+
+def loops_for(fn, min_time: float) -> int:
+    """Warm fn up and return how many loops take at least min_time"""
+    fn()
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        if time.perf_counter() - start >= min_time:
+            return loops
+        loops *= 2
+
+def timed(fn, loops: int) -> float:
+    start = time.perf_counter()
+    for _ in range(loops):
+        fn()
+    return time.perf_counter() - start
+
+def measure(fn, calls: int, min_time: float, rounds: int) -> dict:
+    """
+    Time fn and return ops/s (best round), ops/s relative to the calibration
+    workload timed in alternating rounds, and peak allocated bytes per call
+    """
+    loops = loops_for(fn, min_time)
+    calibration_loops = loops_for(calibration, min_time)
+
+    # Each round times fn right next to the calibration, so a slow patch on
+    # the machine slows both; the median round ratio ignores one-off spikes
+    best = float("inf")
+    ratios = []
+    for _ in range(rounds):
+        elapsed = timed(fn, loops)
+        calibration_elapsed = timed(calibration, calibration_loops)
+        best = min(best, elapsed)
+        ratios.append((loops / elapsed) / (calibration_loops / calibration_elapsed))
+    ops_per_sec = loops * calls / best
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base, _ = tracemalloc.get_traced_memory()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "ops_per_sec": ops_per_sec,
+        "relative": statistics.median(ratios) * calls,
+        "peak_bytes_per_call": max(peak - base, 0) / calls,
+    }
+
+def load_baseline(path: str = BASELINE_PATH) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def baseline_ratio(result: dict, baseline_case: Optional[dict]) -> Optional[float]:
+    """Speed relative to calibration vs the baseline's (below 1 is slower), or None without a baseline"""
+    if not baseline_case or "relative" not in baseline_case:
+        return None
+    return result["relative"] / baseline_case["relative"]
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="CPU hot path micro-benchmarks")
+    parser.add_argument("-k", dest="keyword", default="", help="only run cases containing this text")
+    parser.add_argument("--margin", type=float, default=0.25,
+                        help="allowed slowdown relative to calibration vs baseline before failing (default 0.25 = 25%%)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimum seconds per round")
+    parser.add_argument("--rounds", type=int, default=7)
+    args = parser.parse_args()
+
+    # Benchmark the CPU work, not log file I/O
+    logger.setLevel(logging.WARNING)
+
+    baseline = load_baseline(args.baseline)
+
+    results = {}
+    regressions = []
+
+    with tempfile.TemporaryDirectory() as workdir:
+        cases = build_cases(workdir)
+        print(f"{'case':48} {'ops/s':>14} {'peak B/call':>12} {'vs baseline':>12}")
+        print("-" * 90)
+
+        for name, (fn, calls) in cases.items():
+            if args.keyword and args.keyword not in name:
+                continue
+
+            result = measure(fn, calls, args.min_time, args.rounds)
+            results[name] = result
+
+            change = ""
+            ratio = baseline_ratio(result, baseline.get(name))
+            if ratio is not None and not args.save_baseline:
+                change = f"{(ratio - 1) * 100:+.1f}%"
+                if ratio < 1 - args.margin:
+                    regressions.append(name)
+                    change += " ❌"
+
+            print(f"{name:48} {result['ops_per_sec']:>14,.0f} {result['peak_bytes_per_call']:>12,.0f} {change:>12}")
+
+    if args.save_baseline:
+        # Cases filtered out with -k keep their previous baseline
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"\n✅ Baseline saved to {args.baseline}")
+        return 0
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} case(s) slower than baseline (relative to calibration) by more than {args.margin:.0%}:")
+        for name in regressions:
+            print(f"   - {name}")
+        return 1
+
+    print("\n✅ No regressions against baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
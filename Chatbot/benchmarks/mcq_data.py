@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Synthetic question bank generator for MCQ database benchmarks.
+
+Rows are written straight into the questions table in large transactions
+(bypassing MCQItem validation), with their near-duplicate signatures unless
+signatures=False, spread across the nine health topics and three
+difficulties with increasing created_at timestamps. Besides a few common
+words, each question names terms drawn from a Zipf-distributed
+vocabulary, so full-text searches hit realistic posting-list sizes.
+
+Attempts are skewed the way real traffic is. A minority of users give most
+of the answers, and popular questions are answered far more often than the
+long tail; both follow Zipf distributions. Timestamps advance steadily over
+`days` days up to now. Attempts are bulk-loaded with the rollup insert
+trigger dropped, and the rollups are rebuilt once at the end.
+
+    python benchmarks/mcq_data.py bench.db --questions 1000000 --attempts 10000000
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcq import MCQDatabase, Difficulty
+from mcq.database import question_hash
+from mcq.similarity import NearDuplicateIndex, minhash, similarity_tokens, topic_key
+
+TOPICS = ["nutrition", "sanitation", "health", "substance_abuse", "healthy_lifestyle",
+          "reproductive_health", "hiv_prevention", "injuries_violence", "growing_healthy"]
+DIFFICULTIES = [difficulty.value for difficulty in Difficulty]
+
+WORDS = ("water sleep protein fruit vegetables exercise stress friends hygiene teeth breakfast "
+         "vitamins habits safety helmet doctor puberty growth energy screen posture calcium iron "
+         "fiber snacks sugar sports stretching rest mood confidence").split()
+
+def build_vocabulary(size: int = 20000, seed: int = 3) -> list:
+    """`size` distinct pronounceable pseudo-words, most common first"""
+    rng = random.Random(seed)
+    vocabulary = []
+    seen = set()
+    while len(vocabulary) < size:
+        word = "".join(rng.choice("bcdfghklmnprstvz") + rng.choice("aeiou") for _ in range(rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            vocabulary.append(word)
+    return vocabulary
+
+VOCABULARY = build_vocabulary()
+VOCABULARY_WEIGHTS = list(itertools.accumulate(1 / rank for rank in range(1, len(VOCABULARY) + 1)))
+
+def vocabulary_terms(rng: random.Random, count: int) -> list:
+    """`count` terms drawn with Zipf (s=1) frequencies"""
+    return rng.choices(VOCABULARY, cum_weights=VOCABULARY_WEIGHTS, k=count)
+
+def signature_row(row: tuple) -> tuple:
+    """question_signatures row for a question_row()"""
+    answer = next(option["text"] for option in json.loads(row[4]) if option["is_correct"])
+    signature = minhash(similarity_tokens(row[3], answer))
+    return row[0], topic_key(row[1]), NearDuplicateIndex.to_blob(signature)
+
+def question_row(rng: random.Random, index: int, created_at: datetime) -> tuple:
+    topic = TOPICS[index % len(TOPICS)]
+    difficulty = DIFFICULTIES[(index // len(TOPICS)) % len(DIFFICULTIES)]
+    words = " ".join(rng.choice(WORDS) for _ in range(8))
+    terms = " ".join(vocabulary_terms(rng, 4))
+    question = f"Q{index}: which statement about {words} and {terms} is true for teens?"
+    correct = rng.choice("ABCD")
+    question_id = str(uuid.uuid4())
+    options = [
+        {"label": label, "text": f"{rng.choice(WORDS)} {rng.choice(WORDS)} {label}", "is_correct": label == correct}
+        for label in "ABCD"
+    ]
+    public = {
+        "id": question_id, "topic": topic, "difficulty": difficulty, "question": question,
+        "options": [{"label": option["label"], "text": option["text"]} for option in options],
+        "source": "GENERATED"
+    }
+    rationale = json.dumps([f"Option {label} rationale" for label in "ABCD"])
+    return (
+        question_id, topic, difficulty, question, json.dumps(options),
+        f"{correct} is correct because {words}.", rationale, "GENERATED", 0.8,
+        question_hash(question), json.dumps(public, separators=(",", ":")),
+        created_at.strftime("%Y-%m-%d %H:%M:%S")
+    )
+
+def generate_questions(db: MCQDatabase, count: int, seed: int = 7, batch_size: int = 20000,
+                       start: datetime = None, progress: bool = True, signatures: bool = True) -> int:
+    """Insert `count` synthetic questions; returns the number inserted"""
+    rng = random.Random(seed)
+    conn = db.connections.connection()
+    start = start or datetime(2024, 1, 1)
+    offset = conn.execute('SELECT COUNT(*) FROM questions').fetchone()[0]
+    inserted = 0
+    began = time.perf_counter()
+
+    while inserted < count:
+        size = min(batch_size, count - inserted)
+        rows = [
+            question_row(rng, offset + inserted + i, start + timedelta(seconds=offset + inserted + i))
+            for i in range(size)
+        ]
+        with db.connections.transaction() as tx:
+            tx.executemany('''
+                INSERT OR IGNORE INTO questions
+                (id, topic, difficulty, question, options, explanation, distractor_rationale,
+                 source, confidence, question_hash, public_json, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            if signatures:
+                tx.executemany(
+                    'INSERT OR IGNORE INTO question_signatures (question_id, topic_key, signature) VALUES (?, ?, ?)',
+                    map(signature_row, rows)
+                )
+        inserted += size
+        if progress:
+            rate = inserted / (time.perf_counter() - began)
+            print(f"\r   questions: {inserted:,}/{count:,} ({rate:,.0f} rows/s)", end="", flush=True)
+
+    if progress:
+        print()
+    return inserted
+
+def zipf_cum_weights(size: int, exponent: float = 1.0) -> list:
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, size + 1)))
+
+def sample_question_ids(db: MCQDatabase, rng: random.Random, count: int) -> list:
+    """Ids of up to `count` random stored questions"""
+    conn = db.connections.connection()
+    max_rowid = conn.execute('SELECT MAX(rowid) FROM questions').fetchone()[0] or 0
+    rowids = rng.sample(range(1, max_rowid + 1), min(count, max_rowid))
+    ids = []
+    for start in range(0, len(rowids), 500):
+        chunk = rowids[start:start + 500]
+        ids += [row[0] for row in conn.execute(
+            f'SELECT id FROM questions WHERE rowid IN ({",".join("?" * len(chunk))})', chunk
+        )]
+    return ids
+
+def generate_attempts(db: MCQDatabase, count: int, seed: int = 11, batch_size: int = 50000, users: int = 200000,
+                      days: int = 180, questions: int = 200000, progress: bool = True) -> int:
+    """Insert `count` synthetic attempts spread over `questions` random stored questions"""
+    rng = random.Random(seed)
+    question_ids = sample_question_ids(db, rng, questions)
+    if not question_ids:
+        raise ValueError("Generate questions before attempts")
+    question_weights = zipf_cum_weights(len(question_ids), 0.8)
+    users = range(users)
+    user_weights = zipf_cum_weights(len(users), 0.7)
+    end = datetime.utcnow()
+    step = timedelta(days=days) / max(count, 1)
+    inserted = 0
+    began = time.perf_counter()
+
+    with db.connections.transaction() as tx:
+        tx.execute('DROP TRIGGER IF EXISTS trg_attempts_rollup_insert')
+    try:
+        while inserted < count:
+            size = min(batch_size, count - inserted)
+            base = end - step * (count - inserted)
+            picked = rng.choices(question_ids, cum_weights=question_weights, k=size)
+            user_ranks = rng.choices(users, cum_weights=user_weights, k=size)
+            rows = [
+                (str(uuid.UUID(int=rng.getrandbits(128), version=4)), question_id, rng.choice("ABCD"),
+                 rng.random() < 0.62, f"user{user_rank}", (base + step * i).strftime("%Y-%m-%d %H:%M:%S"))
+                for i, (question_id, user_rank) in enumerate(zip(picked, user_ranks))
+            ]
+            with db.connections.transaction() as tx:
+                tx.executemany(
+                    'INSERT INTO attempts (id, question_id, selected, correct, user_id, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                    rows
+                )
+            inserted += size
+            if progress:
+                rate = inserted / (time.perf_counter() - began)
+                print(f"\r   attempts: {inserted:,}/{count:,} ({rate:,.0f} rows/s)", end="", flush=True)
+    finally:
+        db.init_database()  # Puts the trigger back
+
+    if progress:
+        print("\n   rebuilding rollups...")
+    db.rebuild_rollups()
+    return inserted
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Fill an MCQ database with synthetic questions and attempts")
+    parser.add_argument("db_path")
+    parser.add_argument("--questions", type=int, default=1_000_000)
+    parser.add_argument("--attempts", type=int, default=0)
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--no-signatures", action="store_true", help="leave near-duplicate signatures to backfill")
+    args = parser.parse_args()
+
+    db = MCQDatabase(args.db_path)
+    generate_questions(db, args.questions, seed=args.seed, signatures=not args.no_signatures)
+    if args.attempts:
+        generate_attempts(db, args.attempts, seed=args.seed + 4, users=args.users)
+    db.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
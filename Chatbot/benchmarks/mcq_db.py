@@ -0,0 +1,572 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for MCQDatabase.
+
+throughput: readers serve quiz questions (get_next_question +
+    get_question_by_id) while writers record attempts, all against one
+    database file. For comparison the same mix is run with a fresh
+    sqlite3.connect() per call, which is how the database layer used to work.
+
+next: fills a large question bank, verifies with EXPLAIN QUERY PLAN that no
+    get_next_question filter combination sorts rows, and measures its latency.
+
+sampler: the /mcq/next path (QuestionSampler + QuestionCache payloads) on
+    a large bank: the first load of each filter combination's pool, steady
+    picks with payload lookups, and the first request of a heavy user whose
+    seen-set is seeded from --heavy-attempts attempts, with its filter size.
+
+search: full-text search (/mcq/search) latency on a large bank for one- and
+    two-term queries, prefix queries, topic/difficulty filters and the next
+    page of a keyset cursor. Query terms are drawn uniformly from the bank's
+    vocabulary; the most frequent terms are reported separately. A LIKE scan
+    is timed once for comparison.
+
+scale: grows one database through increasing bank sizes (with Zipf-skewed
+    attempts, --attempts-per-question per question) and at each size times
+    get_next_question, get_question_by_id, record_attempt, store_question and
+    get_analytics, first one call at a time and then under a concurrent mixed
+    load. It also loads the near-duplicate index from scratch, as the first
+    store_questions per topic after a restart does, and reports its load time
+    and memory per question. An operation whose p99 grows more than --max-growth times from the
+    smallest to the largest size is reported as a scaling cliff.
+
+    python benchmarks/mcq_db.py throughput --questions 2000 --threads 1 4 8
+    python benchmarks/mcq_db.py next --bank 1000000 --max-p99-ms 1
+    python benchmarks/mcq_db.py sampler --bank 1000000 --heavy-attempts 5000
+    python benchmarks/mcq_db.py search --bank 500000 --max-p95-ms 5
+    python benchmarks/mcq_db.py scale --questions 100000 1000000 3000000 --attempts-per-question 10
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpora import build_mcq_items
+from benchmarks.mcq_data import TOPICS, VOCABULARY, generate_attempts, generate_questions, sample_question_ids
+from mcq import MCQDatabase, MCQItem, AttemptRequest, Difficulty
+from mcq.database import SELECT_TOPIC_SIGNATURES_SQL
+from mcq.question_cache import QuestionCache
+from mcq.sampler import QuestionSampler
+from mcq.similarity import NearDuplicateIndex, topic_key
+
+def populate(db: MCQDatabase, count: int) -> list:
+    """Store `count` distinct questions spread over topics and difficulties"""
+    template = build_mcq_items(1)[0]
+    ids = []
+    for i in range(count):
+        data = dict(template)
+        data["id"] = str(uuid.uuid4())
+        data["topic"] = TOPICS[i % len(TOPICS)]
+        data["difficulty"] = list(Difficulty)[i % 3].value
+        data["question"] = f"Question {i}: which choice is healthiest for {data['topic']}?"
+        db.store_question(MCQItem(**data))
+        ids.append(data["id"])
+    return ids
+
+class LegacyDatabase:
+    """Connect-per-call access pattern, kept only as a comparison point"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    def get_next_question(self, topic, difficulty):
+        conn = sqlite3.connect(self.db_path)
+        row = conn.execute(
+            'SELECT * FROM questions WHERE topic = ? AND difficulty = ? ORDER BY created_at DESC LIMIT 1',
+            (topic, difficulty.value)
+        ).fetchone()
+        conn.close()
+        return row
+
+    def get_question_by_id(self, question_id):
+        conn = sqlite3.connect(self.db_path)
+        row = conn.execute('SELECT * FROM questions WHERE id = ?', (question_id,)).fetchone()
+        conn.close()
+        return row
+
+    def record_attempt(self, attempt, correct):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(
+            'INSERT INTO attempts (id, question_id, selected, correct, user_id) VALUES (?, ?, ?, ?, ?)',
+            (str(uuid.uuid4()), attempt.question_id, attempt.selected, correct, attempt.user_id)
+        )
+        conn.commit()
+        conn.close()
+
+def run_load(db, question_ids: list, threads: int, seconds: float, write_ratio: float) -> dict:
+    """Run a mixed read/write load and return completed reads and writes per second"""
+    stop = threading.Event()
+    counts = []
+    lock = threading.Lock()
+
+    def worker(seed: int):
+        rng = random.Random(seed)
+        reads = writes = 0
+        while not stop.is_set():
+            question_id = rng.choice(question_ids)
+            if rng.random() < write_ratio:
+                attempt = AttemptRequest(question_id=question_id, selected=rng.choice("ABCD"), user_id=f"user{seed}")
+                db.record_attempt(attempt, attempt.selected == "A")
+                writes += 1
+            else:
+                db.get_next_question(rng.choice(TOPICS), rng.choice(list(Difficulty)))
+                db.get_question_by_id(question_id)
+                reads += 1
+        with lock:
+            counts.append((reads, writes))
+
+    workers = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "reads_per_sec": sum(r for r, _ in counts) / elapsed,
+        "writes_per_sec": sum(w for _, w in counts) / elapsed,
+    }
+
+def percentiles(samples: list) -> dict:
+    """p50/p95/p99/max of latency samples in milliseconds"""
+    ordered = sorted(samples)
+
+    def pick(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": ordered[-1] * 1000}
+
+def open_bank(path: str, bank: int) -> MCQDatabase:
+    """Open (or create) a benchmark database holding at least `bank` questions"""
+    db = MCQDatabase(path)
+    existing = db.connections.connection().execute('SELECT COUNT(*) FROM questions').fetchone()[0]
+    if existing < bank:
+        print(f"Generating {bank - existing:,} questions into {path}...")
+        generate_questions(db, bank - existing)
+        db.connections.connection().execute('ANALYZE')
+    return db
+
+def bench_throughput(args) -> int:
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, "bench_mcq.db")
+        db = MCQDatabase(db_path)
+        print(f"Populating {args.questions} questions...")
+        question_ids = populate(db, args.questions)
+
+        backends = [("pooled+WAL", db)]
+        if not args.skip_legacy:
+            backends.append(("connect-per-call", LegacyDatabase(db_path)))
+
+        print(f"\n{'backend':18} {'threads':>8} {'quiz reads/s':>14} {'attempt writes/s':>18}")
+        print("-" * 62)
+        for name, backend in backends:
+            for threads in args.threads:
+                result = run_load(backend, question_ids, threads, args.seconds, args.write_ratio)
+                print(f"{name:18} {threads:>8} {result['reads_per_sec']:>14,.0f} {result['writes_per_sec']:>18,.0f}")
+
+        db.close()
+    return 0
+
+def bench_next(args) -> int:
+    workdir = None
+    db_path = args.db
+    if not db_path:
+        workdir = tempfile.TemporaryDirectory()
+        db_path = os.path.join(workdir.name, "bench_mcq.db")
+
+    db = open_bank(db_path, args.bank)
+    rng = random.Random(1)
+    combos = [(None, None), (None, "difficulty"), ("topic", None), ("topic", "difficulty")]
+    failed = False
+
+    print(f"\n{'filters':22} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}  plan")
+    print("-" * 100)
+    for topic_filter, difficulty_filter in combos:
+        plan = db.explain_next_question(
+            TOPICS[0] if topic_filter else None,
+            Difficulty.EASY if difficulty_filter else None
+        )
+        plan_text = "; ".join(plan)
+        if "TEMP B-TREE" in plan_text:
+            failed = True
+
+        samples = []
+        for _ in range(args.iterations):
+            topic = rng.choice(TOPICS) if topic_filter else None
+            difficulty = rng.choice(list(Difficulty)) if difficulty_filter else None
+            start = time.perf_counter()
+            db.get_next_question(topic, difficulty)
+            samples.append(time.perf_counter() - start)
+
+        stats = percentiles(samples)
+        if stats["p99"] > args.max_p99_ms:
+            failed = True
+        label = "+".join(f for f in (topic_filter, difficulty_filter) if f) or "none"
+        print(f"{label:22} {stats['p50']:>8.3f} {stats['p99']:>8.3f} {stats['max']:>8.3f}  {plan_text}")
+
+    db.close()
+    if workdir:
+        workdir.cleanup()
+
+    if failed:
+        print(f"\n❌ A query plan sorts rows or p99 exceeded {args.max_p99_ms}ms")
+        return 1
+    print(f"\n✅ All filter combinations use an index and stay under {args.max_p99_ms}ms p99")
+    return 0
+
+def bench_sampler(args) -> int:
+    workdir = None
+    db_path = args.db
+    if not db_path:
+        workdir = tempfile.TemporaryDirectory()
+        db_path = os.path.join(workdir.name, "bench_mcq.db")
+
+    db = open_bank(db_path, args.bank)
+    rng = random.Random(1)
+    heavy_user = f"heavy-{args.heavy_attempts}"
+    conn = db.connections.connection()
+    if not conn.execute('SELECT 1 FROM attempts WHERE user_id = ? LIMIT 1', (heavy_user,)).fetchone():
+        created_at = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        db.insert_attempt_rows([
+            (str(uuid.uuid4()), question_id, "A", False, heavy_user, created_at)
+            for question_id in sample_question_ids(db, rng, args.heavy_attempts)
+        ])
+
+    combos = [(None, None), (None, Difficulty.EASY), (TOPICS[0], None), (TOPICS[0], Difficulty.EASY)]
+    print(f"\n{'filters':22} {'first load ms':>14} {'pool size':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    print("-" * 66)
+    failed = False
+    for topic, difficulty in combos:
+        sampler = QuestionSampler(db, random.Random(2))
+        cache = QuestionCache(db)
+        start = time.perf_counter()
+        sampler.next_question_id(topic, difficulty)
+        first_load = (time.perf_counter() - start) * 1000
+
+        samples = []
+        for i in range(args.iterations):
+            start = time.perf_counter()
+            question_id = sampler.next_question_id(topic, difficulty, f"user{i % 100}")
+            cache.payload(question_id)
+            samples.append(time.perf_counter() - start)
+
+        stats = percentiles(samples)
+        if stats["p99"] > args.max_p99_ms:
+            failed = True
+        label = "+".join(str(f.value if isinstance(f, Difficulty) else f) for f in (topic, difficulty) if f) or "none"
+        pool_size = len(sampler._pools[(topic, difficulty.value if difficulty else None)])
+        print(f"{label:22} {first_load:>14.1f} {pool_size:>10,} {stats['p50']:>8.3f} {stats['p99']:>8.3f}")
+
+    # A heavy user's first request seeds their seen-set from the attempts table
+    sampler.next_question_id()
+    start = time.perf_counter()
+    sampler.next_question_id(None, None, heavy_user)
+    seeding = (time.perf_counter() - start) * 1000
+    seen = sampler._seen[heavy_user]
+    print(f"\nHeavy user ({args.heavy_attempts:,} attempts): first request {seeding:.1f}ms, "
+          f"seen filter {seen.size_bits // 8:,} bytes in {len(seen.filters)} filter(s)")
+
+    db.close()
+    if workdir:
+        workdir.cleanup()
+
+    if failed:
+        print(f"\n❌ Steady-state p99 exceeded {args.max_p99_ms}ms")
+        return 1
+    print(f"\n✅ Steady-state picks stay under {args.max_p99_ms}ms p99")
+    return 0
+
+def bench_search(args) -> int:
+    workdir = None
+    db_path = args.db
+    if not db_path:
+        workdir = tempfile.TemporaryDirectory()
+        db_path = os.path.join(workdir.name, "bench_mcq.db")
+
+    db = open_bank(db_path, args.bank)
+    rng = random.Random(1)
+    head = VOCABULARY[:50]
+    cases = [
+        ("one term", lambda: (rng.choice(VOCABULARY), {})),
+        ("two terms", lambda: (f"{rng.choice(VOCABULARY)} {rng.choice(head)}", {})),
+        ("prefix", lambda: (rng.choice(VOCABULARY)[:4] + "*", {})),
+        ("one term+topic", lambda: (rng.choice(VOCABULARY), {"topic": rng.choice(TOPICS)})),
+        ("one term+topic+diff", lambda: (rng.choice(VOCABULARY), {"topic": rng.choice(TOPICS),
+                                                                   "difficulty": rng.choice(list(Difficulty))})),
+        ("frequent term", lambda: (rng.choice(head), {})),
+    ]
+    failed = False
+
+    print(f"\n{'query':22} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'page 2 p95':>11} {'avg hits':>9}")
+    print("-" * 72)
+    for name, make_query in cases:
+        samples, page_samples, hits = [], [], 0
+        for _ in range(args.iterations):
+            query, filters = make_query()
+            start = time.perf_counter()
+            payloads, cursor = db.search_questions(query, limit=20, **filters)
+            samples.append(time.perf_counter() - start)
+            hits += len(payloads)
+            if cursor:
+                start = time.perf_counter()
+                db.search_questions(query, limit=20, cursor=cursor, **filters)
+                page_samples.append(time.perf_counter() - start)
+
+        stats = percentiles(samples)
+        page_p95 = f"{percentiles(page_samples)['p95']:.3f}" if page_samples else "-"
+        # The most frequent terms match a large share of the bank and are reported, not gated
+        if name != "frequent term" and stats["p95"] > args.max_p95_ms:
+            failed = True
+        print(f"{name:22} {stats['p50']:>8.3f} {stats['p95']:>8.3f} {stats['p99']:>8.3f} {page_p95:>11} "
+              f"{hits / args.iterations:>9.1f}")
+
+    term = rng.choice(VOCABULARY)
+    start = time.perf_counter()
+    db.connections.connection().execute(
+        'SELECT public_json FROM questions WHERE question LIKE ? OR explanation LIKE ? LIMIT 20',
+        (f"%{term}%", f"%{term}%")
+    ).fetchall()
+    print(f"\nLIKE '%{term}%' scan for comparison: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    db.close()
+    if workdir:
+        workdir.cleanup()
+
+    if failed:
+        print(f"\n❌ Search p95 exceeded {args.max_p95_ms}ms")
+        return 1
+    print(f"\n✅ Search p95 stays under {args.max_p95_ms}ms")
+    return 0
+
+SCALE_OPS = ["get_next_question", "get_question_by_id", "record_attempt", "store_question", "get_analytics"]
+# Share of each operation in the concurrent load, roughly the shape of quiz traffic
+SCALE_MIX = [0.40, 0.30, 0.25, 0.04, 0.01]
+
+class ScaleWorkload:
+    """One call of each benchmarked operation against questions sampled from the bank"""
+
+    def __init__(self, db: MCQDatabase, question_ids: list):
+        self.db = db
+        self.question_ids = question_ids
+        self.template = build_mcq_items(1)[0]
+        self.since = (datetime.utcnow() - timedelta(days=30)).strftime("%Y-%m-%d")
+
+    def call(self, op: str, rng: random.Random):
+        if op == "get_next_question":
+            self.db.get_next_question(rng.choice(TOPICS), rng.choice(list(Difficulty)))
+        elif op == "get_question_by_id":
+            self.db.get_question_by_id(rng.choice(self.question_ids))
+        elif op == "record_attempt":
+            attempt = AttemptRequest(question_id=rng.choice(self.question_ids), selected=rng.choice("ABCD"),
+                                     user_id=f"user{rng.randrange(200_000)}")
+            self.db.record_attempt(attempt, attempt.selected == "A")
+        elif op == "store_question":
+            data = dict(self.template)
+            data["id"] = str(uuid.uuid4())
+            data["topic"] = rng.choice(TOPICS)
+            data["question"] = f"Scale {data['id']}: which choice is healthiest for {data['topic']}?"
+            self.db.store_question(MCQItem(**data))
+        else:
+            self.db.get_analytics(*rng.choice([(None, None), (rng.choice(TOPICS), None),
+                                               (rng.choice(TOPICS), self.since)]))
+
+def run_scale_load(workload: ScaleWorkload, threads: int, seconds: float) -> tuple:
+    """Mixed SCALE_MIX load; returns (latency samples per op, total ops/s)"""
+    stop = threading.Event()
+    samples = {op: [] for op in SCALE_OPS}
+    lock = threading.Lock()
+
+    def worker(seed: int):
+        rng = random.Random(seed)
+        local = {op: [] for op in SCALE_OPS}
+        while not stop.is_set():
+            op = rng.choices(SCALE_OPS, weights=SCALE_MIX)[0]
+            start = time.perf_counter()
+            workload.call(op, rng)
+            local[op].append(time.perf_counter() - start)
+        with lock:
+            for op in SCALE_OPS:
+                samples[op] += local[op]
+
+    workers = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return samples, sum(len(op_samples) for op_samples in samples.values()) / elapsed
+
+def near_duplicate_load(db: MCQDatabase) -> dict:
+    """Load every topic's signatures into a fresh near-duplicate index; returns time and memory"""
+    conn = db.connections.connection()
+    index = NearDuplicateIndex()
+    start = time.perf_counter()
+    for topic in TOPICS:
+        index.load(topic, conn.execute(SELECT_TOPIC_SIGNATURES_SQL, (topic_key(topic),)))
+    seconds = time.perf_counter() - start
+    indexed = index.get_stats()["indexed"]
+    del index
+
+    # Tracing slows loading several-fold, so memory is measured on one topic
+    index = NearDuplicateIndex()
+    tracemalloc.start()
+    index.load(TOPICS[0], conn.execute(SELECT_TOPIC_SIGNATURES_SQL, (topic_key(TOPICS[0]),)))
+    traced = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    per_question = traced / max(index.get_stats()["indexed"], 1)
+    return {"indexed": indexed, "seconds": seconds, "bytes_per_question": per_question,
+            "megabytes": per_question * indexed / 2 ** 20}
+
+def bench_scale(args) -> int:
+    workdir = None
+    db_path = args.db
+    if not db_path:
+        workdir = tempfile.TemporaryDirectory()
+        db_path = os.path.join(workdir.name, "bench_mcq.db")
+
+    db = None
+    single, loaded = {}, {}
+
+    for bank in sorted(args.questions):
+        if db:
+            db.close()
+        db = open_bank(db_path, bank)
+        conn = db.connections.connection()
+        attempts = conn.execute('SELECT COUNT(*) FROM attempts').fetchone()[0]
+        wanted = int(bank * args.attempts_per_question)
+        if attempts < wanted:
+            print(f"Generating {wanted - attempts:,} attempts...")
+            generate_attempts(db, wanted - attempts, seed=bank, users=args.users, questions=min(bank, 200_000))
+            conn.execute('ANALYZE')
+
+        index = near_duplicate_load(db)
+        print(f"\nNear-duplicate index: {index['indexed']:,} signatures loaded in {index['seconds']:.1f}s, "
+              f"{index['megabytes']:,.0f} MB ({index['bytes_per_question']:,.0f} bytes/question)")
+
+        rng = random.Random(bank)
+        workload = ScaleWorkload(db, sample_question_ids(db, rng, 5000))
+        for op in SCALE_OPS:  # Warm caches and the per-topic near-duplicate index
+            workload.call(op, rng)
+
+        print(f"\n{bank:,} questions, {wanted:,} attempts, single caller")
+        print(f"{'operation':20} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'ops/s':>9}")
+        print("-" * 57)
+        for op in SCALE_OPS:
+            samples = []
+            for _ in range(args.iterations):
+                start = time.perf_counter()
+                workload.call(op, rng)
+                samples.append(time.perf_counter() - start)
+            stats = percentiles(samples)
+            single[(op, bank)] = stats["p99"]
+            print(f"{op:20} {stats['p50']:>8.3f} {stats['p99']:>8.3f} {stats['max']:>8.3f} "
+                  f"{len(samples) / sum(samples):>9,.0f}")
+
+        samples, ops_per_sec = run_scale_load(workload, args.threads, args.seconds)
+        print(f"\n{args.threads} threads, mixed load: {ops_per_sec:,.0f} ops/s")
+        print(f"{'operation':20} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'calls':>9}")
+        print("-" * 57)
+        for op in SCALE_OPS:
+            if samples[op]:
+                stats = percentiles(samples[op])
+                loaded[(op, bank)] = stats["p99"]
+                print(f"{op:20} {stats['p50']:>8.3f} {stats['p99']:>8.3f} {stats['max']:>8.3f} {len(samples[op]):>9,}")
+
+    db.close()
+    if workdir:
+        workdir.cleanup()
+
+    smallest, largest = min(args.questions), max(args.questions)
+    if smallest == largest:
+        return 0
+
+    cliffs = []
+    print(f"\np99 growth from {smallest:,} to {largest:,} questions")
+    print(f"{'operation':20} {'single':>8} {'loaded':>8}")
+    print("-" * 38)
+    for op in SCALE_OPS:
+        growth = []
+        for results in (single, loaded):
+            if (op, smallest) in results and (op, largest) in results:
+                growth.append(results[(op, largest)] / max(results[(op, smallest)], 1e-6))
+            else:
+                growth.append(None)
+        if any(ratio and ratio > args.max_growth for ratio in growth):
+            cliffs.append(op)
+        print(f"{op:20} " + " ".join(f"{ratio:>7.1f}x" if ratio else f"{'-':>8}" for ratio in growth))
+
+    if cliffs:
+        print(f"\n❌ p99 grew more than {args.max_growth}x for: {', '.join(cliffs)}")
+        return 1
+    print(f"\n✅ No operation's p99 grew more than {args.max_growth}x")
+    return 0
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="MCQDatabase benchmarks")
+    subparsers = parser.add_subparsers(dest="scenario", required=True)
+
+    throughput = subparsers.add_parser("throughput", help="concurrent quiz-read / attempt-write throughput")
+    throughput.add_argument("--questions", type=int, default=2000)
+    throughput.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8])
+    throughput.add_argument("--seconds", type=float, default=3.0)
+    throughput.add_argument("--write-ratio", type=float, default=0.5,
+                            help="fraction of operations that record an attempt")
+    throughput.add_argument("--skip-legacy", action="store_true", help="don't run the connect-per-call comparison")
+    throughput.set_defaults(func=bench_throughput)
+
+    next_question = subparsers.add_parser("next", help="get_next_question plans and latency on a large bank")
+    next_question.add_argument("--bank", type=int, default=1_000_000, help="number of questions in the bank")
+    next_question.add_argument("--db", help="reuse this database file instead of a temporary one")
+    next_question.add_argument("--iterations", type=int, default=2000)
+    next_question.add_argument("--max-p99-ms", type=float, default=1.0)
+    next_question.set_defaults(func=bench_next)
+
+    sampler = subparsers.add_parser("sampler", help="/mcq/next sampler path: pool loads, picks and seen-set seeding")
+    sampler.add_argument("--bank", type=int, default=1_000_000, help="number of questions in the bank")
+    sampler.add_argument("--db", help="reuse this database file instead of a temporary one")
+    sampler.add_argument("--iterations", type=int, default=5000)
+    sampler.add_argument("--heavy-attempts", type=int, default=5000, help="attempts recorded by the heavy user")
+    sampler.add_argument("--max-p99-ms", type=float, default=1.0)
+    sampler.set_defaults(func=bench_sampler)
+
+    search = subparsers.add_parser("search", help="full-text search latency on a large bank")
+    search.add_argument("--bank", type=int, default=500_000, help="number of questions in the bank")
+    search.add_argument("--db", help="reuse this database file instead of a temporary one")
+    search.add_argument("--iterations", type=int, default=1000)
+    search.add_argument("--max-p95-ms", type=float, default=5.0)
+    search.set_defaults(func=bench_search)
+
+    scale = subparsers.add_parser("scale", help="per-operation latency as the bank and attempt history grow")
+    scale.add_argument("--questions", type=int, nargs="+", default=[100_000, 1_000_000],
+                       help="bank sizes to measure, grown in order in one database")
+    scale.add_argument("--attempts-per-question", type=float, default=10.0)
+    scale.add_argument("--users", type=int, default=200_000)
+    scale.add_argument("--db", help="reuse this database file instead of a temporary one")
+    scale.add_argument("--iterations", type=int, default=1000, help="single-caller calls per operation")
+    scale.add_argument("--threads", type=int, default=4)
+    scale.add_argument("--seconds", type=float, default=5.0)
+    scale.add_argument("--max-growth", type=float, default=5.0,
+                       help="largest allowed p99 ratio between the largest and smallest bank")
+    scale.set_defaults(func=bench_scale)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
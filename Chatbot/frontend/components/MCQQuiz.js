@@ -19,7 +19,7 @@ export default function MCQQuiz({ userId, onClose }) {
     setLoading(true);
     setError(null);
     try {
-      const data = await mcqAPI.getNextQuestion();
+      const data = await mcqAPI.getNextQuestion(null, null, userId);
       setCurrentQuestion(data);
       setSelectedAnswer(null);
       setShowResult(false);
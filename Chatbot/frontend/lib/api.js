@@ -77,10 +77,11 @@ export const mcqAPI = {
     return response.data;
   },
 
-  getNextQuestion: async (topic = null, difficulty = null) => {
+  getNextQuestion: async (topic = null, difficulty = null, userId = null) => {
     const params = new URLSearchParams();
     if (topic) params.append('topic', topic);
     if (difficulty) params.append('difficulty', difficulty);
+    if (userId) params.append('user_id', userId);
     const queryString = params.toString() ? `?${params.toString()}` : '';
     
     const response = await api.get(`/mcq/next${queryString}`);
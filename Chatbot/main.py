@@ -1,9 +1,12 @@
-from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi import FastAPI, HTTPException, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
 import os
+import json
 import time
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
 # Optional imports for rate limiting
@@ -27,7 +30,10 @@ from utils.cache import CacheManager
 from utils.logger import logger
 
 # Import MCQ module
-from mcq import MCQService, GenerateRequest, GenerateResponse, AttemptRequest, AttemptResponse, Difficulty
+from mcq import (
+    MCQService, GenerateRequest, GenerateResponse, AttemptRequest, AttemptResponse, Difficulty,
+    QuizResponse, SearchResponse, BulkAttemptRequest, BulkAttemptResponse, MCQPublicItem, JobStatus, ImportReport
+)
 
 app = FastAPI(
     title="Teen Chatbot API",
@@ -62,12 +68,23 @@ try:
     gemini_service = GeminiService()
     content_filter = ContentFilter()
     cache_manager = CacheManager()
-    mcq_service = MCQService(gemini_service)
+    mcq_service = MCQService(gemini_service, content_filter=content_filter)
     logger.info("All services initialized successfully")
 except Exception as e:
     logger.error(f"Failed to initialize services: {e}")
     raise
 
+@app.on_event("startup")
+async def start_services():
+    """Start background workers"""
+    await mcq_service.start()
+
+@app.on_event("shutdown")
+async def shutdown_services():
+    """Flush buffered writes and release pooled resources on shutdown"""
+    await mcq_service.stop()
+    logger.info("Services shut down")
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     """Middleware to log all requests"""
@@ -104,6 +121,15 @@ async def health_check():
             "services": {
                 "gemini": "available",
                 "content_filter": "available",
+                "content_filter_cache": content_filter.get_cache_stats(),
+                "mcq_attempt_log": mcq_service.attempt_log.get_stats(),
+                "mcq_retention": mcq_service.retention.get_stats(),
+                "mcq_question_cache": mcq_service.question_cache.get_stats(),
+                "mcq_generation": {
+                    "coalescer": mcq_service.coalescer.get_stats(),
+                    "jobs": mcq_service.jobs.get_stats(),
+                    "near_duplicates": mcq_service.db.near_duplicates.get_stats()
+                },
                 "cache": cache_stats
             }
         }
@@ -249,6 +275,17 @@ async def get_available_topics():
     }
 
 # MCQ Quiz Endpoints
+def check_generate_request(request: GenerateRequest):
+    """Reject empty or inappropriate generation requests"""
+    if not request.topic.strip():
+        raise HTTPException(status_code=400, detail="Topic cannot be empty")
+    
+    # Content filter check
+    content_to_check = request.topic + " " + (request.context or "")
+    if not content_filter.is_safe_content(content_to_check):
+        logger.warning(f"MCQ topic blocked by content filter: {request.topic}")
+        raise HTTPException(status_code=400, detail="Topic contains inappropriate content")
+
 @app.post("/mcq/generate", response_model=GenerateResponse)
 async def generate_mcqs(request: GenerateRequest):
     """Generate MCQ questions for a given topic and difficulty"""
@@ -259,14 +296,7 @@ async def generate_mcqs(request: GenerateRequest):
         logger.info(f"Generating MCQs: topic={request.topic}, difficulty={request.difficulty}, count={request.count}")
         
         # Validate input
-        if not request.topic.strip():
-            raise HTTPException(status_code=400, detail="Topic cannot be empty")
-        
-        # Content filter check
-        content_to_check = request.topic + " " + (request.context or "")
-        if not content_filter.is_safe_content(content_to_check):
-            logger.warning(f"MCQ topic blocked by content filter: {request.topic}")
-            raise HTTPException(status_code=400, detail="Topic contains inappropriate content")
+        check_generate_request(request)
         
         # Generate MCQs
         mcq_items = await mcq_service.generate_mcqs(request)
@@ -282,9 +312,43 @@ async def generate_mcqs(request: GenerateRequest):
         logger.error(f"Error in MCQ generation: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
-@app.get("/mcq/next")
-async def get_next_question(topic: Optional[str] = None, difficulty: Optional[str] = None):
-    """Get the next MCQ question for quiz"""
+@app.post("/mcq/jobs", response_model=JobStatus, status_code=202)
+async def submit_mcq_job(request: GenerateRequest):
+    """Queue an MCQ generation and return its job id right away"""
+    check_generate_request(request)
+    
+    job = mcq_service.jobs.submit(request)
+    if not job:
+        raise HTTPException(status_code=429, detail="Too many pending generation jobs")
+    
+    logger.info(f"MCQ job {job.job_id}: topic={request.topic}, difficulty={request.difficulty}, count={request.count}")
+    return job.to_status()
+
+@app.get("/mcq/jobs/{job_id}", response_model=JobStatus)
+async def get_mcq_job(job_id: str):
+    """Poll a generation job"""
+    job = mcq_service.jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job.to_status()
+
+@app.get("/mcq/jobs/{job_id}/events")
+async def stream_mcq_job(job_id: str):
+    """Server-sent events for a job: `status` changes and each stored `item`"""
+    job = mcq_service.jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    
+    async def event_stream():
+        async for event in mcq_service.jobs.events(job):
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+@app.get("/mcq/next", response_model=MCQPublicItem)
+async def get_next_question(topic: Optional[str] = None, difficulty: Optional[str] = None, user_id: Optional[str] = None):
+    """Get a random MCQ question the user hasn't seen yet"""
     try:
         # Validate difficulty if provided
         diff_enum = None
@@ -294,12 +358,15 @@ async def get_next_question(topic: Optional[str] = None, difficulty: Optional[st
             except ValueError:
                 raise HTTPException(status_code=400, detail="Invalid difficulty. Use: easy, medium, hard")
         
-        question = mcq_service.get_next_question(topic=topic, difficulty=diff_enum)
+        payload = await mcq_service.db_executor.read(
+            mcq_service.get_next_question_payload, topic=topic, difficulty=diff_enum, user_id=user_id
+        )
         
-        if not question:
+        if not payload:
             raise HTTPException(status_code=404, detail="No questions found for the specified criteria")
         
-        return question
+        # Stored pre-serialized at insert time; sent as-is
+        return Response(content=payload, media_type="application/json")
         
     except HTTPException:
         raise
@@ -313,7 +380,7 @@ async def submit_attempt(request: AttemptRequest):
     try:
         logger.info(f"MCQ attempt: question_id={request.question_id}, selected={request.selected}")
         
-        result = mcq_service.submit_answer(
+        result = await mcq_service.queue_answer(
             question_id=request.question_id,
             selected=request.selected,
             user_id=request.user_id
@@ -330,13 +397,115 @@ async def submit_attempt(request: AttemptRequest):
         logger.error(f"Error submitting MCQ attempt: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@app.get("/mcq/quiz", response_model=QuizResponse)
+async def get_quiz(count: int = 10, topic: Optional[str] = None, difficulty: Optional[str] = None, user_id: Optional[str] = None):
+    """Get several distinct MCQ questions (unseen ones first) in one request"""
+    try:
+        if not 1 <= count <= 20:
+            raise HTTPException(status_code=400, detail="Count must be between 1 and 20")
+        
+        diff_enum = None
+        if difficulty:
+            try:
+                diff_enum = Difficulty(difficulty.lower())
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid difficulty. Use: easy, medium, hard")
+        
+        payloads = await mcq_service.db_executor.read(
+            mcq_service.get_quiz_payloads, count, topic=topic, difficulty=diff_enum, user_id=user_id
+        )
+        
+        if not payloads:
+            raise HTTPException(status_code=404, detail="No questions found for the specified criteria")
+        
+        # Same shape as QuizResponse, assembled from the stored payloads
+        body = b'{"items":[' + b",".join(payloads) + b'],"requested":' + str(count).encode() + b"}"
+        return Response(content=body, media_type="application/json")
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting quiz: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@app.get("/mcq/search", response_model=SearchResponse)
+async def search_questions(q: str, topic: Optional[str] = None, difficulty: Optional[str] = None,
+                           limit: int = 20, cursor: Optional[str] = None):
+    """Full-text search over the question bank, best match first; follow next_cursor for more"""
+    try:
+        if not q.strip():
+            raise HTTPException(status_code=400, detail="Search query is required")
+        if not 1 <= limit <= 50:
+            raise HTTPException(status_code=400, detail="Limit must be between 1 and 50")
+        
+        diff_enum = None
+        if difficulty:
+            try:
+                diff_enum = Difficulty(difficulty.lower())
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid difficulty. Use: easy, medium, hard")
+        
+        try:
+            payloads, next_cursor = await mcq_service.db_executor.read(
+                mcq_service.search_questions, q, topic=topic, difficulty=diff_enum, limit=limit, cursor=cursor
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        # Same shape as SearchResponse, assembled from the stored payloads
+        body = b'{"items":[' + b",".join(payloads) + b'],"next_cursor":' + json.dumps(next_cursor).encode() + b"}"
+        return Response(content=body, media_type="application/json")
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error searching questions: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@app.post("/mcq/attempts", response_model=BulkAttemptResponse)
+async def submit_attempts(request: BulkAttemptRequest):
+    """Grade and record a list of answers; unknown questions are reported per item"""
+    try:
+        logger.info(f"MCQ bulk attempt: {len(request.answers)} answers from user_id={request.user_id}")
+        
+        return await mcq_service.queue_answers(request.answers, user_id=request.user_id)
+        
+    except Exception as e:
+        logger.error(f"Error submitting MCQ attempts: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@app.get("/mcq/pool")
+async def get_mcq_pool():
+    """Unattempted-question depth per topic and difficulty, plus refill worker status"""
+    try:
+        depths = await mcq_service.refill_worker.pool_depths()
+        return mcq_service.refill_worker.get_stats(depths)
+    except Exception as e:
+        logger.error(f"Error getting MCQ pool status: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 @app.get("/mcq/analytics")
-async def get_mcq_analytics(topic: Optional[str] = None):
-    """Get MCQ analytics and statistics"""
+async def get_mcq_analytics(topic: Optional[str] = None, since: Optional[str] = None,
+                            until: Optional[str] = None, days: Optional[int] = None):
+    """Get MCQ analytics and statistics, optionally for a window of days"""
     try:
-        analytics = mcq_service.get_analytics(topic=topic)
+        for value in (since, until):
+            if value:
+                try:
+                    datetime.strptime(value, "%Y-%m-%d")
+                except ValueError:
+                    raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+        
+        if days is not None:
+            if days < 1:
+                raise HTTPException(status_code=400, detail="Days must be at least 1")
+            since = (datetime.utcnow().date() - timedelta(days=days - 1)).isoformat()
+        
+        analytics = await mcq_service.db_executor.read(mcq_service.get_analytics, topic=topic, since=since, until=until)
         return analytics
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting MCQ analytics: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -352,6 +521,67 @@ async def clear_cache():
         logger.error(f"Failed to clear cache: {e}")
         raise HTTPException(status_code=500, detail="Failed to clear cache")
 
+@app.delete("/admin/mcq/questions/{question_id}")
+async def delete_mcq_question(question_id: str):
+    """Admin endpoint to delete a question (and its attempts)"""
+    try:
+        deleted = await mcq_service.db_executor.write(mcq_service.delete_question, question_id)
+    except Exception as e:
+        logger.error(f"Failed to delete question {question_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to delete question")
+    
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Question not found")
+    logger.info(f"Question {question_id} deleted by admin")
+    return {"message": "Question deleted", "question_id": question_id}
+
+@app.post("/admin/mcq/retention")
+async def run_mcq_retention():
+    """Admin endpoint to archive and delete attempts past the retention period now"""
+    if not mcq_service.retention.enabled:
+        raise HTTPException(status_code=400, detail="Attempt retention is disabled (set MCQ_ATTEMPT_RETENTION_DAYS)")
+    try:
+        result = await mcq_service.retention.run_once()
+        storage = await mcq_service.db_executor.read(mcq_service.db.get_storage_stats)
+    except Exception as e:
+        logger.error(f"Attempt retention failed: {e}")
+        raise HTTPException(status_code=500, detail="Attempt retention failed")
+
+    logger.info(f"Attempt retention run by admin: {result['archived']} archived")
+    return {**result, "storage": storage}
+
+@app.get("/admin/mcq/export")
+async def export_mcq_questions(topic: Optional[str] = None, difficulty: Optional[str] = None, gzip: bool = False):
+    """Admin endpoint to stream the question bank (answers included) as JSONL"""
+    diff_enum = None
+    if difficulty:
+        try:
+            diff_enum = Difficulty(difficulty.lower())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid difficulty. Use: easy, medium, hard")
+
+    filename = "questions.jsonl.gz" if gzip else "questions.jsonl"
+    logger.info(f"Question export started by admin: topic={topic}, difficulty={difficulty}")
+    return StreamingResponse(
+        mcq_service.export_jsonl(topic=topic, difficulty=diff_enum, compress=gzip),
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.post("/admin/mcq/import", response_model=ImportReport)
+async def import_mcq_questions(request: Request, near_duplicate_check: bool = True):
+    """Admin endpoint to bulk-load questions from a JSONL (or gzipped JSONL) request body"""
+    try:
+        report = await mcq_service.import_jsonl(request.stream(), check_near_duplicates=near_duplicate_check)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to import questions: {e}")
+        raise HTTPException(status_code=500, detail="Failed to import questions")
+
+    logger.info(f"Questions imported by admin: {report.stored} stored of {report.lines} lines")
+    return report
+
 if __name__ == "__main__":
     import uvicorn
     host = os.getenv("HOST", "0.0.0.0")
@@ -5,23 +5,49 @@
 from .models import (
     MCQItem, 
     MCQOption, 
+    MCQPublicItem,
+    MCQPublicOption,
     Difficulty, 
     GenerateRequest, 
     GenerateResponse,
+    JobStatus,
     AttemptRequest,
-    AttemptResponse
+    AttemptResponse,
+    QuizResponse,
+    SearchResponse,
+    QuizAnswer,
+    BulkAttemptRequest,
+    BulkAttemptResponse,
+    AttemptResult,
+    ModerationReport,
+    StoreReport,
+    ImportReport
 )
 from .service import MCQService
 from .database import MCQDatabase
+from .moderation import MCQModerator
 
 __all__ = [
     'MCQItem',
     'MCQOption', 
+    'MCQPublicItem',
+    'MCQPublicOption',
     'Difficulty',
     'GenerateRequest',
     'GenerateResponse',
+    'JobStatus',
     'AttemptRequest',
     'AttemptResponse',
+    'QuizResponse',
+    'SearchResponse',
+    'QuizAnswer',
+    'BulkAttemptRequest',
+    'BulkAttemptResponse',
+    'AttemptResult',
+    'ModerationReport',
+    'StoreReport',
+    'ImportReport',
     'MCQService',
-    'MCQDatabase'
+    'MCQDatabase',
+    'MCQModerator'
 ]
\ No newline at end of file
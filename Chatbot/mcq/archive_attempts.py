@@ -0,0 +1,44 @@
+"""
+Archive and delete old quiz attempts (see retention.py), e.g. from cron
+instead of the in-process worker.
+
+    python -m mcq.archive_attempts [db_path] --days 90 [--archive-dir attempt_archive]
+    python -m mcq.archive_attempts [db_path] --enable-incremental-vacuum
+
+--enable-incremental-vacuum converts a database created before incremental
+vacuum was the default, with a full VACUUM; stop the server first.
+"""
+import argparse
+import asyncio
+from .database import MCQDatabase
+from .executor import DBExecutor
+from .retention import AttemptRetention
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive quiz attempts older than the retention period")
+    parser.add_argument("db_path", nargs="?", default="mcq_database.db")
+    parser.add_argument("--days", type=int, help="keep this many days of attempts (default MCQ_ATTEMPT_RETENTION_DAYS)")
+    parser.add_argument("--archive-dir", help="default MCQ_ATTEMPT_ARCHIVE_DIR or attempt_archive")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="switch an existing database to auto_vacuum=INCREMENTAL (full VACUUM)")
+    args = parser.parse_args()
+
+    db = MCQDatabase(args.db_path)
+    if args.enable_incremental_vacuum:
+        print("Enabled incremental vacuum" if db.enable_incremental_vacuum() else "Failed to enable incremental vacuum")
+    else:
+        retention = AttemptRetention(db, DBExecutor(read_workers=1, write_workers=1),
+                                     retention_days=args.days, archive_dir=args.archive_dir)
+        if not retention.enabled:
+            parser.error("--days (or MCQ_ATTEMPT_RETENTION_DAYS) must be at least 1")
+        result = asyncio.run(retention.run_once())
+        retention.executor.shutdown()
+        for path in result["files"]:
+            print(path)
+        print(f"Archived {result['archived']} attempts from {result['days']} days before {result['cutoff']}, "
+              f"deleted {result['deleted']}, freed {result['freed_bytes'] / 2**20:.1f} MiB")
+    print(db.get_storage_stats())
+    db.close()
+
+if __name__ == "__main__":
+    main()
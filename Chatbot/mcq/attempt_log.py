@@ -0,0 +1,220 @@
+import asyncio
+import json
+import os
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import List, Optional
+from .models import AttemptRequest
+from .database import MCQDatabase
+from .executor import DBExecutor
+from utils.logger import logger
+
+class AttemptLog:
+    """
+    Write-behind buffer for quiz attempts.
+
+    Graded attempts are queued in memory and written by a background task in
+    batches of up to `batch_size` rows per transaction, at least every
+    `flush_interval` seconds. The queue is bounded, so when the database falls
+    behind, callers wait in record() instead of growing memory without limit.
+
+    With a journal path configured every attempt is also appended to a local
+    JSONL file before record() returns, and fsynced first when `fsync` is set
+    (otherwise it survives a process crash but not a power loss). Rows left in
+    the journal are replayed on start through the write lane; attempt ids are
+    generated up front and inserted with INSERT OR IGNORE, so replaying is
+    idempotent. Rows are flushed in journal order, so the journal is cut at
+    the end of the last flushed row: emptied when nothing is pending, and
+    otherwise rewritten with just the unflushed tail once at least
+    COMPACT_BYTES (and more than the tail) has been flushed.
+    """
+
+    COMPACT_BYTES = 1 << 20
+
+    def __init__(self, db: MCQDatabase, executor: DBExecutor, journal_path: Optional[str] = None,
+                 batch_size: int = None, flush_interval: float = None, max_pending: int = None,
+                 fsync: bool = None):
+        self.db = db
+        self.executor = executor
+        self.journal_path = journal_path if journal_path is not None else os.getenv("MCQ_ATTEMPT_JOURNAL", "")
+        self.batch_size = batch_size or int(os.getenv("MCQ_ATTEMPT_BATCH_SIZE", "200"))
+        self.flush_interval = flush_interval or int(os.getenv("MCQ_ATTEMPT_FLUSH_MS", "200")) / 1000
+        self.max_pending = max_pending or int(os.getenv("MCQ_ATTEMPT_MAX_PENDING", "10000"))
+        self.fsync = fsync if fsync is not None else os.getenv("MCQ_ATTEMPT_JOURNAL_FSYNC", "0") == "1"
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._journal = None
+        self._journal_size = 0
+        # Journal offset just past each unflushed row, in queue order
+        self._row_ends = deque()
+        self._syncing = 0
+        self._retry: List[tuple] = []
+        self.pending = 0
+        self.flushed = 0
+        self.batches = 0
+        self.failed_flushes = 0
+
+    async def start(self):
+        """Replay any journaled attempts and start the background flusher"""
+        if self._task:
+            return
+
+        if self.journal_path:
+            replayed = await self._replay_journal()
+            if replayed:
+                logger.info(f"Replayed {replayed} journaled attempts")
+            self._journal = open(self.journal_path, "ab")
+            self._journal_size = 0
+
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._task = asyncio.create_task(self._run())
+
+    async def _replay_journal(self) -> int:
+        if not os.path.exists(self.journal_path):
+            return 0
+
+        rows = []
+        with open(self.journal_path, encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    rows.append(tuple(json.loads(line)))
+                except ValueError:
+                    continue  # Torn last line from a crash mid-write
+
+        if rows and not await self.executor.write(self.db.insert_attempt_rows, rows):
+            raise RuntimeError(f"Could not replay attempt journal {self.journal_path}")
+        open(self.journal_path, "w").close()
+        return len(rows)
+
+    async def record(self, attempt: AttemptRequest, correct: bool):
+        """Queue a graded attempt; waits only while the buffer is full"""
+        if not self._task:
+            await self.start()
+
+        row = (
+            str(uuid.uuid4()),
+            attempt.question_id,
+            attempt.selected,
+            correct,
+            attempt.user_id,
+            datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        )
+        await self._queue.put(row)
+        self.pending += 1
+        if self._journal:
+            line = (json.dumps(row) + "\n").encode()
+            self._journal.write(line)
+            self._journal.flush()
+            self._journal_size += len(line)
+            self._row_ends.append(self._journal_size)
+            if self.fsync:
+                self._syncing += 1
+                try:
+                    await asyncio.to_thread(os.fsync, self._journal.fileno())
+                finally:
+                    self._syncing -= 1
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            batch = self._retry
+            self._retry = []
+            if not batch:
+                row = await self._queue.get()
+                if row is None:
+                    break
+                batch.append(row)
+
+            # Give a burst a moment to accumulate before writing
+            deadline = asyncio.get_running_loop().time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is None:
+                    stopping = True
+                    break
+                batch.append(row)
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[tuple]) -> bool:
+        self._retry = []
+        ok = await self.executor.write(self.db.insert_attempt_rows, batch)
+        if not ok:
+            self.failed_flushes += 1
+            self._retry = batch
+            logger.error(f"Failed to flush {len(batch)} attempts, will retry")
+            await asyncio.sleep(self.flush_interval)
+            return False
+
+        self.pending -= len(batch)
+        self.flushed += len(batch)
+        self.batches += 1
+        if self._journal:
+            for _ in batch:
+                flushed_upto = self._row_ends.popleft()
+            self._compact_journal(flushed_upto)
+        return True
+
+    def _compact_journal(self, flushed_upto: int):
+        """Drop the journal's first `flushed_upto` bytes when that's cheap enough to be worth it"""
+        tail = self._journal_size - flushed_upto
+        if tail and (flushed_upto < self.COMPACT_BYTES or flushed_upto <= tail or self._syncing):
+            return  # Not worth it yet, or an fsync still holds the current file
+
+        if tail:
+            with open(self.journal_path, "rb") as journal:
+                journal.seek(flushed_upto)
+                unflushed = journal.read(tail)
+            compacted_path = self.journal_path + ".compact"
+            with open(compacted_path, "wb") as compacted:
+                compacted.write(unflushed)
+                if self.fsync:
+                    compacted.flush()
+                    os.fsync(compacted.fileno())
+            self._journal.close()
+            os.replace(compacted_path, self.journal_path)
+            self._journal = open(self.journal_path, "ab")
+        else:
+            self._journal.truncate(0)
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+
+        self._journal_size = tail
+        self._row_ends = deque(end - flushed_upto for end in self._row_ends)
+
+    async def close(self):
+        """Flush everything still buffered and stop the flusher"""
+        if not self._task:
+            return
+
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+        if self._retry:
+            # One last try for a batch whose flush failed
+            if not await self._flush(self._retry):
+                logger.error(f"{len(self._retry)} attempts not written on shutdown")
+
+        if self._journal:
+            self._journal.close()
+            self._journal = None
+
+    def get_stats(self) -> dict:
+        """Buffer depth and flush counters"""
+        return {
+            "pending": self.pending,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "failed_flushes": self.failed_flushes,
+            "journal": bool(self.journal_path),
+            "journal_bytes": self._journal_size
+        }
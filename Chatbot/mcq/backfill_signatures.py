@@ -0,0 +1,31 @@
+"""
+One-time job: index questions stored before near-duplicate detection existed.
+
+    python -m mcq.backfill_signatures [db_path] [--delete]
+"""
+import argparse
+from .database import MCQDatabase
+
+def main():
+    parser = argparse.ArgumentParser(description="Index existing questions for near-duplicate detection")
+    parser.add_argument("db_path", nargs="?", default="mcq_database.db")
+    parser.add_argument("--delete", action="store_true",
+                        help="delete questions that are near duplicates of an older one (and their attempts)")
+    args = parser.parse_args()
+
+    db = MCQDatabase(args.db_path)
+    if not db.near_duplicates.enabled:
+        db.close()
+        # With a threshold of 0 every shared band would "match", so never delete anything
+        parser.error("near-duplicate checks are disabled (MCQ_NEAR_DUPLICATE_THRESHOLD=0); nothing to backfill")
+    result = db.backfill_signatures()
+    for question_id, existing_id, similarity in result["near_duplicates"]:
+        print(f"{question_id} ~ {existing_id} ({similarity:.2f})")
+    if args.delete:
+        deleted = sum(db.delete_question(question_id) for question_id, _, _ in result["near_duplicates"])
+        print(f"Deleted {deleted} near-duplicate questions")
+    print(f"Indexed {result['indexed']} questions, {len(result['near_duplicates'])} near duplicates")
+    db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Bulk import and export of the question bank as JSONL: one MCQItem (with its
+answers) per line, optionally gzip-compressed. Both directions work a page or
+batch at a time, so memory use does not grow with the size of the bank.
+Command line: mcq/transfer.py.
+"""
+import gzip
+import os
+import zlib
+from typing import List, Optional, Tuple
+from pydantic import ValidationError
+from .models import MCQItem, Difficulty, ImportReport, StoreReport
+from .database import MCQDatabase
+from .moderation import MCQModerator
+
+GZIP_MAGIC = b"\x1f\x8b"
+# Far above any valid MCQItem; longer lines are cut off and reported invalid
+MAX_LINE_BYTES = 64 * 1024
+# Gzip input is inflated at most this much at a time
+INFLATE_PIECE_BYTES = 1 << 20
+
+def parse_question(line: bytes) -> MCQItem:
+    """Validate one JSONL line as an MCQItem; raises ValueError"""
+    mcq_item = MCQItem.model_validate_json(line)
+    mcq_item.validate_single_correct_answer()
+    mcq_item.validate_unique_options()
+    return mcq_item
+
+def _reason(error: ValueError) -> str:
+    if isinstance(error, ValidationError):
+        first = error.errors()[0]
+        location = ".".join(str(part) for part in first["loc"])
+        more = f" (+{error.error_count() - 1} more)" if error.error_count() > 1 else ""
+        return f"{location}: {first['msg']}{more}" if location else f"{first['msg']}{more}"
+    return str(error)
+
+def export_page(db: MCQDatabase, after_rowid: int = 0, limit: int = 1000, topic: Optional[str] = None,
+                difficulty: Optional[Difficulty] = None) -> Tuple[bytes, int]:
+    """One page of the bank as JSONL bytes, plus the rowid to continue after; b"" at the end"""
+    mcq_items, after_rowid = db.export_questions(after_rowid, limit, topic, difficulty)
+    return b"".join(mcq_item.model_dump_json().encode() + b"\n" for mcq_item in mcq_items), after_rowid
+
+class JSONLReader:
+    """
+    Splits a byte stream into lines as it arrives, gunzipping it first if it
+    starts with the gzip magic number (concatenated gzip members are fine).
+    Gzip input is inflated a piece at a time, and more than
+    `max_inflated_bytes` of it (no limit if None) raises ValueError, so a
+    small compression bomb can't exhaust memory.
+    """
+
+    def __init__(self, max_inflated_bytes: Optional[int] = None):
+        self.max_inflated_bytes = max_inflated_bytes
+        self.inflated = 0
+        self._buffer = b""
+        self._head = b""
+        self._decompressor = None
+        self._sniffed = False
+        self._skipping = False  # Inside an over-long line
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        """Add bytes; returns the lines they completed"""
+        if not self._sniffed:
+            self._head += chunk
+            if len(self._head) < len(GZIP_MAGIC):
+                return []
+            chunk, self._head, self._sniffed = self._head, b"", True
+            if chunk.startswith(GZIP_MAGIC):
+                self._decompressor = zlib.decompressobj(wbits=31)
+
+        if not self._decompressor:
+            return self._split(chunk)
+
+        lines = []
+        while True:
+            data = self._decompressor.decompress(chunk, INFLATE_PIECE_BYTES)
+            self.inflated += len(data)
+            if self.max_inflated_bytes is not None and self.inflated > self.max_inflated_bytes:
+                raise ValueError(f"Decompressed upload exceeds {self.max_inflated_bytes} bytes")
+            lines += self._split(data)
+
+            if self._decompressor.eof and self._decompressor.unused_data:
+                chunk = self._decompressor.unused_data
+                self._decompressor = zlib.decompressobj(wbits=31)
+                continue
+            chunk = self._decompressor.unconsumed_tail
+            if not chunk and len(data) < INFLATE_PIECE_BYTES:
+                return lines
+
+    def close(self) -> List[bytes]:
+        """The last line, if the stream didn't end with a newline"""
+        if not self._sniffed:
+            self._sniffed = True
+            lines = self._split(self._head)
+        else:
+            lines = []
+        if self._decompressor and not self._decompressor.eof:
+            raise ValueError("Truncated gzip stream")
+        if self._buffer and not self._skipping:
+            lines.append(self._buffer)
+        self._buffer = b""
+        return lines
+
+    def _split(self, data: bytes) -> List[bytes]:
+        lines = (self._buffer + data).split(b"\n")
+        self._buffer = lines.pop()
+        if self._skipping and lines:
+            lines.pop(0)  # Tail of the over-long line
+            self._skipping = False
+        if len(self._buffer) > MAX_LINE_BYTES and not self._skipping:
+            lines.append(self._buffer[:MAX_LINE_BYTES])
+            self._skipping = True
+        if self._skipping:
+            self._buffer = b""
+        return lines
+
+class QuestionImporter:
+    """
+    Collects JSONL lines into batches and stores each batch with
+    MCQDatabase.store_questions: lines are validated as MCQItems, screened by
+    the moderator like generated questions, and the rest inserted in one
+    transaction with the usual exact and near duplicate checks
+    (check_near_duplicates=False keeps only the exact one, for banks already
+    known to be clean). Outcomes are tallied in `report`.
+    """
+
+    def __init__(self, batch_size: int = None, check_near_duplicates: bool = True, max_errors: int = 20,
+                 moderator: Optional[MCQModerator] = None):
+        self.batch_size = batch_size or int(os.getenv("MCQ_IMPORT_BATCH_SIZE", "2000"))
+        self.check_near_duplicates = check_near_duplicates
+        self.moderator = moderator or MCQModerator()
+        self.max_errors = max_errors
+        self.report = ImportReport()
+        self._line_number = 0
+        self._batch: List[Tuple[int, bytes]] = []
+
+    def add(self, line: bytes) -> Optional[List[Tuple[int, bytes]]]:
+        """Queue a line; returns a full batch to pass to store()"""
+        self._line_number += 1
+        if not line.strip():
+            return None
+        self.report.lines += 1
+        self._batch.append((self._line_number, line))
+        if len(self._batch) >= self.batch_size:
+            return self.flush()
+        return None
+
+    def _error(self, line_number: int, reason: str):
+        if len(self.report.errors) < self.max_errors:
+            self.report.errors.append(f"line {line_number}: {reason}")
+
+    def flush(self) -> List[Tuple[int, bytes]]:
+        """Take whatever is queued"""
+        batch, self._batch = self._batch, []
+        return batch
+
+    def store(self, db: MCQDatabase, batch: List[Tuple[int, bytes]]) -> StoreReport:
+        """Validate and store a batch from add()/flush()"""
+        mcq_items = []
+        line_numbers = {}
+        for line_number, line in batch:
+            try:
+                mcq_item = parse_question(line)
+            except ValueError as e:
+                self._error(line_number, _reason(e))
+                self.report.invalid += 1
+                continue
+            mcq_items.append(mcq_item)
+            line_numbers[mcq_item.id] = line_number
+
+        moderation = self.moderator.moderate(mcq_items) if mcq_items else None
+        flagged_ids = set()
+        if moderation:
+            mcq_items = moderation.items
+            outcome = "rejected" if moderation.action == "drop" else "flagged"
+            for flagged in moderation.flagged:
+                flagged_ids.add(flagged.id)
+                self._error(line_numbers[flagged.id], f"{outcome} by moderation: {', '.join(flagged.violations)}")
+            if moderation.action == "drop":
+                self.report.rejected += len(moderation.flagged)
+                flagged_ids.clear()
+
+        store_report = db.store_questions(mcq_items, self.check_near_duplicates, flagged_ids) if mcq_items else StoreReport()
+        flagged_stored = len(flagged_ids.intersection(store_report.stored))
+        self.report.flagged += flagged_stored
+        self.report.stored += len(store_report.stored) - flagged_stored
+        self.report.duplicates += len(store_report.duplicates)
+        self.report.failed += len(store_report.failed)
+        return store_report
+
+def export_file(db: MCQDatabase, path: str, topic: Optional[str] = None,
+                difficulty: Optional[Difficulty] = None, page_size: int = 1000) -> int:
+    """Write the bank (or one topic/difficulty of it) to a JSONL file; returns the question count"""
+    count = 0
+    after_rowid = 0
+    with (gzip.open(path, "wb") if path.endswith(".gz") else open(path, "wb")) as out:
+        while True:
+            page, after_rowid = export_page(db, after_rowid, page_size, topic, difficulty)
+            if not page:
+                return count
+            out.write(page)
+            count += page.count(b"\n")
+
+def import_file(db: MCQDatabase, path: str, batch_size: int = None, check_near_duplicates: bool = True,
+                chunk_size: int = 1 << 20, moderator: Optional[MCQModerator] = None) -> ImportReport:
+    """Import a JSONL (or gzipped JSONL) file of MCQItems"""
+    reader = JSONLReader()
+    importer = QuestionImporter(batch_size, check_near_duplicates, moderator=moderator)
+    with open(path, "rb") as source:
+        while True:
+            chunk = source.read(chunk_size)
+            lines = reader.feed(chunk) if chunk else reader.close()
+            for line in lines:
+                batch = importer.add(line)
+                if batch:
+                    importer.store(db, batch)
+            if not chunk:
+                break
+    importer.store(db, importer.flush())
+    return importer.report
@@ -0,0 +1,104 @@
+import asyncio
+import hashlib
+import os
+from typing import Awaitable, Callable, Dict, List, Optional
+from .models import GenerateRequest, MCQItem
+from utils.logger import logger
+
+ItemCallback = Callable[[MCQItem], None]
+
+class _Flight:
+    """One shared generation and everyone waiting on it"""
+
+    def __init__(self, request: GenerateRequest):
+        self.request = request
+        self.count = request.count
+        self.started = False
+        self.waiters = 0
+        self.items: List[MCQItem] = []
+        self.listeners: List[ItemCallback] = []
+        self.task: Optional[asyncio.Task] = None
+
+    def add_listener(self, on_item: Optional[ItemCallback], limit: int):
+        """Forward up to `limit` items to on_item, replaying any already produced"""
+        if not on_item:
+            return
+        delivered = [0]
+
+        def listener(item: MCQItem):
+            if delivered[0] < limit:
+                delivered[0] += 1
+                on_item(item)
+
+        for item in self.items:
+            listener(item)
+        self.listeners.append(listener)
+
+    def emit(self, item: MCQItem):
+        self.items.append(item)
+        for listener in self.listeners:
+            listener(item)
+
+class GenerationCoalescer:
+    """
+    Merges concurrent generation requests for the same topic.
+
+    Requests are keyed by (normalized topic, difficulty, context hash). The
+    first request opens a flight and waits `window` seconds before calling
+    Gemini; requests arriving meanwhile join it and raise its count to the
+    largest one asked for. Once running, a flight still accepts requests that
+    are no larger than its count. Every waiter gets the first `count` items of
+    the shared result, and its on_item callback sees items as they're stored.
+    """
+
+    def __init__(self, generate: Callable[[GenerateRequest, Optional[ItemCallback]], Awaitable[List[MCQItem]]],
+                 window: float = None):
+        self._generate = generate
+        self.window = window if window is not None else int(os.getenv("MCQ_COALESCE_WINDOW_MS", "50")) / 1000
+        self._flights: Dict[str, _Flight] = {}
+        self.flights = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def flight_key(request: GenerateRequest) -> str:
+        topic = " ".join(request.topic.lower().split())
+        context = hashlib.md5(request.context.strip().encode()).hexdigest()
+        return f"{topic}|{request.difficulty.value}|{context}"
+
+    async def generate(self, request: GenerateRequest, on_item: Optional[ItemCallback] = None) -> List[MCQItem]:
+        """Generate `request.count` questions, sharing a Gemini call with overlapping requests"""
+        key = self.flight_key(request)
+        flight = self._flights.get(key)
+        if flight and (not flight.started or request.count <= flight.count):
+            flight.count = max(flight.count, request.count)
+            self.coalesced += 1
+            logger.info(f"Coalesced MCQ request for {request.topic} into a flight of {flight.count}")
+        else:
+            flight = _Flight(request)
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(self._run(key, flight))
+            self.flights += 1
+
+        flight.waiters += 1
+        flight.add_listener(on_item, request.count)
+        # Shield so one caller giving up doesn't cancel everyone else's generation
+        items = await asyncio.shield(flight.task)
+        return items[:request.count]
+
+    async def _run(self, key: str, flight: _Flight) -> List[MCQItem]:
+        try:
+            if self.window:
+                await asyncio.sleep(self.window)
+            flight.started = True
+            request = flight.request.model_copy(update={"count": flight.count})
+            return await self._generate(request, flight.emit)
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def get_stats(self) -> dict:
+        return {
+            "in_flight": len(self._flights),
+            "flights": self.flights,
+            "coalesced": self.coalesced
+        }
@@ -0,0 +1,82 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+class ConnectionManager:
+    """
+    Persistent SQLite connections, one per thread.
+
+    Connections are opened lazily on first use in a thread and kept for the
+    lifetime of the manager, so requests no longer pay for connect + schema
+    parsing. Every connection runs in WAL mode (readers never block on the
+    writer) and keeps a statement cache, so the constant SQL strings used by
+    MCQDatabase are prepared once per connection and reused.
+
+    Note: each thread gets its own connection, so db_path must be a file;
+    ":memory:" would give every thread a separate empty database.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.busy_timeout_ms = int(os.getenv("MCQ_DB_BUSY_TIMEOUT_MS", "5000"))
+        self.cache_size_kib = int(os.getenv("MCQ_DB_CACHE_SIZE_KIB", "16384"))
+        self.mmap_size = int(os.getenv("MCQ_DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+        self.statement_cache_size = int(os.getenv("MCQ_DB_STATEMENT_CACHE", "256"))
+
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            cached_statements=self.statement_cache_size,
+            # Each connection is only used by the thread that opened it;
+            # this just lets close() run from whichever thread shuts down.
+            check_same_thread=False
+        )
+        # Only takes effect when the file is new (before the WAL header is
+        # written); older databases need MCQDatabase.enable_incremental_vacuum()
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA cache_size=-{self.cache_size_kib}')
+        conn.execute(f'PRAGMA mmap_size={self.mmap_size}')
+        conn.execute(f'PRAGMA busy_timeout={self.busy_timeout_ms}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run a block in one transaction on this thread's connection"""
+        conn = self.connection()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def close(self):
+        """Close every connection opened by this manager"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
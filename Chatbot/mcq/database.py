@@ -1,224 +1,940 @@
 import sqlite3
+import base64
 import json
-from typing import Optional, List
+import re
+import hashlib
+from typing import Collection, Optional, List
 from datetime import datetime
-from .models import MCQItem, Difficulty, AttemptRequest
+from .models import MCQItem, Difficulty, AttemptRequest, StoreReport
+from .connection import ConnectionManager
+from .similarity import NearDuplicateIndex, topic_key
 import uuid
 
+QUESTION_COLUMNS = 'id, topic, difficulty, question, options, explanation, distractor_rationale, source, confidence'
+
+INSERT_QUESTION_SQL = '''
+    INSERT OR IGNORE INTO questions
+    (id, topic, difficulty, question, options, explanation, distractor_rationale, source, confidence,
+     question_hash, public_json, flagged)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+INSERT_ATTEMPT_SQL = '''
+    INSERT INTO attempts (id, question_id, selected, correct, user_id)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+# Attempt rows with a pre-generated id and timestamp (write-behind log);
+# re-inserting the same row is a no-op
+INSERT_ATTEMPT_ROW_SQL = '''
+    INSERT OR IGNORE INTO attempts (id, question_id, selected, correct, user_id, created_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+SELECT_QUESTION_BY_ID_SQL = f'SELECT {QUESTION_COLUMNS} FROM questions WHERE id = ?'
+
+INSERT_SIGNATURE_SQL = '''
+    INSERT OR REPLACE INTO question_signatures (question_id, topic_key, signature) VALUES (?, ?, ?)
+'''
+
+# Attempts of one archive partition, with their question's topic and difficulty
+# (kept in the archive so it can be analyzed without the question bank).
+# Rows above a rowid snapshot are left alone so that attempts written while a
+# partition is being archived are not deleted unarchived.
+ARCHIVE_ATTEMPTS_SQL = '''
+    SELECT a.id, a.question_id, q.topic, q.difficulty, a.selected, a.correct, a.user_id, a.created_at
+    FROM attempts a LEFT JOIN questions q ON q.id = a.question_id
+    WHERE a.created_at >= ? AND a.created_at < ? AND a.rowid <= ?
+    ORDER BY a.created_at, a.rowid
+'''
+
+DELETE_ARCHIVED_ATTEMPTS_SQL = '''
+    DELETE FROM attempts WHERE rowid IN (
+        SELECT rowid FROM attempts WHERE created_at >= ? AND created_at < ? AND rowid <= ? LIMIT ?
+    )
+'''
+
+# Questions the moderator flagged for review are stored but never served; the
+# partial index keeps "rowid NOT IN (SELECT ...)" exclusions cheap
+FLAGGED_ROWIDS_SQL = 'SELECT rowid FROM questions WHERE flagged'
+
+SELECT_TOPIC_SIGNATURES_SQL = 'SELECT question_id, signature FROM question_signatures WHERE topic_key = ?'
+
+# MinHash signatures for near-duplicate detection (see similarity.py), removed
+# with their question
+SIGNATURE_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS question_signatures (
+        question_id TEXT PRIMARY KEY,
+        topic_key TEXT NOT NULL,
+        signature BLOB NOT NULL
+    ) WITHOUT ROWID
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_question_signatures_topic ON question_signatures(topic_key)',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_questions_signature_delete AFTER DELETE ON questions BEGIN
+        DELETE FROM question_signatures WHERE question_id = OLD.id;
+    END
+    ''',
+]
+
+# Full-text index over question and explanation text. It is an external-content
+# FTS5 table (the text is read from questions, not stored twice) keyed by the
+# questions rowid and kept in sync by triggers. A full VACUUM may renumber
+# questions rowids, so run rebuild_search_index() after one.
+SEARCH_SCHEMA = [
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+        question, explanation, content='questions', content_rowid='rowid', tokenize='porter unicode61'
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_questions_fts_insert AFTER INSERT ON questions BEGIN
+        INSERT INTO questions_fts (rowid, question, explanation) VALUES (NEW.rowid, NEW.question, NEW.explanation);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_questions_fts_delete AFTER DELETE ON questions BEGIN
+        INSERT INTO questions_fts (questions_fts, rowid, question, explanation)
+        VALUES ('delete', OLD.rowid, OLD.question, OLD.explanation);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_questions_fts_update AFTER UPDATE OF question, explanation ON questions BEGIN
+        INSERT INTO questions_fts (questions_fts, rowid, question, explanation)
+        VALUES ('delete', OLD.rowid, OLD.question, OLD.explanation);
+        INSERT INTO questions_fts (rowid, question, explanation) VALUES (NEW.rowid, NEW.question, NEW.explanation);
+    END
+    ''',
+]
+
+# Ranked by BM25 (FTS5's rank; lower is better), ties broken by rowid so the
+# (rank, rowid) of the last row is a stable keyset cursor for the next page.
+# The page is picked first and only its rows are joined for their payloads;
+# questions is joined inside only when filtering by topic or difficulty.
+SEARCH_SQL = '''
+    SELECT q.public_json, page.rank, page.rowid FROM (
+        SELECT f.rowid, f.rank FROM questions_fts f{join}
+        WHERE questions_fts MATCH ?{filters}
+        ORDER BY f.rank, f.rowid
+        LIMIT ?
+    ) page JOIN questions q ON q.rowid = page.rowid
+    ORDER BY page.rank, page.rowid
+'''
+
+def fts_query(text: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 query: every word must match (a trailing *
+    makes it a prefix search). Operators and punctuation are not passed
+    through, so user input can't produce a syntax error.
+    """
+    terms = re.findall(r"\w+\*?", text)[:10]
+    if not terms:
+        return None
+    return " ".join(f'"{term.rstrip("*")}"' + ("*" if term.endswith("*") else "") for term in terms)
+
+def encode_search_cursor(rank: float, rowid: int) -> str:
+    return base64.urlsafe_b64encode(f"{rank!r},{rowid}".encode()).decode()
+
+def decode_search_cursor(cursor: str) -> tuple:
+    """(rank, rowid) from a cursor; raises ValueError if it is malformed"""
+    try:
+        rank, rowid = base64.urlsafe_b64decode(cursor.encode()).decode().split(",")
+        return float(rank), int(rowid)
+    except Exception:
+        raise ValueError(f"Invalid search cursor: {cursor!r}")
+
+# Analytics rollups, kept current by triggers in the same transaction as the
+# write, so reading analytics never scans questions or attempts:
+#   topic_stats     totals per (topic, difficulty); `attempted` counts questions
+#                   with at least one attempt, so questions - attempted is
+#                   the unattempted pool depth
+#   attempt_daily   attempts per (day, topic, difficulty), for time windows
+#   question_stats  attempts per question
+# Attempts deleted while rollup_freeze has a row (only ever inside the
+# retention job's own transactions) stay counted, so archived history keeps
+# showing up in analytics.
+ROLLUP_SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS rollup_freeze (frozen INTEGER PRIMARY KEY)',
+    '''
+    CREATE TABLE IF NOT EXISTS topic_stats (
+        topic TEXT NOT NULL,
+        difficulty TEXT NOT NULL,
+        questions INTEGER NOT NULL DEFAULT 0,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        correct INTEGER NOT NULL DEFAULT 0,
+        attempted INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (topic, difficulty)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS attempt_daily (
+        day TEXT NOT NULL,
+        topic TEXT NOT NULL,
+        difficulty TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        correct INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, topic, difficulty)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS question_stats (
+        question_id TEXT PRIMARY KEY,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        correct INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_questions_rollup_insert AFTER INSERT ON questions BEGIN
+        INSERT INTO topic_stats (topic, difficulty, questions) VALUES (NEW.topic, NEW.difficulty, 1)
+        ON CONFLICT (topic, difficulty) DO UPDATE SET questions = questions + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_questions_rollup_delete AFTER DELETE ON questions BEGIN
+        UPDATE topic_stats SET questions = questions - 1
+        WHERE topic = OLD.topic AND difficulty = OLD.difficulty;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_attempts_rollup_insert AFTER INSERT ON attempts BEGIN
+        INSERT INTO topic_stats (topic, difficulty, attempts, correct)
+        SELECT topic, difficulty, 1, NEW.correct FROM questions WHERE id = NEW.question_id
+        ON CONFLICT (topic, difficulty) DO UPDATE SET
+            attempts = attempts + 1, correct = correct + excluded.correct;
+
+        INSERT INTO attempt_daily (day, topic, difficulty, attempts, correct)
+        SELECT date(NEW.created_at), topic, difficulty, 1, NEW.correct FROM questions WHERE id = NEW.question_id
+        ON CONFLICT (day, topic, difficulty) DO UPDATE SET
+            attempts = attempts + 1, correct = correct + excluded.correct;
+
+        INSERT INTO question_stats (question_id, attempts, correct)
+        SELECT id, 1, NEW.correct FROM questions WHERE id = NEW.question_id
+        ON CONFLICT (question_id) DO UPDATE SET
+            attempts = attempts + 1, correct = correct + excluded.correct;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_attempts_rollup_delete AFTER DELETE ON attempts
+    WHEN NOT EXISTS (SELECT 1 FROM rollup_freeze) BEGIN
+        UPDATE topic_stats SET attempts = attempts - 1, correct = correct - OLD.correct
+        WHERE (topic, difficulty) = (SELECT topic, difficulty FROM questions WHERE id = OLD.question_id);
+
+        UPDATE attempt_daily SET attempts = attempts - 1, correct = correct - OLD.correct
+        WHERE day = date(OLD.created_at)
+          AND (topic, difficulty) = (SELECT topic, difficulty FROM questions WHERE id = OLD.question_id);
+
+        UPDATE question_stats SET attempts = attempts - 1, correct = correct - OLD.correct
+        WHERE question_id = OLD.question_id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_question_stats_first_attempt AFTER INSERT ON question_stats BEGIN
+        UPDATE topic_stats SET attempted = attempted + 1
+        WHERE (topic, difficulty) = (SELECT topic, difficulty FROM questions WHERE id = NEW.question_id);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_question_stats_delete AFTER DELETE ON question_stats BEGIN
+        UPDATE topic_stats SET attempted = attempted - 1
+        WHERE (topic, difficulty) = (SELECT topic, difficulty FROM questions WHERE id = OLD.question_id);
+    END
+    ''',
+]
+
+def normalize_question(text: str) -> str:
+    """Lowercase, collapse whitespace and drop punctuation so trivial variants compare equal"""
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+# Rows per query when a migration backfills a new column
+MIGRATION_BATCH_SIZE = 5000
+
+def question_hash(text: str) -> str:
+    """Hash of the normalized question text, used for duplicate detection"""
+    return hashlib.md5(normalize_question(text).encode()).hexdigest()
+
 class MCQDatabase:
     def __init__(self, db_path: str = "mcq_database.db"):
         self.db_path = db_path
+        self.connections = ConnectionManager(db_path)
+        self.near_duplicates = NearDuplicateIndex()
         self.init_database()
 
     def init_database(self):
         """Initialize the database with required tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Create questions table
+        with self.connections.transaction() as conn:
+            cursor = conn.cursor()
+
+            # Create questions table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS questions (
+                    id TEXT PRIMARY KEY,
+                    topic TEXT NOT NULL,
+                    difficulty TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    options TEXT NOT NULL,
+                    explanation TEXT NOT NULL,
+                    distractor_rationale TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    confidence REAL NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    approved BOOLEAN DEFAULT FALSE
+                )
+            ''')
+
+            # Create attempts table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS attempts (
+                    id TEXT PRIMARY KEY,
+                    question_id TEXT NOT NULL,
+                    selected TEXT NOT NULL,
+                    correct BOOLEAN NOT NULL,
+                    user_id TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (question_id) REFERENCES questions (id) ON DELETE CASCADE
+                )
+            ''')
+
+            # Create indexes for better performance. Each filter combination of
+            # get_next_question has an index ending in created_at, so the newest
+            # match is read straight off the index instead of sorting every row.
+            cursor.execute('DROP INDEX IF EXISTS idx_questions_topic')
+            cursor.execute('DROP INDEX IF EXISTS idx_questions_difficulty')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_questions_topic_difficulty_created ON questions(topic, difficulty, created_at)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_questions_topic_created ON questions(topic, created_at)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_questions_difficulty_created ON questions(difficulty, created_at)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_questions_created ON questions(created_at)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_attempts_question_id ON attempts(question_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_attempts_user_id ON attempts(user_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_attempts_created ON attempts(created_at)')
+
+            self._migrate_question_hash(cursor)
+            self._migrate_public_json(cursor)
+            self._migrate_flagged(cursor)
+
+            rollup_columns = [row[1] for row in cursor.execute('PRAGMA table_info(topic_stats)')]
+            if rollup_columns and 'attempted' not in rollup_columns:
+                cursor.execute('ALTER TABLE topic_stats ADD COLUMN attempted INTEGER NOT NULL DEFAULT 0')
+            attempt_delete_trigger = cursor.execute(
+                "SELECT sql FROM sqlite_master WHERE name = 'trg_attempts_rollup_delete'"
+            ).fetchone()
+            if attempt_delete_trigger and 'rollup_freeze' not in attempt_delete_trigger[0]:
+                cursor.execute('DROP TRIGGER trg_attempts_rollup_delete')
+            for statement in ROLLUP_SCHEMA + SIGNATURE_SCHEMA:
+                cursor.execute(statement)
+
+            search_index_exists = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'questions_fts'"
+            ).fetchone()
+            for statement in SEARCH_SCHEMA:
+                cursor.execute(statement)
+            if not search_index_exists:
+                cursor.execute("INSERT INTO questions_fts (questions_fts) VALUES ('rebuild')")
+            if 'attempted' not in rollup_columns:
+                self._rebuild_rollups(cursor)
+
+    def _migrate_question_hash(self, cursor: sqlite3.Cursor):
+        """Add the normalized-question hash used for deduplication, backfilling it once"""
+        columns = [row[1] for row in cursor.execute('PRAGMA table_info(questions)')]
+        added = 'question_hash' not in columns
+        if added:
+            cursor.execute('ALTER TABLE questions ADD COLUMN question_hash TEXT')
+        cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_questions_hash ON questions(question_hash)')
+        if not added:
+            return
+
+        # Oldest first; rows that collide after normalization are skipped by
+        # the unique index and keep a NULL hash (the oldest copy wins).
+        last = ('', 0)
+        while True:
+            rows = cursor.execute('''
+                SELECT created_at, rowid, question FROM questions
+                WHERE (COALESCE(created_at, ''), rowid) > (?, ?)
+                ORDER BY COALESCE(created_at, ''), rowid LIMIT ?
+            ''', (*last, MIGRATION_BATCH_SIZE)).fetchall()
+            if not rows:
+                break
+            last = (rows[-1][0] or '', rows[-1][1])
+            cursor.executemany('UPDATE OR IGNORE questions SET question_hash = ? WHERE rowid = ?', [
+                (question_hash(question), rowid) for _, rowid, question in rows
+            ])
+
+    def _migrate_public_json(self, cursor: sqlite3.Cursor):
+        """Add the pre-serialized public payload served by the quiz endpoints, backfilling it once"""
+        columns = [row[1] for row in cursor.execute('PRAGMA table_info(questions)')]
+        if 'public_json' in columns:
+            return
+        cursor.execute('ALTER TABLE questions ADD COLUMN public_json TEXT')
+
+        last_rowid = 0
+        while True:
+            rows = cursor.execute(
+                f'SELECT rowid, {QUESTION_COLUMNS} FROM questions WHERE rowid > ? ORDER BY rowid LIMIT ?',
+                (last_rowid, MIGRATION_BATCH_SIZE)
+            ).fetchall()
+            if not rows:
+                break
+            last_rowid = rows[-1][0]
+            cursor.executemany('UPDATE questions SET public_json = ? WHERE rowid = ?', [
+                (self._row_to_item(row[1:]).public_json(), row[0]) for row in rows
+            ])
+
+    @staticmethod
+    def _migrate_flagged(cursor: sqlite3.Cursor):
+        """Add the moderation flag; existing questions are unflagged"""
+        columns = [row[1] for row in cursor.execute('PRAGMA table_info(questions)')]
+        if 'flagged' not in columns:
+            cursor.execute('ALTER TABLE questions ADD COLUMN flagged BOOLEAN NOT NULL DEFAULT 0')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_questions_flagged ON questions(flagged) WHERE flagged')
+
+    @staticmethod
+    def _rebuild_rollups(cursor: sqlite3.Cursor):
+        """Recompute every rollup table from the questions and attempts tables"""
+        cursor.execute('DELETE FROM topic_stats')
+        cursor.execute('DELETE FROM attempt_daily')
+        cursor.execute('DELETE FROM question_stats')
+
+        cursor.execute('''
+            INSERT INTO topic_stats (topic, difficulty, questions)
+            SELECT topic, difficulty, COUNT(*) FROM questions GROUP BY topic, difficulty
+        ''')
+        cursor.execute('''
+            INSERT INTO topic_stats (topic, difficulty, attempts, correct)
+            SELECT q.topic, q.difficulty, COUNT(*), SUM(a.correct)
+            FROM attempts a JOIN questions q ON a.question_id = q.id
+            GROUP BY q.topic, q.difficulty
+            ON CONFLICT (topic, difficulty) DO UPDATE SET attempts = excluded.attempts, correct = excluded.correct
+        ''')
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS questions (
-                id TEXT PRIMARY KEY,
-                topic TEXT NOT NULL,
-                difficulty TEXT NOT NULL,
-                question TEXT NOT NULL,
-                options TEXT NOT NULL,
-                explanation TEXT NOT NULL,
-                distractor_rationale TEXT NOT NULL,
-                source TEXT NOT NULL,
-                confidence REAL NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                approved BOOLEAN DEFAULT FALSE
-            )
+            INSERT INTO attempt_daily (day, topic, difficulty, attempts, correct)
+            SELECT date(a.created_at), q.topic, q.difficulty, COUNT(*), SUM(a.correct)
+            FROM attempts a JOIN questions q ON a.question_id = q.id
+            GROUP BY date(a.created_at), q.topic, q.difficulty
         ''')
-        
-        # Create attempts table
+        # Each new question_stats row bumps topic_stats.attempted via its trigger
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS attempts (
-                id TEXT PRIMARY KEY,
-                question_id TEXT NOT NULL,
-                selected TEXT NOT NULL,
-                correct BOOLEAN NOT NULL,
-                user_id TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (question_id) REFERENCES questions (id) ON DELETE CASCADE
-            )
+            INSERT INTO question_stats (question_id, attempts, correct)
+            SELECT q.id, COUNT(*), SUM(a.correct)
+            FROM attempts a JOIN questions q ON a.question_id = q.id
+            GROUP BY q.id
         ''')
-        
-        # Create indexes for better performance
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_questions_topic ON questions(topic)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_questions_difficulty ON questions(difficulty)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_attempts_question_id ON attempts(question_id)')
-        
-        conn.commit()
-        conn.close()
 
-    def store_question(self, mcq_item: MCQItem) -> bool:
-        """Store a single MCQ question in the database"""
+    def rebuild_rollups(self) -> bool:
+        """
+        Recompute the analytics rollups from scratch (e.g. after bulk edits
+        that bypassed triggers). Attempts already archived by the retention
+        job are no longer in the table, so they drop out of the totals.
+        """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Check if question already exists
-            cursor.execute('SELECT id FROM questions WHERE question = ?', (mcq_item.question,))
-            if cursor.fetchone():
-                conn.close()
-                return False  # Question already exists
-            
-            cursor.execute('''
-                INSERT INTO questions 
-                (id, topic, difficulty, question, options, explanation, distractor_rationale, source, confidence)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                mcq_item.id,
-                mcq_item.topic,
-                mcq_item.difficulty.value,
-                mcq_item.question,
-                json.dumps([option.dict() for option in mcq_item.options]),
-                mcq_item.explanation,
-                json.dumps(mcq_item.distractor_rationale),
-                mcq_item.source,
-                mcq_item.estimated_confidence
-            ))
-            
-            conn.commit()
-            conn.close()
+            with self.connections.transaction() as conn:
+                self._rebuild_rollups(conn.cursor())
+            return True
+        except Exception as e:
+            print(f"Error rebuilding rollups: {e}")
+            return False
+
+    def rebuild_search_index(self) -> bool:
+        """Re-read every question into the full-text index (e.g. after a full VACUUM)"""
+        try:
+            with self.connections.transaction() as conn:
+                conn.execute("INSERT INTO questions_fts (questions_fts) VALUES ('rebuild')")
             return True
         except Exception as e:
-            print(f"Error storing question: {e}")
-            if 'conn' in locals():
-                conn.close()
+            print(f"Error rebuilding search index: {e}")
             return False
 
+    def search_questions(self, query: str, topic: Optional[str] = None, difficulty: Optional[Difficulty] = None,
+                         limit: int = 20, cursor: Optional[str] = None) -> tuple:
+        """
+        Full-text search over question and explanation text, best BM25 match
+        first. Returns (public JSON payloads, cursor for the next page or
+        None). Raises ValueError for a malformed cursor.
+        """
+        match = fts_query(query)
+        if not match:
+            return [], None
+
+        filters = f' AND f.rowid NOT IN ({FLAGGED_ROWIDS_SQL})'
+        params = [match]
+        join = ''
+        if topic:
+            filters += ' AND q.topic = ?'
+            params.append(topic)
+        if difficulty:
+            filters += ' AND q.difficulty = ?'
+            params.append(difficulty.value)
+        if topic or difficulty:
+            join = ' JOIN questions q ON q.rowid = f.rowid'
+        if cursor:
+            filters += ' AND (f.rank, f.rowid) > (?, ?)'
+            params.extend(decode_search_cursor(cursor))
+        params.append(limit + 1)
+
+        try:
+            rows = self.connections.connection().execute(SEARCH_SQL.format(join=join, filters=filters), params).fetchall()
+        except Exception as e:
+            print(f"Error searching questions: {e}")
+            return [], None
+
+        next_cursor = encode_search_cursor(*rows[limit - 1][1:]) if len(rows) > limit else None
+        return [row[0] for row in rows[:limit]], next_cursor
+
+    def close(self):
+        """Close all pooled connections"""
+        self.connections.close()
+
+    @staticmethod
+    def _row_to_item(row) -> MCQItem:
+        """Convert a questions row (QUESTION_COLUMNS order) to an MCQItem"""
+        return MCQItem(
+            id=row[0],
+            topic=row[1],
+            difficulty=Difficulty(row[2]),
+            question=row[3],
+            options=json.loads(row[4]),
+            explanation=row[5],
+            distractor_rationale=json.loads(row[6]),
+            source=row[7],
+            estimated_confidence=row[8]
+        )
+
+    @staticmethod
+    def _question_params(mcq_item: MCQItem, flagged: bool = False) -> tuple:
+        return (
+            mcq_item.id,
+            mcq_item.topic,
+            mcq_item.difficulty.value,
+            mcq_item.question,
+            json.dumps([option.model_dump() for option in mcq_item.options]),
+            mcq_item.explanation,
+            json.dumps(mcq_item.distractor_rationale),
+            mcq_item.source,
+            mcq_item.estimated_confidence,
+            question_hash(mcq_item.question),
+            mcq_item.public_json(),
+            flagged
+        )
+
+    def _load_signatures(self, conn: sqlite3.Connection, topic: str):
+        """Load a topic's stored signatures into the near-duplicate index the first time it's needed"""
+        if not self.near_duplicates.is_loaded(topic):
+            self.near_duplicates.load(topic, conn.execute(SELECT_TOPIC_SIGNATURES_SQL, (topic_key(topic),)))
+
+    def _index_signature(self, conn: sqlite3.Connection, mcq_item: MCQItem, signature: tuple):
+        conn.execute(INSERT_SIGNATURE_SQL, (mcq_item.id, topic_key(mcq_item.topic), NearDuplicateIndex.to_blob(signature)))
+        self.near_duplicates.add(mcq_item.topic, mcq_item.id, signature)
+
+    def store_questions(self, mcq_items: List[MCQItem], check_near_duplicates: bool = True,
+                        flagged: Collection[str] = ()) -> StoreReport:
+        """
+        Store a batch of MCQ questions in a single transaction.
+        Questions whose normalized text (or id) already exists, or that are
+        near duplicates of a stored question on the same topic, are skipped
+        and reported as duplicates. check_near_duplicates=False skips (and
+        doesn't index for) the near-duplicate check; backfill_signatures
+        catches up later. Ids in `flagged` are stored for review but not served.
+        """
+        report = StoreReport()
+        indexed = []
+        try:
+            with self.connections.transaction() as conn:
+                for mcq_item in mcq_items:
+                    signature = ()
+                    if self.near_duplicates.enabled and check_near_duplicates:
+                        self._load_signatures(conn, mcq_item.topic)
+                        signature = self.near_duplicates.signature(mcq_item)
+                        if self.near_duplicates.find(mcq_item.topic, signature):
+                            report.duplicates.append(mcq_item.id)
+                            continue
+
+                    cursor = conn.execute(INSERT_QUESTION_SQL, self._question_params(mcq_item, mcq_item.id in flagged))
+                    if cursor.rowcount == 1:
+                        report.stored.append(mcq_item.id)
+                        if signature:
+                            # Indexed right away so the rest of the batch is checked against it
+                            self._index_signature(conn, mcq_item, signature)
+                            indexed.append(mcq_item.id)
+                    else:
+                        report.duplicates.append(mcq_item.id)
+            return report
+        except Exception as e:
+            print(f"Error storing questions: {e}")
+            for question_id in indexed:
+                self.near_duplicates.remove(question_id)
+            return StoreReport(failed=[mcq_item.id for mcq_item in mcq_items])
+
+    def backfill_signatures(self, batch_size: int = 1000) -> dict:
+        """
+        Index stored questions that have no near-duplicate signature yet,
+        oldest first, `batch_size` rows per query and transaction. Ones that
+        are near duplicates of an older question are indexed too and listed
+        as (id, older id, similarity) for review. Does nothing while
+        near-duplicate checks are disabled.
+        """
+        result = {"indexed": 0, "near_duplicates": []}
+        if not self.near_duplicates.enabled:
+            return result
+        try:
+            last_rowid = 0
+            while True:
+                rows = self.connections.connection().execute(f'''
+                    SELECT rowid, {QUESTION_COLUMNS} FROM questions
+                    WHERE rowid > ? AND id NOT IN (SELECT question_id FROM question_signatures)
+                    ORDER BY rowid LIMIT ?
+                ''', (last_rowid, batch_size)).fetchall()
+                if not rows:
+                    break
+                last_rowid = rows[-1][0]
+
+                with self.connections.transaction() as conn:
+                    for row in rows:
+                        mcq_item = self._row_to_item(row[1:])
+                        self._load_signatures(conn, mcq_item.topic)
+                        signature = self.near_duplicates.signature(mcq_item)
+                        if not signature:
+                            continue
+                        match = self.near_duplicates.find(mcq_item.topic, signature)
+                        if match:
+                            result["near_duplicates"].append((mcq_item.id, *match))
+                        self._index_signature(conn, mcq_item, signature)
+                        result["indexed"] += 1
+        except Exception as e:
+            print(f"Error backfilling signatures: {e}")
+        return result
+
+    def store_question(self, mcq_item: MCQItem) -> bool:
+        """Store a single MCQ question in the database"""
+        return bool(self.store_questions([mcq_item]).stored)
+
+    @staticmethod
+    def _next_question_query(topic: Optional[str], difficulty: Optional[Difficulty]) -> tuple:
+        """Build the get_next_question SQL and parameters for a filter combination"""
+        query = f'SELECT {QUESTION_COLUMNS} FROM questions WHERE NOT flagged'
+        params = []
+
+        if topic:
+            query += ' AND topic = ?'
+            params.append(topic)
+
+        if difficulty:
+            query += ' AND difficulty = ?'
+            params.append(difficulty.value)
+
+        query += ' ORDER BY created_at DESC LIMIT 1'
+        return query, params
+
     def get_next_question(self, topic: Optional[str] = None, difficulty: Optional[Difficulty] = None) -> Optional[MCQItem]:
         """Get the next question for the given topic and difficulty"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            query = 'SELECT * FROM questions WHERE 1=1'
-            params = []
-            
-            if topic:
-                query += ' AND topic = ?'
-                params.append(topic)
-            
-            if difficulty:
-                query += ' AND difficulty = ?'
-                params.append(difficulty.value)
-            
-            query += ' ORDER BY created_at DESC LIMIT 1'
-            
-            cursor.execute(query, params)
-            row = cursor.fetchone()
-            conn.close()
-            
+            query, params = self._next_question_query(topic, difficulty)
+            row = self.connections.connection().execute(query, params).fetchone()
+
             if not row:
                 return None
-            
-            # Convert row to MCQItem
-            options_data = json.loads(row[4])
-            return MCQItem(
-                id=row[0],
-                topic=row[1],
-                difficulty=Difficulty(row[2]),
-                question=row[3],
-                options=options_data,
-                explanation=row[5],
-                distractor_rationale=json.loads(row[6]),
-                source=row[7],
-                estimated_confidence=row[8]
-            )
+
+            return self._row_to_item(row)
         except Exception as e:
             print(f"Error getting next question: {e}")
             return None
 
+    def explain_next_question(self, topic: Optional[str] = None, difficulty: Optional[Difficulty] = None) -> List[str]:
+        """Return SQLite's query plan for get_next_question with the given filters"""
+        query, params = self._next_question_query(topic, difficulty)
+        rows = self.connections.connection().execute(f'EXPLAIN QUERY PLAN {query}', params).fetchall()
+        return [row[3] for row in rows]
+
     def record_attempt(self, attempt: AttemptRequest, correct: bool) -> bool:
         """Record a user's attempt at answering a question"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO attempts (id, question_id, selected, correct, user_id)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (
-                str(uuid.uuid4()),
-                attempt.question_id,
-                attempt.selected,
-                correct,
-                attempt.user_id
-            ))
-            
-            conn.commit()
-            conn.close()
+            with self.connections.transaction() as conn:
+                conn.execute(INSERT_ATTEMPT_SQL, (
+                    str(uuid.uuid4()),
+                    attempt.question_id,
+                    attempt.selected,
+                    correct,
+                    attempt.user_id
+                ))
             return True
         except Exception as e:
             print(f"Error recording attempt: {e}")
-            if 'conn' in locals():
-                conn.close()
             return False
 
     def get_question_by_id(self, question_id: str) -> Optional[MCQItem]:
         """Get a specific question by ID"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT * FROM questions WHERE id = ?', (question_id,))
-            row = cursor.fetchone()
-            conn.close()
-            
+            row = self.connections.connection().execute(SELECT_QUESTION_BY_ID_SQL, (question_id,)).fetchone()
+
             if not row:
                 return None
-            
-            options_data = json.loads(row[4])
-            return MCQItem(
-                id=row[0],
-                topic=row[1],
-                difficulty=Difficulty(row[2]),
-                question=row[3],
-                options=options_data,
-                explanation=row[5],
-                distractor_rationale=json.loads(row[6]),
-                source=row[7],
-                estimated_confidence=row[8]
-            )
+
+            return self._row_to_item(row)
         except Exception as e:
             print(f"Error getting question by ID: {e}")
             return None
 
-    def get_analytics(self, topic: Optional[str] = None) -> dict:
-        """Get basic analytics for questions and attempts"""
+    def record_attempts(self, graded: List[tuple]) -> bool:
+        """Record many (AttemptRequest, correct) pairs in a single transaction"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
+            with self.connections.transaction() as conn:
+                conn.executemany(INSERT_ATTEMPT_SQL, [
+                    (str(uuid.uuid4()), attempt.question_id, attempt.selected, correct, attempt.user_id)
+                    for attempt, correct in graded
+                ])
+            return True
+        except Exception as e:
+            print(f"Error recording attempts: {e}")
+            return False
+
+    def insert_attempt_rows(self, rows: List[tuple]) -> bool:
+        """Insert (id, question_id, selected, correct, user_id, created_at) rows in one transaction"""
+        try:
+            with self.connections.transaction() as conn:
+                conn.executemany(INSERT_ATTEMPT_ROW_SQL, rows)
+            return True
+        except Exception as e:
+            print(f"Error inserting attempts: {e}")
+            return False
+
+    def get_questions_by_ids(self, question_ids: List[str]) -> dict:
+        """Get several questions with one query; returns {id: MCQItem} for those found"""
+        if not question_ids:
+            return {}
+        try:
+            placeholders = ",".join("?" * len(question_ids))
+            rows = self.connections.connection().execute(
+                f'SELECT {QUESTION_COLUMNS} FROM questions WHERE id IN ({placeholders})', list(question_ids)
+            ).fetchall()
+            return {row[0]: self._row_to_item(row) for row in rows}
+        except Exception as e:
+            print(f"Error getting questions by ID: {e}")
+            return {}
+
+    def export_questions(self, after_rowid: int = 0, limit: int = 1000, topic: Optional[str] = None,
+                         difficulty: Optional[Difficulty] = None) -> tuple:
+        """
+        One page of the question bank in storage order: (MCQItems, rowid to
+        pass as after_rowid for the next page). An empty list is the end.
+        Errors are raised rather than ending the page early, so a failed
+        export can't pass for a complete one.
+        """
+        # Filters are applied while walking the rowid order (unary + keeps
+        # SQLite off the topic indexes, which would need a sort per page)
+        query = 'SELECT rowid, ' + QUESTION_COLUMNS + ' FROM questions WHERE rowid > ?'
+        params = [after_rowid]
+        if topic:
+            query += ' AND +topic = ?'
+            params.append(topic)
+        if difficulty:
+            query += ' AND +difficulty = ?'
+            params.append(difficulty.value)
+        params.append(limit)
+
+        rows = self.connections.connection().execute(query + ' ORDER BY rowid LIMIT ?', params).fetchall()
+        if not rows:
+            return [], after_rowid
+        return [self._row_to_item(row[1:]) for row in rows], rows[-1][0]
+
+    def get_public_payloads(self, question_ids: List[str]) -> dict:
+        """Get {id: public JSON} for the questions found"""
+        if not question_ids:
+            return {}
+        try:
+            placeholders = ",".join("?" * len(question_ids))
+            rows = self.connections.connection().execute(
+                f'SELECT id, public_json FROM questions WHERE id IN ({placeholders})', list(question_ids)
+            ).fetchall()
+            return dict(rows)
+        except Exception as e:
+            print(f"Error getting public payloads: {e}")
+            return {}
+
+    def get_grading_records(self, question_ids: List[str]) -> dict:
+        """Get {id: (correct_label, explanation)} for the questions found, without building MCQItems"""
+        if not question_ids:
+            return {}
+        try:
+            placeholders = ",".join("?" * len(question_ids))
+            rows = self.connections.connection().execute(
+                f'SELECT id, options, explanation FROM questions WHERE id IN ({placeholders})', list(question_ids)
+            ).fetchall()
+            records = {}
+            for question_id, options, explanation in rows:
+                correct = next(option["label"] for option in json.loads(options) if option["is_correct"])
+                records[question_id] = (correct, explanation)
+            return records
+        except Exception as e:
+            print(f"Error getting grading records: {e}")
+            return {}
+
+    def delete_question(self, question_id: str) -> bool:
+        """Delete a question and its attempts; returns False if it didn't exist"""
+        try:
+            with self.connections.transaction() as conn:
+                conn.execute('DELETE FROM attempts WHERE question_id = ?', (question_id,))
+                conn.execute('DELETE FROM question_stats WHERE question_id = ?', (question_id,))
+                cursor = conn.execute('DELETE FROM questions WHERE id = ?', (question_id,))
+            self.near_duplicates.remove(question_id)
+            return cursor.rowcount == 1
+        except Exception as e:
+            print(f"Error deleting question: {e}")
+            return False
+
+    def max_attempt_rowid(self) -> int:
+        return self.connections.connection().execute('SELECT MAX(rowid) FROM attempts').fetchone()[0] or 0
+
+    def next_attempt_day(self, on_or_after: str = '') -> Optional[str]:
+        """The first day (YYYY-MM-DD) on or after `on_or_after` with any attempts, or None"""
+        row = self.connections.connection().execute(
+            'SELECT MIN(created_at) FROM attempts WHERE created_at >= ?', (on_or_after,)
+        ).fetchone()
+        return row[0][:10] if row[0] else None
+
+    def iter_attempts(self, since: str, until: str, max_rowid: int, batch_size: int = 5000):
+        """
+        Attempt rows (id, question_id, topic, difficulty, selected, correct,
+        user_id, created_at) created in [since, until) with rowid <= max_rowid,
+        oldest first, fetched `batch_size` at a time
+        """
+        cursor = self.connections.connection().execute(ARCHIVE_ATTEMPTS_SQL, (since, until, max_rowid))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+
+    def delete_archived_attempts(self, since: str, until: str, max_rowid: int, limit: int = 5000) -> int:
+        """
+        Delete up to `limit` of the attempts iter_attempts() returns, in one
+        transaction, without taking them out of the analytics rollups.
+        Returns the number deleted; errors are raised.
+        """
+        with self.connections.transaction() as conn:
+            conn.execute('INSERT OR IGNORE INTO rollup_freeze (frozen) VALUES (1)')
+            cursor = conn.execute(DELETE_ARCHIVED_ATTEMPTS_SQL, (since, until, max_rowid, limit))
+            conn.execute('DELETE FROM rollup_freeze')
+        return cursor.rowcount
+
+    def incremental_vacuum(self) -> int:
+        """Return free pages to the filesystem (auto_vacuum=INCREMENTAL only); returns bytes freed"""
+        conn = self.connections.connection()
+        before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        # executescript steps the pragma to completion; execute() frees one page
+        conn.executescript('PRAGMA incremental_vacuum')
+        freed = before - conn.execute('PRAGMA freelist_count').fetchone()[0]
+        return freed * conn.execute('PRAGMA page_size').fetchone()[0]
+
+    def enable_incremental_vacuum(self) -> bool:
+        """
+        Switch a database created before auto_vacuum=INCREMENTAL to it. This
+        rewrites the whole file with a full VACUUM (which may renumber
+        question rowids, so the search index is rebuilt) and must run while
+        nothing else has the database open.
+        """
+        try:
+            conn = self.connections.connection()
+            if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+                conn.execute('VACUUM')
+                return self.rebuild_search_index()
+            return True
+        except Exception as e:
+            print(f"Error enabling incremental vacuum: {e}")
+            return False
+
+    def get_storage_stats(self) -> dict:
+        """File size, free space and vacuum mode"""
+        conn = self.connections.connection()
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        return {
+            "auto_vacuum": ["none", "full", "incremental"][conn.execute('PRAGMA auto_vacuum').fetchone()[0]],
+            "size_bytes": conn.execute('PRAGMA page_count').fetchone()[0] * page_size,
+            "free_bytes": conn.execute('PRAGMA freelist_count').fetchone()[0] * page_size
+        }
+
+    def get_question_stats(self, question_ids: List[str]) -> dict:
+        """Attempt counts per question: {id: {"attempts": n, "correct": n}} for those attempted"""
+        if not question_ids:
+            return {}
+        try:
+            placeholders = ",".join("?" * len(question_ids))
+            rows = self.connections.connection().execute(
+                f'SELECT question_id, attempts, correct FROM question_stats WHERE question_id IN ({placeholders})',
+                list(question_ids)
+            ).fetchall()
+            return {row[0]: {"attempts": row[1], "correct": row[2]} for row in rows}
+        except Exception as e:
+            print(f"Error getting question stats: {e}")
+            return {}
+
+    def get_pool_depths(self) -> dict:
+        """Unattempted questions per (topic, difficulty), from the rollups"""
+        try:
+            rows = self.connections.connection().execute(
+                'SELECT topic, difficulty, questions - attempted FROM topic_stats'
+            ).fetchall()
+            return {(topic, difficulty): depth for topic, difficulty, depth in rows}
+        except Exception as e:
+            print(f"Error getting pool depths: {e}")
+            return {}
+
+    def get_analytics(self, topic: Optional[str] = None, since: Optional[str] = None,
+                      until: Optional[str] = None) -> dict:
+        """
+        Get basic analytics for questions and attempts from the rollup tables.
+        `since`/`until` (inclusive YYYY-MM-DD days) restrict attempt stats to a
+        time window; question counts are always totals.
+        """
+        try:
+            cursor = self.connections.connection().cursor()
+            topic_filter = ' AND topic = ?' if topic else ''
+            topic_params = [topic] if topic else []
+
             # Total questions by topic
-            query = '''
-                SELECT topic, difficulty, COUNT(*) as count
-                FROM questions
-                GROUP BY topic, difficulty
-            '''
-            cursor.execute(query)
+            cursor.execute(f'''
+                SELECT topic, difficulty, questions
+                FROM topic_stats
+                WHERE questions > 0{topic_filter}
+                ORDER BY topic, difficulty
+            ''', topic_params)
             questions_stats = cursor.fetchall()
-            
-            # Attempt statistics
-            query = '''
-                SELECT q.topic, a.correct, COUNT(*) as count
-                FROM attempts a
-                JOIN questions q ON a.question_id = q.id
-                GROUP BY q.topic, a.correct
-            '''
-            cursor.execute(query)
-            attempt_stats = cursor.fetchall()
-            
-            conn.close()
-            
-            return {
+
+            # Attempt totals per topic, from the daily rollup when windowed
+            if since or until:
+                query = f'''
+                    SELECT topic, SUM(attempts), SUM(correct)
+                    FROM attempt_daily
+                    WHERE day BETWEEN ? AND ?{topic_filter}
+                    GROUP BY topic
+                    ORDER BY topic
+                '''
+                params = [since or '0000-00-00', until or '9999-99-99'] + topic_params
+            else:
+                query = f'''
+                    SELECT topic, SUM(attempts), SUM(correct)
+                    FROM topic_stats
+                    WHERE 1=1{topic_filter}
+                    GROUP BY topic
+                    ORDER BY topic
+                '''
+                params = topic_params
+            cursor.execute(query, params)
+
+            # Same (topic, correct, count) rows the old GROUP BY produced
+            attempt_stats = []
+            for row_topic, attempts, correct in cursor.fetchall():
+                if attempts - correct:
+                    attempt_stats.append((row_topic, 0, attempts - correct))
+                if correct:
+                    attempt_stats.append((row_topic, 1, correct))
+
+            analytics = {
                 "questions_by_topic": questions_stats,
                 "attempt_stats": attempt_stats
             }
+            if since or until:
+                analytics["window"] = {"since": since, "until": until}
+            return analytics
         except Exception as e:
             print(f"Error getting analytics: {e}")
-            return {}
\ No newline at end of file
+            return {}
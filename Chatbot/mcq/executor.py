@@ -0,0 +1,44 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+class DBExecutor:
+    """
+    Runs blocking MCQDatabase calls off the event loop.
+
+    Reads and writes use separate thread pools ("lanes"): several reader
+    threads, since WAL lets readers run concurrently, and a single writer
+    thread, since SQLite only allows one writer at a time anyway. Each lane
+    admits a bounded number of in-flight calls; further callers wait on the
+    event loop instead of piling up in the pool queue.
+    """
+
+    def __init__(self, read_workers: int = None, write_workers: int = None, max_pending: int = None):
+        read_workers = read_workers or int(os.getenv("MCQ_DB_READ_WORKERS", "4"))
+        write_workers = write_workers or int(os.getenv("MCQ_DB_WRITE_WORKERS", "1"))
+        max_pending = max_pending or int(os.getenv("MCQ_DB_MAX_PENDING", "64"))
+
+        self._read_pool = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix="mcq-db-read")
+        self._write_pool = ThreadPoolExecutor(max_workers=write_workers, thread_name_prefix="mcq-db-write")
+        self._read_slots = asyncio.Semaphore(max_pending)
+        self._write_slots = asyncio.Semaphore(max_pending)
+
+    async def _run(self, pool: ThreadPoolExecutor, slots: asyncio.Semaphore, fn: Callable, *args, **kwargs) -> Any:
+        async with slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(pool, functools.partial(fn, *args, **kwargs))
+
+    async def read(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a read-only database call on the read lane"""
+        return await self._run(self._read_pool, self._read_slots, fn, *args, **kwargs)
+
+    async def write(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a database call that writes on the write lane"""
+        return await self._run(self._write_pool, self._write_slots, fn, *args, **kwargs)
+
+    def shutdown(self):
+        """Wait for queued calls to finish and stop the lanes"""
+        self._read_pool.shutdown(wait=True)
+        self._write_pool.shutdown(wait=True)
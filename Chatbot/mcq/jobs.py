@@ -0,0 +1,162 @@
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+from typing import AsyncIterator, Dict, List, Optional
+from .models import GenerateRequest, JobStatus, MCQItem
+from utils.logger import logger
+
+class GenerationJob:
+    """One queued /mcq/jobs generation and the progress events it has emitted"""
+
+    def __init__(self, request: GenerateRequest, key: str):
+        self.job_id = str(uuid.uuid4())
+        self.request = request
+        self.key = key
+        self.status = "pending"
+        self.items: List[MCQItem] = []
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.events: List[dict] = []
+        self._changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def emit(self, event: str, data: dict):
+        self.events.append({"event": event, "data": data})
+        # Wake every subscriber, then arm a fresh event for the next change
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def set_status(self, status: str, error: Optional[str] = None):
+        self.status = status
+        self.error = error
+        if self.finished:
+            self.finished_at = time.time()
+        self.emit("status", {"status": status, "stored": len(self.items), "error": error})
+
+    def to_status(self) -> JobStatus:
+        return JobStatus(
+            job_id=self.job_id,
+            status=self.status,
+            request=self.request,
+            items=self.items,
+            error=self.error,
+            created_at=self.created_at,
+            finished_at=self.finished_at
+        )
+
+class JobManager:
+    """
+    Runs MCQ generations as background jobs.
+
+    At most `max_workers` jobs generate at once; the rest wait as "pending".
+    Submitting a request identical to one that is still pending or running
+    returns the existing job. Finished jobs (and their items) are kept for
+    `ttl` seconds so clients can poll or replay the event stream.
+    """
+
+    def __init__(self, mcq_service, max_workers: int = None, ttl: float = None, max_pending: int = None):
+        self.mcq_service = mcq_service
+        self.max_workers = max_workers or int(os.getenv("MCQ_JOB_WORKERS", "2"))
+        self.ttl = ttl or float(os.getenv("MCQ_JOB_TTL_S", "3600"))
+        self.max_pending = max_pending or int(os.getenv("MCQ_JOB_MAX_PENDING", "100"))
+
+        self.jobs: Dict[str, GenerationJob] = {}
+        self._active_by_key: Dict[str, GenerationJob] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    @staticmethod
+    def request_key(request: GenerateRequest) -> str:
+        """Identity of a request for deduplication"""
+        raw = "|".join([
+            " ".join(request.topic.lower().split()),
+            request.difficulty.value,
+            str(request.count),
+            request.context.strip()
+        ])
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.finished and job.finished_at < cutoff]:
+            del self.jobs[job_id]
+
+    def submit(self, request: GenerateRequest) -> Optional[GenerationJob]:
+        """Queue a generation; returns the existing job for a duplicate, or None if the queue is full"""
+        self._purge_expired()
+
+        key = self.request_key(request)
+        existing = self._active_by_key.get(key)
+        if existing:
+            return existing
+
+        if sum(1 for job in self.jobs.values() if job.status == "pending") >= self.max_pending:
+            return None
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+
+        job = GenerationJob(request, key)
+        self.jobs[job.job_id] = job
+        self._active_by_key[key] = job
+        job.task = asyncio.create_task(self._run(job))
+        return job
+
+    def get(self, job_id: str) -> Optional[GenerationJob]:
+        self._purge_expired()
+        return self.jobs.get(job_id)
+
+    async def _run(self, job: GenerationJob):
+        try:
+            async with self._slots:
+                job.set_status("running")
+
+                def on_item(item: MCQItem):
+                    job.items.append(item)
+                    job.emit("item", item.model_dump(mode="json"))
+
+                items = await self.mcq_service.generate_mcqs(job.request, on_item=on_item)
+                if items:
+                    job.set_status("done")
+                else:
+                    job.set_status("failed", "Failed to generate valid MCQs")
+        except asyncio.CancelledError:
+            job.set_status("failed", "Cancelled")
+            raise
+        except Exception as e:
+            logger.error(f"MCQ job {job.job_id} failed: {e}")
+            job.set_status("failed", "Internal error")
+        finally:
+            if self._active_by_key.get(job.key) is job:
+                del self._active_by_key[job.key]
+
+    async def events(self, job: GenerationJob) -> AsyncIterator[dict]:
+        """All events of a job from the start, then live ones until it finishes"""
+        sent = 0
+        while True:
+            changed = job._changed
+            while sent < len(job.events):
+                yield job.events[sent]
+                sent += 1
+            if job.finished:
+                return
+            await changed.wait()
+
+    async def stop(self):
+        """Cancel unfinished jobs"""
+        tasks = [job.task for job in self.jobs.values() if job.task and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def get_stats(self) -> dict:
+        counts = {"pending": 0, "running": 0, "done": 0, "failed": 0}
+        for job in self.jobs.values():
+            counts[job.status] += 1
+        return {"max_workers": self.max_workers, "ttl_s": self.ttl, **counts}
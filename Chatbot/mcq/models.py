@@ -1,8 +1,46 @@
-from typing import List, Literal, Annotated, Optional
+from typing import List, Literal, Annotated, Optional, Dict
 from pydantic import BaseModel, Field
 from enum import Enum
 import uuid
 
+# JSON-schema keys Gemini's response_schema understands (and their Schema field
+# names); everything else is dropped
+GEMINI_SCHEMA_KEYS = {"type": "type", "format": "format", "description": "description", "nullable": "nullable",
+                      "enum": "enum", "items": "items", "maxItems": "max_items", "minItems": "min_items",
+                      "properties": "properties", "required": "required"}
+
+def gemini_schema(model: type, exclude: tuple = ()) -> dict:
+    """
+    Derive a Gemini response_schema from a Pydantic model: $refs are inlined,
+    unsupported keywords dropped (string/number limits become descriptions)
+    and `exclude`d top-level fields left out.
+    """
+    schema = model.model_json_schema()
+    definitions = schema.pop("$defs", {})
+
+    def convert(node: dict) -> dict:
+        if "$ref" in node:
+            node = definitions[node["$ref"].split("/")[-1]]
+        limits = []
+        if "maxLength" in node:
+            limits.append(f"at most {node['maxLength']} characters")
+        if "minimum" in node and "maximum" in node:
+            limits.append(f"between {node['minimum']} and {node['maximum']}")
+        result = {GEMINI_SCHEMA_KEYS[key]: value for key, value in node.items() if key in GEMINI_SCHEMA_KEYS}
+        if limits:
+            result["description"] = "; ".join(limits)
+        if "items" in result:
+            result["items"] = convert(result["items"])
+        if "properties" in result:
+            result["properties"] = {name: convert(child) for name, child in result["properties"].items()}
+        return result
+
+    result = convert(schema)
+    for name in exclude:
+        result["properties"].pop(name, None)
+    result["required"] = [name for name in result.get("required", []) if name not in exclude]
+    return result
+
 class Difficulty(str, Enum):
     EASY = "easy"
     MEDIUM = "medium"
@@ -13,6 +51,19 @@ class MCQOption(BaseModel):
     text: str = Field(..., max_length=80, min_length=1)
     is_correct: bool
 
+class MCQPublicOption(BaseModel):
+    label: Literal["A", "B", "C", "D"]
+    text: str
+
+class MCQPublicItem(BaseModel):
+    """What quiz takers see: a question without its answer, explanation or rationale"""
+    id: str
+    topic: str
+    difficulty: Difficulty
+    question: str
+    options: List[MCQPublicOption]
+    source: Literal["FROM_CONTEXT", "GENERATED"]
+
 class MCQItem(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     topic: str
@@ -24,6 +75,21 @@ class MCQItem(BaseModel):
     source: Literal["FROM_CONTEXT", "GENERATED"]
     estimated_confidence: float = Field(..., ge=0, le=1)
 
+    def to_public(self) -> MCQPublicItem:
+        """Public view of the question with the answer stripped"""
+        return MCQPublicItem(
+            id=self.id,
+            topic=self.topic,
+            difficulty=self.difficulty,
+            question=self.question,
+            options=[MCQPublicOption(label=option.label, text=option.text) for option in self.options],
+            source=self.source
+        )
+
+    def public_json(self) -> str:
+        """Serialized public view, stored alongside the question"""
+        return self.to_public().model_dump_json()
+
     def validate_single_correct_answer(self):
         """Ensure exactly one option is marked as correct"""
         correct_count = sum(1 for option in self.options if option.is_correct)
@@ -63,4 +129,67 @@ class AttemptResponse(BaseModel):
     correct: bool
     explanation: str
     correct_label: Literal["A", "B", "C", "D"]
-    question_id: str
\ No newline at end of file
+    question_id: str
+
+class JobStatus(BaseModel):
+    job_id: str
+    status: Literal["pending", "running", "done", "failed"]
+    request: GenerateRequest
+    items: List[MCQItem] = []   # stored so far
+    error: Optional[str] = None
+    created_at: float
+    finished_at: Optional[float] = None
+
+class QuizResponse(BaseModel):
+    items: List[MCQPublicItem]
+    requested: int
+
+class SearchResponse(BaseModel):
+    items: List[MCQPublicItem]
+    next_cursor: Optional[str] = None  # pass back as `cursor` for the next page; None on the last page
+
+class QuizAnswer(BaseModel):
+    question_id: str
+    selected: Literal["A", "B", "C", "D"]
+
+class BulkAttemptRequest(BaseModel):
+    answers: Annotated[List[QuizAnswer], Field(min_length=1, max_length=50)]
+    user_id: Optional[str] = None
+
+class AttemptResult(BaseModel):
+    question_id: str
+    correct: Optional[bool] = None
+    explanation: Optional[str] = None
+    correct_label: Optional[Literal["A", "B", "C", "D"]] = None
+    error: Optional[str] = None
+
+class BulkAttemptResponse(BaseModel):
+    results: List[AttemptResult]
+    correct_count: int
+    recorded: int
+
+class FlaggedItem(BaseModel):
+    id: str
+    violations: List[str]
+
+class ModerationReport(BaseModel):
+    items: List[MCQItem]  # Items cleared for storage
+    flagged: List[FlaggedItem] = []
+    action: Literal["drop", "flag"] = "drop"
+    per_item_ms: Dict[str, float] = {}
+    total_ms: float = 0.0
+
+class StoreReport(BaseModel):
+    stored: List[str] = []      # ids of newly inserted questions
+    duplicates: List[str] = []  # ids skipped because the question already exists
+    failed: List[str] = []      # ids not stored because the batch failed
+
+class ImportReport(BaseModel):
+    lines: int = 0       # non-blank lines read
+    stored: int = 0
+    duplicates: int = 0  # already in the bank (or a near duplicate of a stored question)
+    invalid: int = 0     # lines that are not a valid MCQItem
+    rejected: int = 0    # valid questions dropped by moderation
+    flagged: int = 0     # stored for review but not served (moderation "flag" mode)
+    failed: int = 0      # valid questions not stored because their batch failed
+    errors: List[str] = []  # the first few invalid lines, as "line N: reason"
@@ -0,0 +1,60 @@
+import os
+import time
+from typing import List, Optional
+from .models import MCQItem, ModerationReport, FlaggedItem
+from services.content_filter import ContentFilter
+from utils.logger import logger
+
+class MCQModerator:
+    """Screens generated MCQ items with the chatbot's ContentFilter before storage"""
+
+    def __init__(self, content_filter: Optional[ContentFilter] = None, action: Optional[str] = None):
+        self.content_filter = content_filter or ContentFilter()
+        # "drop" removes unsafe items, "flag" keeps them for review: they are stored
+        # with the flagged column set and never served (see store_items)
+        self.action = action or os.getenv("MCQ_MODERATION_ACTION", "drop")
+        if self.action not in ("drop", "flag"):
+            raise ValueError(f"Invalid moderation action: {self.action}")
+
+    @staticmethod
+    def item_text(item: MCQItem) -> str:
+        """All user-visible text of an item, joined so it is screened with one search"""
+        parts = [item.question, item.explanation]
+        parts.extend(option.text for option in item.options)
+        parts.extend(item.distractor_rationale)
+        return "\n".join(parts)
+
+    def moderate(self, items: List[MCQItem]) -> ModerationReport:
+        """Screen a batch of MCQ items and drop or flag the unsafe ones"""
+        batch_start = time.perf_counter()
+        cleared = []
+        flagged = []
+        per_item_ms = {}
+
+        for item in items:
+            start = time.perf_counter()
+            text = self.item_text(item)
+            is_safe = self.content_filter.is_safe_content(text)
+            per_item_ms[item.id] = (time.perf_counter() - start) * 1000
+
+            if is_safe:
+                cleared.append(item)
+                continue
+
+            flagged.append(FlaggedItem(id=item.id, violations=self.content_filter.get_violations(text)))
+            if self.action == "flag":
+                cleared.append(item)
+
+        report = ModerationReport(
+            items=cleared,
+            flagged=flagged,
+            action=self.action,
+            per_item_ms=per_item_ms,
+            total_ms=(time.perf_counter() - batch_start) * 1000
+        )
+
+        if flagged:
+            verb = "dropped" if self.action == "drop" else "flagged"
+            logger.warning(f"Moderation {verb} {len(flagged)} of {len(items)} MCQs: {[f.id for f in flagged]}")
+        logger.debug(f"Moderated {len(items)} MCQs in {report.total_ms:.3f}ms")
+        return report
@@ -0,0 +1,139 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional
+from .models import MCQItem
+from .database import MCQDatabase
+
+class GradingRecord(NamedTuple):
+    correct_label: str
+    explanation: str
+
+class QuestionCache:
+    """
+    Read-through cache of stored questions.
+
+    Questions never change once stored, so entries stay valid until the
+    question is deleted. Three bounded LRUs are kept: full MCQItems, the
+    pre-serialized public JSON payloads served to quiz takers, and much
+    smaller grading records (correct label and explanation) so answers can be
+    graded without a query, json.loads or Pydantic validation. A miss that
+    races with invalidate() is not cached.
+    """
+
+    def __init__(self, db: MCQDatabase, max_items: int = None, max_grading: int = None):
+        self.db = db
+        self.max_items = max_items or int(os.getenv("MCQ_QUESTION_CACHE_SIZE", "2000"))
+        self.max_grading = max_grading or int(os.getenv("MCQ_GRADING_CACHE_SIZE", "100000"))
+
+        self.items: "OrderedDict[str, MCQItem]" = OrderedDict()
+        self.payloads: "OrderedDict[str, bytes]" = OrderedDict()
+        self.grading_records: "OrderedDict[str, GradingRecord]" = OrderedDict()
+        self.hits = {"items": 0, "payloads": 0, "grading": 0}
+        self.misses = {"items": 0, "payloads": 0, "grading": 0}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _lookup(self, cache: OrderedDict, kind: str, keys: List[str]) -> tuple:
+        """Return (found, missing ids, generation) under the lock"""
+        found = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                value = cache.get(key)
+                if value is None:
+                    missing.append(key)
+                else:
+                    cache.move_to_end(key)
+                    found[key] = value
+            self.hits[kind] += len(found)
+            self.misses[kind] += len(missing)
+            return found, missing, self._generation
+
+    def _fill(self, cache: OrderedDict, limit: int, values: dict, generation: int):
+        with self._lock:
+            if generation != self._generation:
+                return  # Invalidated while we were reading the database
+            for key, value in values.items():
+                cache[key] = value
+                cache.move_to_end(key)
+            while len(cache) > limit:
+                cache.popitem(last=False)
+
+    def get_many(self, question_ids: List[str]) -> Dict[str, MCQItem]:
+        """Get questions by id, loading misses with one query"""
+        found, missing, generation = self._lookup(self.items, "items", question_ids)
+        if missing:
+            loaded = self.db.get_questions_by_ids(missing)
+            self._fill(self.items, self.max_items, loaded, generation)
+            found.update(loaded)
+        return found
+
+    def get(self, question_id: str) -> Optional[MCQItem]:
+        """Get a question by id, or None if it doesn't exist"""
+        return self.get_many([question_id]).get(question_id)
+
+    def payload_many(self, question_ids: List[str]) -> Dict[str, bytes]:
+        """Get public JSON payloads by id, loading misses with one query"""
+        found, missing, generation = self._lookup(self.payloads, "payloads", question_ids)
+        if missing:
+            loaded = {
+                question_id: payload.encode()
+                for question_id, payload in self.db.get_public_payloads(missing).items()
+            }
+            self._fill(self.payloads, self.max_items, loaded, generation)
+            found.update(loaded)
+        return found
+
+    def payload(self, question_id: str) -> Optional[bytes]:
+        """Get the public JSON payload for a question, or None if it doesn't exist"""
+        return self.payload_many([question_id]).get(question_id)
+
+    def grading_many(self, question_ids: List[str]) -> Dict[str, GradingRecord]:
+        """Get grading records by id, loading misses with one query"""
+        found, missing, generation = self._lookup(self.grading_records, "grading", question_ids)
+        if missing:
+            loaded = {
+                question_id: GradingRecord(*record)
+                for question_id, record in self.db.get_grading_records(missing).items()
+            }
+            self._fill(self.grading_records, self.max_grading, loaded, generation)
+            found.update(loaded)
+        return found
+
+    def grading(self, question_id: str) -> Optional[GradingRecord]:
+        """Get the grading record for a question, or None if it doesn't exist"""
+        return self.grading_many([question_id]).get(question_id)
+
+    def invalidate(self, question_id: str):
+        """Forget a question that was changed or deleted"""
+        with self._lock:
+            self._generation += 1
+            self.items.pop(question_id, None)
+            self.payloads.pop(question_id, None)
+            self.grading_records.pop(question_id, None)
+
+    def clear(self):
+        """Forget everything"""
+        with self._lock:
+            self._generation += 1
+            self.items.clear()
+            self.payloads.clear()
+            self.grading_records.clear()
+
+    def get_stats(self) -> dict:
+        """Size and hit statistics for each cache"""
+        with self._lock:
+            stats = {}
+            for kind, cache, limit in (("items", self.items, self.max_items),
+                                       ("payloads", self.payloads, self.max_items),
+                                       ("grading", self.grading_records, self.max_grading)):
+                lookups = self.hits[kind] + self.misses[kind]
+                stats[kind] = {
+                    "size": len(cache),
+                    "max_size": limit,
+                    "hits": self.hits[kind],
+                    "misses": self.misses[kind],
+                    "hit_rate": self.hits[kind] / lookups if lookups else 0.0
+                }
+            return stats
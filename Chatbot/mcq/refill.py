@@ -0,0 +1,126 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+from .models import Difficulty
+from utils.logger import logger
+
+class RefillWorker:
+    """
+    Keeps the question bank stocked in the background.
+
+    Every `interval` seconds the worker reads the unattempted-question depth
+    of each (health topic, difficulty) pool from the analytics rollups and,
+    for the emptiest pool below `low_watermark`, generates one batch of
+    questions through the normal validate -> moderate -> store pipeline. It runs
+    at low priority: one generation at a time, skipped while any interactive
+    /mcq/generate call is in flight, and only while the tokens spent in the
+    last hour are under `tokens_per_hour`. Generation uses the async Gemini
+    client, so quiz reads never wait on it.
+    """
+
+    def __init__(self, mcq_service, topics: List[str], enabled: Optional[bool] = None,
+                 low_watermark: int = None, batch_size: int = None, interval: float = None,
+                 tokens_per_hour: int = None):
+        self.mcq_service = mcq_service
+        self.topics = topics
+        if enabled is None:
+            enabled = os.getenv("MCQ_REFILL_ENABLED", "false").lower() in ("1", "true", "yes")
+        self.enabled = enabled
+        self.low_watermark = low_watermark or int(os.getenv("MCQ_REFILL_LOW_WATERMARK", "20"))
+        self.batch_size = batch_size or int(os.getenv("MCQ_REFILL_BATCH_SIZE", "5"))
+        self.interval = interval or float(os.getenv("MCQ_REFILL_INTERVAL_S", "60"))
+        self.tokens_per_hour = tokens_per_hour or int(os.getenv("MCQ_REFILL_TOKENS_PER_HOUR", "100000"))
+
+        self._task: Optional[asyncio.Task] = None
+        self._spent: deque = deque()  # (timestamp, tokens)
+        self.generated = 0
+        self.runs = 0
+        self.skipped_busy = 0
+        self.skipped_budget = 0
+        self.last_error: Optional[str] = None
+
+    async def start(self):
+        """Start the background loop if refilling is enabled"""
+        if self.enabled and not self._task:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Question refill worker started (low watermark {self.low_watermark})")
+
+    async def stop(self):
+        """Stop the loop; an in-flight generation is abandoned"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Question refill failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def tokens_last_hour(self) -> int:
+        cutoff = time.time() - 3600
+        while self._spent and self._spent[0][0] < cutoff:
+            self._spent.popleft()
+        return sum(tokens for _, tokens in self._spent)
+
+    async def pool_depths(self) -> Dict[Tuple[str, str], int]:
+        """Unattempted-question depth for every (topic, difficulty) pool, including empty ones"""
+        depths = await self.mcq_service.db_executor.read(self.mcq_service.db.get_pool_depths)
+        return {
+            (topic, difficulty.value): depths.get((topic, difficulty.value), 0)
+            for topic in self.topics
+            for difficulty in Difficulty
+        }
+
+    async def run_once(self) -> int:
+        """Refill the emptiest pool below the watermark once; returns questions stored"""
+        self.runs += 1
+        depths = await self.pool_depths()
+        low = [(depth, pool) for pool, depth in depths.items() if depth < self.low_watermark]
+        if not low:
+            return 0
+
+        if self.mcq_service.active_generations:
+            self.skipped_busy += 1
+            return 0
+        if self.tokens_last_hour() >= self.tokens_per_hour:
+            self.skipped_budget += 1
+            return 0
+
+        _, (topic, difficulty_value) = min(low)
+        difficulty = Difficulty(difficulty_value)
+        items, tokens = await self.mcq_service.request_mcqs(topic, difficulty, self.batch_size)
+        self._spent.append((time.time(), tokens))
+
+        stored = await self.mcq_service.store_items(items)
+        self.generated += len(stored)
+        logger.info(f"Refilled {topic}/{difficulty_value} with {len(stored)} questions ({tokens} tokens)")
+        return len(stored)
+
+    def get_stats(self, depths: Dict[Tuple[str, str], int]) -> dict:
+        """Worker counters plus the given pool depths"""
+        return {
+            "enabled": self.enabled,
+            "running": self._task is not None,
+            "low_watermark": self.low_watermark,
+            "tokens_last_hour": self.tokens_last_hour(),
+            "tokens_per_hour": self.tokens_per_hour,
+            "generated": self.generated,
+            "runs": self.runs,
+            "skipped_busy": self.skipped_busy,
+            "skipped_budget": self.skipped_budget,
+            "last_error": self.last_error,
+            "pools": [
+                {"topic": topic, "difficulty": difficulty, "depth": depth, "low": depth < self.low_watermark}
+                for (topic, difficulty), depth in sorted(depths.items())
+            ]
+        }
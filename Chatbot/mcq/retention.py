@@ -0,0 +1,184 @@
+import asyncio
+import glob
+import gzip
+import json
+import os
+import re
+from datetime import date, datetime, timedelta
+from typing import Iterator, Optional, Tuple
+from .database import MCQDatabase
+from .executor import DBExecutor
+from utils.logger import logger
+
+ARCHIVE_FIELDS = ("id", "question_id", "topic", "difficulty", "selected", "correct", "user_id", "created_at")
+_PARTITION = re.compile(r"attempts-(\d{4}-\d{2}-\d{2})(?:\.\d+)?\.jsonl\.gz$")
+
+class AttemptRetention:
+    """
+    Moves old quiz attempts out of the hot database.
+
+    Attempts from before the last `retention_days` UTC days are written to
+    gzipped JSONL archives under `archive_dir`, one partition per day
+    (YYYY-MM/attempts-YYYY-MM-DD.jsonl.gz), then deleted in batches of
+    `batch_size`, each in its own short write transaction so quiz traffic
+    keeps flowing. The analytics rollups keep counting them. Freed pages are
+    then handed back to the filesystem with an incremental vacuum.
+
+    A day's file is complete (fsynced and renamed into place) before any of
+    its rows are deleted. If a run stops in between, the next one archives the
+    leftover rows again as another part (attempts-YYYY-MM-DD.1.jsonl.gz), so
+    readers should dedupe by id; iter_archive() does. Questions whose only
+    attempts by a user were archived may be served to that user again.
+    """
+
+    def __init__(self, db: MCQDatabase, executor: DBExecutor, retention_days: int = None,
+                 archive_dir: str = None, batch_size: int = None, interval: float = None):
+        self.db = db
+        self.executor = executor
+        self.retention_days = retention_days if retention_days is not None else int(os.getenv("MCQ_ATTEMPT_RETENTION_DAYS", "0"))
+        self.archive_dir = archive_dir or os.getenv("MCQ_ATTEMPT_ARCHIVE_DIR", "attempt_archive")
+        self.batch_size = batch_size or int(os.getenv("MCQ_RETENTION_BATCH_SIZE", "5000"))
+        self.interval = interval or float(os.getenv("MCQ_RETENTION_INTERVAL_S", "86400"))
+
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.runs = 0
+        self.archived = 0
+        self.last_run: Optional[dict] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.retention_days > 0
+
+    async def start(self):
+        """Start the background loop if a retention period is configured"""
+        if self.enabled and not self._task:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Attempt retention started ({self.retention_days} days, archive in {self.archive_dir})")
+
+    async def stop(self):
+        """Stop the loop; an archived day whose rows weren't all deleted is finished next run"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Attempt retention failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def cutoff_day(self, today: Optional[date] = None) -> str:
+        """Attempts created before this day (YYYY-MM-DD) are archived"""
+        today = today or datetime.utcnow().date()
+        return (today - timedelta(days=self.retention_days)).isoformat()
+
+    def _partition_path(self, day: str) -> str:
+        directory = os.path.join(self.archive_dir, day[:7])
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"attempts-{day}.jsonl.gz")
+        part = 0
+        while os.path.exists(path):
+            part += 1
+            path = os.path.join(directory, f"attempts-{day}.{part}.jsonl.gz")
+        return path
+
+    def archive_day(self, day: str, until: str, max_rowid: int) -> Tuple[Optional[str], int]:
+        """Write one day's attempts to a new partition file; returns (path or None, rows)"""
+        path = self._partition_path(day)
+        temp_path = path + ".tmp"
+        count = 0
+        with open(temp_path, "wb") as raw:
+            with gzip.GzipFile(filename=os.path.basename(path), mode="wb", fileobj=raw) as out:
+                for row in self.db.iter_attempts(day, until, max_rowid, self.batch_size):
+                    record = dict(zip(ARCHIVE_FIELDS, row))
+                    record["correct"] = bool(record["correct"])
+                    out.write(json.dumps(record, separators=(",", ":")).encode() + b"\n")
+                    count += 1
+            raw.flush()
+            os.fsync(raw.fileno())
+
+        if not count:
+            os.remove(temp_path)
+            return None, 0
+        os.replace(temp_path, path)
+        return path, count
+
+    async def run_once(self, today: Optional[date] = None) -> dict:
+        """Archive and delete everything before the cutoff, then vacuum; returns what was done"""
+        async with self._lock:
+            self.runs += 1
+            cutoff = self.cutoff_day(today)
+            result = {"cutoff": cutoff, "days": 0, "archived": 0, "deleted": 0, "files": [], "freed_bytes": 0}
+
+            # Attempts written from here on are never touched by this run
+            max_rowid = await self.executor.read(self.db.max_attempt_rowid)
+            day = await self.executor.read(self.db.next_attempt_day)
+            while day and day < cutoff:
+                until = (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+                path, count = await self.executor.read(self.archive_day, day, until, max_rowid)
+                if path:
+                    result["files"].append(path)
+                    result["archived"] += count
+
+                while True:
+                    deleted = await self.executor.write(
+                        self.db.delete_archived_attempts, day, until, max_rowid, self.batch_size
+                    )
+                    result["deleted"] += deleted
+                    if deleted < self.batch_size:
+                        break
+                result["days"] += 1
+                day = await self.executor.read(self.db.next_attempt_day, until)
+
+            if result["deleted"]:
+                result["freed_bytes"] = await self.executor.write(self.db.incremental_vacuum)
+            self.archived += result["archived"]
+            self.last_run = result
+            self.last_error = None
+            if result["days"]:
+                logger.info(f"Archived {result['archived']} attempts from {result['days']} days before {cutoff}")
+            return result
+
+    def get_stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "running": self._task is not None,
+            "retention_days": self.retention_days,
+            "archive_dir": self.archive_dir,
+            "runs": self.runs,
+            "archived": self.archived,
+            "last_run": self.last_run,
+            "last_error": self.last_error
+        }
+
+def iter_archive(archive_dir: str, since: Optional[str] = None, until: Optional[str] = None) -> Iterator[dict]:
+    """
+    Archived attempts created on days in [since, until), oldest day first.
+    Rows repeated across a day's parts are returned once.
+    """
+    partitions = {}
+    for path in glob.glob(os.path.join(archive_dir, "*", "attempts-*.jsonl.gz")):
+        match = _PARTITION.search(path)
+        if match:
+            partitions.setdefault(match.group(1), []).append(path)
+
+    for day in sorted(partitions):
+        if (since and day < since) or (until and day >= until):
+            continue
+        seen = set()
+        for path in sorted(partitions[day]):
+            with gzip.open(path, "rb") as source:
+                for line in source:
+                    record = json.loads(line)
+                    if record["id"] not in seen:
+                        seen.add(record["id"])
+                        yield record
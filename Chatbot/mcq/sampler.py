@@ -0,0 +1,243 @@
+import os
+import random
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from .models import Difficulty
+from .database import MCQDatabase, FLAGGED_ROWIDS_SQL
+
+class SeenFilter:
+    """
+    Scalable Bloom filter of question rowids a user has seen.
+
+    Rowids go into the newest of a series of plain Bloom filters; once it
+    holds one rowid per BITS_PER_ITEM bits, a filter twice its size is
+    started, as long as all of them fit in `max_bits`. A rowid is seen if
+    any filter has it. A new user costs `initial_bits` (128 bytes), each full
+    filter adds ~0.1% false positives (unseen questions skipped), and the
+    default 64k-bit budget (8KiB) holds ~3000 seen questions below 1%; past
+    that the last filter keeps filling and skips slowly grow.
+    """
+
+    HASHES = 4
+    BITS_PER_ITEM = 20
+    MASK64 = (1 << 64) - 1
+
+    def __init__(self, max_bits: int, initial_bits: int = 1024):
+        self.max_bits = max_bits
+        self.filters = [bytearray(max(initial_bits, 64) // 8)]
+        self.count = 0  # Rowids in the newest filter
+
+    @property
+    def size_bits(self) -> int:
+        return sum(len(bits) for bits in self.filters) * 8
+
+    def _hashes(self, rowid: int) -> Tuple[int, int]:
+        # splitmix64 finaliser, then double hashing for the k positions
+        z = (rowid * 0x9E3779B97F4A7C15) & self.MASK64
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & self.MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & self.MASK64
+        z ^= z >> 31
+        return z & 0xFFFFFFFF, (z >> 32) | 1
+
+    def _has(self, bits: bytearray, h1: int, h2: int) -> bool:
+        size = len(bits) * 8
+        for i in range(self.HASHES):
+            position = (h1 + i * h2) % size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def add(self, rowid: int):
+        h1, h2 = self._hashes(rowid)
+        if any(self._has(bits, h1, h2) for bits in self.filters):
+            return
+        bits = self.filters[-1]
+        size = len(bits) * 8
+        for i in range(self.HASHES):
+            position = (h1 + i * h2) % size
+            bits[position >> 3] |= 1 << (position & 7)
+
+        self.count += 1
+        if self.count * self.BITS_PER_ITEM > size and self.size_bits + 2 * size <= self.max_bits:
+            self.filters.append(bytearray(2 * size // 8))
+            self.count = 0
+
+    def __contains__(self, rowid: int) -> bool:
+        h1, h2 = self._hashes(rowid)
+        return any(self._has(bits, h1, h2) for bits in self.filters)
+
+class QuestionSampler:
+    """
+    Serves a random question the user has not seen yet.
+
+    Question rowids are kept in memory per (topic, difficulty) filter and
+    loaded lazily from the indexed questions table. Only non-empty pools are
+    kept, at most `max_pools` of them (least recently used dropped first), so
+    requests for made-up topics cost a query, not memory. Each user's
+    seen-set is a SeenFilter sized from and seeded with the user's attempts,
+    then updated in memory as questions are served. Picking is rejection
+    sampling, so it is O(1) expected while a meaningful share of the pool is
+    still unseen.
+    """
+
+    MAX_RANDOM_TRIES = 32
+
+    def __init__(self, db: MCQDatabase, rng: Optional[random.Random] = None):
+        self.db = db
+        self.rng = rng or random.Random()
+        self.max_users = int(os.getenv("MCQ_SAMPLER_MAX_USERS", "10000"))
+        self.max_pools = int(os.getenv("MCQ_SAMPLER_MAX_POOLS", "256"))
+        self.filter_bits = int(os.getenv("MCQ_SAMPLER_FILTER_BITS", "65536"))
+
+        # (topic, difficulty) -> rowids; None means "any"
+        self._pools: "OrderedDict[Tuple[Optional[str], Optional[str]], array]" = OrderedDict()
+        # Highest rowid present when each pool was loaded
+        self._loaded_upto: Dict[Tuple[Optional[str], Optional[str]], int] = {}
+        self._seen: "OrderedDict[str, SeenFilter]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _pool(self, topic: Optional[str], difficulty: Optional[str]) -> array:
+        key = (topic, difficulty)
+        pool = self._pools.get(key)
+        if pool is not None:
+            self._pools.move_to_end(key)
+        else:
+            query = f'SELECT rowid FROM questions WHERE rowid NOT IN ({FLAGGED_ROWIDS_SQL})'
+            params = []
+            if topic:
+                query += ' AND topic = ?'
+                params.append(topic)
+            if difficulty:
+                query += ' AND difficulty = ?'
+                params.append(difficulty)
+
+            conn = self.db.connections.connection()
+            pool = array('q', (row[0] for row in conn.execute(query, params)))
+            if pool:
+                self._pools[key] = pool
+                self._loaded_upto[key] = max(pool)
+                if len(self._pools) > self.max_pools:
+                    evicted, _ = self._pools.popitem(last=False)
+                    del self._loaded_upto[evicted]
+        return pool
+
+    def _seen_filter(self, user_id: str) -> SeenFilter:
+        seen = self._seen.get(user_id)
+        if seen is not None:
+            self._seen.move_to_end(user_id)
+            return seen
+
+        conn = self.db.connections.connection()
+        rows = conn.execute('''
+            SELECT q.rowid FROM attempts a
+            JOIN questions q ON q.id = a.question_id
+            WHERE a.user_id = ?
+        ''', (user_id,)).fetchall()
+        # Start big enough for the user's history, so heavy users get one filter
+        initial_bits = 1024
+        while initial_bits * 2 <= self.filter_bits and initial_bits < len(rows) * SeenFilter.BITS_PER_ITEM:
+            initial_bits *= 2
+        seen = SeenFilter(self.filter_bits, initial_bits)
+        for (rowid,) in rows:
+            seen.add(rowid)
+
+        self._seen[user_id] = seen
+        if len(self._seen) > self.max_users:
+            self._seen.popitem(last=False)
+        return seen
+
+    def _pick_rowid(self, pool: array, seen: Optional[SeenFilter], picked: set) -> int:
+        """Pick a rowid not in `picked`, preferring ones not in `seen`"""
+        size = len(pool)
+        for _ in range(self.MAX_RANDOM_TRIES):
+            rowid = pool[self.rng.randrange(size)]
+            if rowid not in picked and (seen is None or rowid not in seen):
+                return rowid
+
+        # Mostly seen already: walk the pool from a random offset
+        start = self.rng.randrange(size)
+        fallback = None
+        for offset in range(size):
+            rowid = pool[(start + offset) % size]
+            if rowid in picked:
+                continue
+            if seen is None or rowid not in seen:
+                return rowid
+            if fallback is None:
+                fallback = rowid
+
+        # The user has seen everything matching; allow a repeat
+        return fallback
+
+    def next_question_id(self, topic: Optional[str] = None, difficulty: Optional[Difficulty] = None,
+                         user_id: Optional[str] = None) -> Optional[str]:
+        """Pick a random question id the user hasn't seen, or None if nothing matches"""
+        question_ids = self.next_question_ids(topic, difficulty, user_id, 1)
+        return question_ids[0] if question_ids else None
+
+    def next_question_ids(self, topic: Optional[str] = None, difficulty: Optional[Difficulty] = None,
+                          user_id: Optional[str] = None, count: int = 1) -> List[str]:
+        """Pick up to `count` distinct random question ids, unseen ones first"""
+        difficulty_value = difficulty.value if difficulty else None
+
+        with self._lock:
+            pool = self._pool(topic, difficulty_value)
+            if not pool:
+                return []
+
+            seen = self._seen_filter(user_id) if user_id else None
+            rowids = []
+            picked = set()
+            for _ in range(min(count, len(pool))):
+                rowid = self._pick_rowid(pool, seen, picked)
+                rowids.append(rowid)
+                picked.add(rowid)
+                if seen is not None:
+                    seen.add(rowid)
+
+        placeholders = ",".join("?" * len(rowids))
+        ids_by_rowid = dict(self.db.connections.connection().execute(
+            f'SELECT rowid, id FROM questions WHERE rowid IN ({placeholders})', rowids
+        ).fetchall())
+        return [ids_by_rowid[rowid] for rowid in rowids if rowid in ids_by_rowid]
+
+    def mark_seen(self, user_id: str, question_ids: List[str]):
+        """Record answered questions for a user whose seen-set is loaded"""
+        if not user_id or not question_ids:
+            return
+
+        with self._lock:
+            seen = self._seen.get(user_id)
+            if seen is None:
+                return  # Loaded from the attempts table on first use
+
+            placeholders = ",".join("?" * len(question_ids))
+            conn = self.db.connections.connection()
+            for (rowid,) in conn.execute(f'SELECT rowid FROM questions WHERE id IN ({placeholders})', question_ids):
+                seen.add(rowid)
+
+    def add_questions(self, question_ids: List[str]):
+        """Add newly stored questions to every loaded pool they match"""
+        if not question_ids:
+            return
+
+        placeholders = ",".join("?" * len(question_ids))
+        conn = self.db.connections.connection()
+        rows = conn.execute(
+            f'SELECT rowid, topic, difficulty FROM questions WHERE id IN ({placeholders}) AND NOT flagged', question_ids
+        ).fetchall()
+
+        with self._lock:
+            for rowid, topic, difficulty in rows:
+                for key in ((topic, difficulty), (topic, None), (None, difficulty), (None, None)):
+                    pool = self._pools.get(key)
+                    if pool is not None and rowid > self._loaded_upto[key]:
+                        pool.append(rowid)
+
+    def invalidate(self):
+        """Drop all loaded pools (e.g. after questions were deleted)"""
+        with self._lock:
+            self._pools.clear()
+            self._loaded_upto.clear()
@@ -1,16 +1,67 @@
+import asyncio
 import json
-import re
+import os
 import uuid
-from typing import List, Optional
-from .models import MCQItem, GenerateRequest, Difficulty
-from .database import MCQDatabase
+import zlib
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+from .models import MCQItem, GenerateRequest, Difficulty, AttemptRequest, QuizAnswer, AttemptResult, BulkAttemptResponse, ImportReport, gemini_schema
+from .database import MCQDatabase, question_hash
+from .moderation import MCQModerator
+from .executor import DBExecutor
+from .sampler import QuestionSampler
+from .attempt_log import AttemptLog
+from .question_cache import QuestionCache
+from .refill import RefillWorker
+from .retention import AttemptRetention
+from .jobs import JobManager
+from .coalescer import GenerationCoalescer
+from .stream_parser import JSONArrayStream
+from .bank_io import JSONLReader, QuestionImporter, export_page
 from services.gemini_service import GeminiService
+from services.content_filter import ContentFilter
 from utils.logger import logger
 
+# What Gemini must return in JSON mode; ids, topic and difficulty are filled in by us
+MCQ_RESPONSE_SCHEMA = {"type": "array", "items": gemini_schema(MCQItem, exclude=("id", "topic", "difficulty"))}
+
+# Concurrent chunks of one generation can't see each other's questions, so
+# each gets its own angle on the topic; identical prompts at a low
+# temperature mostly return the same questions
+QUESTION_ANGLES = [
+    "everyday habits and choices",
+    "how the body and mind work",
+    "common myths and misconceptions",
+    "real-life situations a teen might face",
+    "risks and warning signs",
+    "benefits and long-term effects",
+    "goals, planning and decision making",
+    "helping friends and family",
+]
+
 class MCQService:
-    def __init__(self, gemini_service: GeminiService, db_path: str = "mcq_database.db"):
+    def __init__(self, gemini_service: GeminiService, db_path: str = "mcq_database.db",
+                 content_filter: Optional[ContentFilter] = None):
         self.gemini_service = gemini_service
         self.db = MCQDatabase(db_path)
+        self.db_executor = DBExecutor()
+        self.sampler = QuestionSampler(self.db)
+        self.question_cache = QuestionCache(self.db)
+        self.moderator = MCQModerator(content_filter)
+        self.attempt_log = AttemptLog(self.db, self.db_executor)
+        # Refilled questions use the display names users request quizzes by, not the topic keys
+        self.refill_worker = RefillWorker(self, [
+            gemini_service.topic_names.get(topic, topic) for topic in gemini_service.health_topics
+        ])
+        self.retention = AttemptRetention(self.db, self.db_executor)
+        self.jobs = JobManager(self)
+        self.coalescer = GenerationCoalescer(self._generate_mcqs)
+        # Interactive /mcq/generate calls in flight; the refill worker yields to them
+        self.active_generations = 0
+        # Large requests are fanned out as concurrent chunks of this size
+        self.chunk_size = int(os.getenv("MCQ_GENERATION_CHUNK_SIZE", "5"))
+        self.max_top_ups = int(os.getenv("MCQ_GENERATION_MAX_TOP_UPS", "2"))
+        self._llm_slots = asyncio.Semaphore(int(os.getenv("MCQ_LLM_CONCURRENCY", "8")))
+        self.temperature = float(os.getenv("MCQ_GENERATION_TEMPERATURE", "0.4"))
         
     def build_mcq_prompt(self, topic: str, difficulty: Difficulty, count: int, context: str = "") -> str:
         """Build the all-in-one prompt for MCQ generation"""
@@ -56,87 +107,185 @@ Return only the JSON array above with your content filled in."""
 
         return prompt
     
-    async def generate_mcqs(self, request: GenerateRequest) -> List[MCQItem]:
-        """Generate MCQs using Gemini and store valid ones in database"""
+    def build_structured_prompt(self, topic: str, difficulty: Difficulty, count: int, context: str = "",
+                                avoid: Optional[List[str]] = None, angle: Optional[str] = None) -> str:
+        """Build the prompt for JSON-mode generation; the response schema carries the format"""
+        sections = [f"""Write exactly {count} multiple choice question(s) for teenagers about "{topic}" at {difficulty.value} difficulty.
+Each question has 4 options labelled A-D with exactly one is_correct, a short explanation of the answer, and one distractor_rationale per option in A-D order. Keep the text short and clear for teens and avoid sensitive topics."""]
+        if context:
+            sections.append(f"Additional context:\n{context}")
+        if angle:
+            sections.append(f"Focus on {angle}. Other parts of the topic are covered separately.")
+        if avoid:
+            sections.append("Do NOT repeat or rephrase these existing questions:\n" + "\n".join(f"- {question}" for question in avoid))
+        return "\n\n".join(sections)
+    
+    async def request_mcqs(self, topic: str, difficulty: Difficulty, count: int, context: str = "",
+                           avoid: Optional[List[str]] = None, angle: Optional[str] = None,
+                           on_item: Optional[Callable[[MCQItem], Awaitable[None]]] = None) -> Tuple[List[MCQItem], int]:
+        """
+        One streamed, structured Gemini call for `count` questions. Each
+        question is validated as soon as its closing brace arrives and passed
+        to `on_item` (if given) before the rest is generated. Returns the
+        valid items and the tokens used.
+        """
+        prompt = self.build_structured_prompt(topic, difficulty, count, context, avoid, angle)
+        stream = JSONArrayStream()
+        items: List[MCQItem] = []
+        tokens = 0
+        length = 0
+        async with self._llm_slots:
+            async for text, tokens_so_far in self.gemini_service.stream_structured(
+                    prompt, MCQ_RESPONSE_SCHEMA, temperature=self.temperature,
+                    max_output_tokens=max(1024, 400 * count)):
+                tokens = tokens_so_far or tokens
+                length += len(text)
+                for data in stream.feed(text):
+                    item = self.validate_mcq(data, topic, difficulty)
+                    if item and len(items) < count:
+                        items.append(item)
+                        if on_item:
+                            await on_item(item)
+        
+        if not stream.done:
+            logger.warning(f"MCQ response ended before the JSON array closed ({len(items)} questions kept)")
+        return items, tokens or (len(prompt) + length) // 4
+    
+    @staticmethod
+    def split_count(count: int, chunk_size: int) -> List[int]:
+        """Split a question count into chunk sizes, e.g. 12 -> [5, 5, 2]"""
+        return [min(chunk_size, count - start) for start in range(0, count, chunk_size)]
+    
+    async def generate_mcqs(self, request: GenerateRequest,
+                            on_item: Optional[Callable[[MCQItem], None]] = None) -> List[MCQItem]:
+        """
+        Generate MCQs using Gemini and store valid ones in database.
+        Concurrent requests for the same topic, difficulty and context share
+        one generation (see GenerationCoalescer).
+        `on_item` is called with each question as soon as it is stored.
+        """
+        return await self.coalescer.generate(request, on_item)
+    
+    async def _generate_mcqs(self, request: GenerateRequest,
+                             on_item: Optional[Callable[[MCQItem], None]] = None) -> List[MCQItem]:
+        """
+        Run one generation.
+        
+        Requests larger than the chunk size are split into concurrent chunks
+        (e.g. 20 -> 4 x 5), each asked for a different angle on the topic
+        (QUESTION_ANGLES, continuing in top-up rounds). Every question is stored as soon as it streams in,
+        unless another chunk already produced it; if fewer than `count`
+        questions survive, the shortfall is requested again (telling Gemini
+        which questions to avoid) up to `max_top_ups` times.
+        """
+        self.active_generations += 1
         try:
             logger.info(f"Generating {request.count} MCQs for topic: {request.topic}, difficulty: {request.difficulty}")
             
-            prompt = self.build_mcq_prompt(
-                request.topic, 
-                request.difficulty, 
-                request.count, 
-                request.context
-            )
-            
-            # Use existing Gemini service
-            response = await self.gemini_service.generate_response(prompt)
-            
-            # Extract JSON from response
-            logger.info(f"Raw Gemini response: {response[:500]}...")  # Log first 500 chars
-            json_content = self.extract_json_from_response(response)
-            if not json_content:
-                logger.error(f"No valid JSON found in Gemini response: {response}")
-                return []
+            stored_items: List[MCQItem] = []
+            seen_hashes = set()
+            storing = 0
             
-            # Parse and validate MCQs
-            mcq_items = self.parse_and_validate_mcqs(json_content, request.topic, request.difficulty)
+            async def accept(item: MCQItem):
+                # Merge: drop questions another chunk already produced, never exceed count
+                nonlocal storing
+                digest = question_hash(item.question)
+                if digest in seen_hashes or len(stored_items) + storing >= request.count:
+                    return
+                seen_hashes.add(digest)
+                storing += 1
+                try:
+                    stored_items.extend(await self.store_items([item], on_item))
+                finally:
+                    storing -= 1
             
-            # Store valid MCQs in database
-            stored_items = []
-            for item in mcq_items:
-                if self.db.store_question(item):
-                    stored_items.append(item)
-                    logger.info(f"Stored MCQ: {item.id}")
-                else:
-                    logger.warning(f"Failed to store or duplicate MCQ: {item.id}")
+            angles_used = 0
+            for attempt in range(1 + self.max_top_ups):
+                remaining = request.count - len(stored_items)
+                if remaining <= 0:
+                    break
+                if attempt:
+                    logger.info(f"Topping up {remaining} MCQs (retry {attempt})")
+                
+                avoid = [item.question for item in stored_items]
+                sizes = self.split_count(remaining, self.chunk_size)
+                angles = [None] * len(sizes)
+                if len(sizes) > 1 or angles_used:
+                    angles = [QUESTION_ANGLES[(angles_used + i) % len(QUESTION_ANGLES)] for i in range(len(sizes))]
+                    angles_used += len(sizes)
+                results = await asyncio.gather(*[
+                    self.request_mcqs(request.topic, request.difficulty, size, request.context, avoid, angle,
+                                      on_item=accept)
+                    for size, angle in zip(sizes, angles)
+                ], return_exceptions=True)
+                for result in results:
+                    if isinstance(result, Exception):
+                        logger.warning(f"MCQ chunk failed: {result}")
             
-            logger.info(f"Successfully generated and stored {len(stored_items)} MCQs")
+            logger.info(f"Successfully generated and stored {len(stored_items)} of {request.count} MCQs")
             return stored_items
             
         except Exception as e:
             logger.error(f"Error generating MCQs: {e}")
             return []
+        finally:
+            self.active_generations -= 1
+    
+    async def store_items(self, mcq_items: List[MCQItem],
+                          on_item: Optional[Callable[[MCQItem], None]] = None) -> List[MCQItem]:
+        """Moderate and store validated MCQs; returns the ones newly stored"""
+        if not mcq_items:
+            return []
+        
+        # Screen question/option/explanation text before anything is stored
+        moderation = self.moderator.moderate(mcq_items)
+        flagged_ids = {flagged.id for flagged in moderation.flagged}
+        
+        # Store valid MCQs in database (one transaction for the whole batch);
+        # flagged ones are kept for review but not served or returned
+        report = await self.db_executor.write(self.db.store_questions, moderation.items, True, flagged_ids)
+        stored_ids = set(report.stored) - flagged_ids
+        stored_items = [item for item in moderation.items if item.id in stored_ids]
+        await self.db_executor.read(self.sampler.add_questions, report.stored)
+        if report.duplicates:
+            logger.warning(f"Skipped {len(report.duplicates)} duplicate MCQs: {report.duplicates}")
+        if report.failed:
+            logger.error(f"Failed to store {len(report.failed)} MCQs")
+        if on_item:
+            for item in stored_items:
+                on_item(item)
+        return stored_items
     
     def extract_json_from_response(self, response: str) -> Optional[str]:
-        """Extract JSON content from Gemini response"""
+        """Extract the JSON array from a Gemini response, ignoring fences and surrounding text"""
+        stream = JSONArrayStream(decode=False)
+        stream.feed(response)
+        if not stream.done:
+            logger.error("No complete JSON array found in response")
+            return None
+        return response[stream.start:stream.end]
+    
+    def validate_mcq(self, item_data, topic: str, difficulty: Difficulty) -> Optional[MCQItem]:
+        """Validate one generated MCQ, filling in the fields Gemini doesn't produce; None if invalid"""
         try:
-            logger.info(f"Full Gemini response length: {len(response)}")
-            
-            # Remove any markdown formatting
-            clean_response = re.sub(r'```json\s*', '', response)
-            clean_response = re.sub(r'```\s*$', '', clean_response)
-            clean_response = clean_response.strip()
-            
-            # Find the start and end of the JSON array
-            start_idx = clean_response.find('[')
-            if start_idx == -1:
-                logger.error("No opening bracket found in response")
-                return None
-            
-            # Find the matching closing bracket
-            bracket_count = 0
-            end_idx = -1
+            # Ensure required fields
+            item_data.setdefault('topic', topic)
+            item_data.setdefault('difficulty', difficulty.value)
+            item_data.setdefault('source', 'GENERATED')
+            item_data.setdefault('estimated_confidence', 0.8)
             
-            for i in range(start_idx, len(clean_response)):
-                if clean_response[i] == '[':
-                    bracket_count += 1
-                elif clean_response[i] == ']':
-                    bracket_count -= 1
-                    if bracket_count == 0:
-                        end_idx = i + 1
-                        break
+            # Generate a unique ID if it's missing or the placeholder
+            if item_data.get('id') in [None, 'generated-uuid', 'a1b2c3d4-e5f6-7890-1234-567890abcdef']:
+                item_data['id'] = str(uuid.uuid4())
             
-            if end_idx == -1:
-                logger.error("No matching closing bracket found")
-                return None
+            # Create MCQItem and validate
+            mcq_item = MCQItem(**item_data)
+            mcq_item.validate_single_correct_answer()
+            mcq_item.validate_unique_options()
+            return mcq_item
             
-            json_content = clean_response[start_idx:end_idx]
-            logger.info(f"Extracted JSON length: {len(json_content)}")
-            
-            return json_content
-                
         except Exception as e:
-            logger.error(f"Error extracting JSON: {e}")
+            logger.warning(f"Invalid MCQ item: {e}")
             return None
     
     def parse_and_validate_mcqs(self, json_content: str, topic: str, difficulty: Difficulty) -> List[MCQItem]:
@@ -147,30 +296,7 @@ Return only the JSON array above with your content filled in."""
                 logger.error("JSON response is not a list")
                 return []
             
-            valid_mcqs = []
-            for item_data in data:
-                try:
-                    # Ensure required fields
-                    item_data.setdefault('topic', topic)
-                    item_data.setdefault('difficulty', difficulty.value)
-                    item_data.setdefault('source', 'GENERATED')
-                    item_data.setdefault('estimated_confidence', 0.8)
-                    
-                    # Generate a unique ID if it's the placeholder
-                    if item_data.get('id') in ['generated-uuid', 'a1b2c3d4-e5f6-7890-1234-567890abcdef']:
-                        item_data['id'] = str(uuid.uuid4())
-                    
-                    # Create MCQItem and validate
-                    mcq_item = MCQItem(**item_data)
-                    mcq_item.validate_single_correct_answer()
-                    mcq_item.validate_unique_options()
-                    
-                    valid_mcqs.append(mcq_item)
-                    
-                except Exception as e:
-                    logger.warning(f"Invalid MCQ item: {e}")
-                    continue
-            
+            valid_mcqs = [item for item in (self.validate_mcq(item_data, topic, difficulty) for item_data in data) if item]
             logger.info(f"Validated {len(valid_mcqs)} out of {len(data)} MCQs")
             return valid_mcqs
             
@@ -181,40 +307,195 @@ Return only the JSON array above with your content filled in."""
             logger.error(f"Error parsing MCQs: {e}")
             return []
     
-    def get_next_question(self, topic: Optional[str] = None, difficulty: Optional[Difficulty] = None) -> Optional[MCQItem]:
-        """Get the next question for quiz"""
-        return self.db.get_next_question(topic, difficulty)
+    def get_next_question(self, topic: Optional[str] = None, difficulty: Optional[Difficulty] = None,
+                          user_id: Optional[str] = None) -> Optional[MCQItem]:
+        """Get a random quiz question the user hasn't seen yet"""
+        question_id = self.sampler.next_question_id(topic, difficulty, user_id)
+        if not question_id:
+            return None
+        return self.question_cache.get(question_id)
+    
+    def get_next_question_payload(self, topic: Optional[str] = None, difficulty: Optional[Difficulty] = None,
+                                  user_id: Optional[str] = None) -> Optional[bytes]:
+        """Like get_next_question, but returns the stored public JSON (no answer) ready to send"""
+        question_id = self.sampler.next_question_id(topic, difficulty, user_id)
+        if not question_id:
+            return None
+        return self.question_cache.payload(question_id)
+    
+    def get_quiz_payloads(self, count: int, topic: Optional[str] = None, difficulty: Optional[Difficulty] = None,
+                          user_id: Optional[str] = None) -> List[bytes]:
+        """Get up to `count` distinct quiz questions (unseen first) as stored public JSON payloads ready to send"""
+        question_ids = self.sampler.next_question_ids(topic, difficulty, user_id, count)
+        payloads = self.question_cache.payload_many(question_ids)
+        return [payloads[question_id] for question_id in question_ids if question_id in payloads]
+    
+    def search_questions(self, query: str, topic: Optional[str] = None, difficulty: Optional[Difficulty] = None,
+                         limit: int = 20, cursor: Optional[str] = None) -> Tuple[List[bytes], Optional[str]]:
+        """Full-text search; returns public JSON payloads ready to send and the next-page cursor"""
+        payloads, next_cursor = self.db.search_questions(query, topic, difficulty, limit, cursor)
+        return [payload.encode() for payload in payloads], next_cursor
+    
+    def grade_answers(self, answers: List[QuizAnswer], user_id: Optional[str] = None) -> Tuple[List[AttemptResult], List[tuple]]:
+        """
+        Grade answers with one question lookup and mark them seen for the user.
+        Returns per-answer results plus (AttemptRequest, correct) pairs to record.
+        """
+        records = self.question_cache.grading_many(list({answer.question_id for answer in answers}))
+        
+        results = []
+        graded = []
+        for answer in answers:
+            record = records.get(answer.question_id)
+            if not record:
+                results.append(AttemptResult(question_id=answer.question_id, error="Question not found"))
+                continue
+            
+            is_correct = answer.selected == record.correct_label
+            results.append(AttemptResult(
+                question_id=answer.question_id,
+                correct=is_correct,
+                explanation=record.explanation,
+                correct_label=record.correct_label
+            ))
+            graded.append((AttemptRequest(question_id=answer.question_id, selected=answer.selected, user_id=user_id), is_correct))
+        
+        self.sampler.mark_seen(user_id, [attempt.question_id for attempt, _ in graded])
+        return results, graded
+    
+    @staticmethod
+    def _bulk_response(results: List[AttemptResult], recorded: int) -> BulkAttemptResponse:
+        return BulkAttemptResponse(
+            results=results,
+            correct_count=sum(1 for result in results if result.correct),
+            recorded=recorded
+        )
+    
+    async def queue_answers(self, answers: List[QuizAnswer], user_id: Optional[str] = None) -> BulkAttemptResponse:
+        """Grade a list of answers and hand the attempts to the write-behind log"""
+        results, graded = await self.db_executor.read(self.grade_answers, answers, user_id)
+        for attempt, is_correct in graded:
+            await self.attempt_log.record(attempt, is_correct)
+        return self._bulk_response(results, len(graded))
+    
+    def grade_answer(self, question_id: str, selected: str, user_id: Optional[str] = None) -> dict:
+        """Grade a single answer and mark the question seen for the user"""
+        # Validate selected option
+        if selected not in ["A", "B", "C", "D"]:
+            return {"error": "Invalid option selected. Must be A, B, C, or D"}
+        
+        record = self.question_cache.grading(question_id)
+        if not record:
+            return {"error": "Question not found"}
+        
+        self.sampler.mark_seen(user_id, [question_id])
+        
+        return {
+            "correct": selected == record.correct_label,
+            "explanation": record.explanation,
+            "correct_label": record.correct_label,
+            "question_id": question_id
+        }
     
     def submit_answer(self, question_id: str, selected: str, user_id: Optional[str] = None) -> dict:
         """Submit an answer and get result"""
         try:
-            # Validate selected option
-            if selected not in ["A", "B", "C", "D"]:
-                return {"error": "Invalid option selected. Must be A, B, C, or D"}
-            
-            question = self.db.get_question_by_id(question_id)
-            if not question:
-                return {"error": "Question not found"}
-            
-            correct_label = question.get_correct_label()
-            is_correct = selected == correct_label
-            
-            # Record attempt
-            from .models import AttemptRequest
-            attempt = AttemptRequest(question_id=question_id, selected=selected, user_id=user_id)  # type: ignore
-            self.db.record_attempt(attempt, is_correct)
+            result = self.grade_answer(question_id, selected, user_id)
+            if "error" not in result:
+                attempt = AttemptRequest(question_id=question_id, selected=selected, user_id=user_id)  # type: ignore
+                self.db.record_attempt(attempt, result["correct"])
+            return result
             
-            return {
-                "correct": is_correct,
-                "explanation": question.explanation,
-                "correct_label": correct_label,
-                "question_id": question_id
-            }
+        except Exception as e:
+            logger.error(f"Error submitting answer: {e}")
+            return {"error": "Failed to submit answer"}
+    
+    async def queue_answer(self, question_id: str, selected: str, user_id: Optional[str] = None) -> dict:
+        """Grade an answer right away; the attempt is written by the write-behind log"""
+        try:
+            result = await self.db_executor.read(self.grade_answer, question_id, selected, user_id)
+            if "error" not in result:
+                attempt = AttemptRequest(question_id=question_id, selected=selected, user_id=user_id)  # type: ignore
+                await self.attempt_log.record(attempt, result["correct"])
+            return result
             
         except Exception as e:
             logger.error(f"Error submitting answer: {e}")
             return {"error": "Failed to submit answer"}
     
-    def get_analytics(self, topic: Optional[str] = None) -> dict:
-        """Get quiz analytics"""
-        return self.db.get_analytics(topic)
\ No newline at end of file
+    def delete_question(self, question_id: str) -> bool:
+        """Delete a question everywhere it is stored or cached"""
+        deleted = self.db.delete_question(question_id)
+        self.question_cache.invalidate(question_id)
+        if deleted:
+            self.sampler.invalidate()
+        return deleted
+    
+    async def import_jsonl(self, chunks: AsyncIterator[bytes], batch_size: int = None,
+                           check_near_duplicates: bool = True) -> ImportReport:
+        """
+        Import MCQItems from a (possibly gzipped) JSONL byte stream, screened
+        by the same moderator as generated questions, one batch per write
+        transaction, reading more only once a batch is stored.
+        Gzip is inflated off the event loop, up to MCQ_IMPORT_MAX_INFLATED_BYTES.
+        Raises ValueError for a truncated or over-large gzip stream; batches
+        already stored stay stored.
+        """
+        reader = JSONLReader(int(os.getenv("MCQ_IMPORT_MAX_INFLATED_BYTES", str(1 << 30))))
+        importer = QuestionImporter(batch_size, check_near_duplicates, moderator=self.moderator)
+        
+        async def store(batch):
+            report = await self.db_executor.write(importer.store, self.db, batch)
+            await self.db_executor.read(self.sampler.add_questions, report.stored)
+        
+        async def add(lines):
+            for line in lines:
+                batch = importer.add(line)
+                if batch:
+                    await store(batch)
+        
+        async for chunk in chunks:
+            await add(await asyncio.to_thread(reader.feed, chunk))
+        await add(reader.close())
+        await store(importer.flush())
+        logger.info(f"Imported questions: {importer.report.stored} stored, {importer.report.duplicates} duplicates, "
+                    f"{importer.report.invalid} invalid, {importer.report.rejected} rejected, "
+                    f"{importer.report.flagged} flagged, {importer.report.failed} failed")
+        return importer.report
+    
+    async def export_jsonl(self, topic: Optional[str] = None, difficulty: Optional[Difficulty] = None,
+                           compress: bool = False, page_size: int = 1000) -> AsyncIterator[bytes]:
+        """The question bank as JSONL (gzipped if `compress`), one page of questions per chunk"""
+        compressor = zlib.compressobj(wbits=31) if compress else None
+        after_rowid = 0
+        while True:
+            page, after_rowid = await self.db_executor.read(export_page, self.db, after_rowid, page_size, topic, difficulty)
+            if not page:
+                break
+            yield compressor.compress(page) if compressor else page
+        if compressor:
+            yield compressor.flush()
+    
+    def get_analytics(self, topic: Optional[str] = None, since: Optional[str] = None,
+                      until: Optional[str] = None) -> dict:
+        """Get quiz analytics, optionally for a day window (YYYY-MM-DD, inclusive)"""
+        return self.db.get_analytics(topic, since=since, until=until)
+    
+    async def start(self):
+        """Start background workers (replays the attempt journal if there is one)"""
+        await self.attempt_log.start()
+        await self.refill_worker.start()
+        await self.retention.start()
+    
+    async def stop(self):
+        """Stop background work, flush buffered attempts, then release database resources"""
+        await self.refill_worker.stop()
+        await self.retention.stop()
+        await self.jobs.stop()
+        await self.attempt_log.close()
+        self.close()
+    
+    def close(self):
+        """Drain pending database calls and release connections"""
+        self.db_executor.shutdown()
+        self.db.close()
\ No newline at end of file
@@ -0,0 +1,204 @@
+import hashlib
+import operator
+import os
+import re
+import threading
+from array import array
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from .models import MCQItem
+
+# Words that carry no meaning for "is this the same question?"
+STOPWORDS = frozenset("""
+a about above after all also am an and any are as at be been before being best both but by can could
+did do does doing during each few for from had has have having her here hers him his how i if in into
+is it its itself just me more most my no nor not of off on once only or other our out over own same
+she should so some such than that the their them then there these they this those through to too
+under until up very was we were what when where which while who whom why will with would you your
+""".split())
+
+# Each token gets NUM_PERM independent 32-bit hashes from four 64-byte
+# blake2b digests (one per personalization), so a signature is just the
+# element-wise minimum over the token rows. Question vocabulary is small, so
+# token rows are cached.
+NUM_PERM = 64
+_PERSONS = [f"mcq-minhash-{i}".encode() for i in range(NUM_PERM // 16)]
+
+@lru_cache(maxsize=65536)
+def _token_hashes(token: str) -> Tuple[int, ...]:
+    return tuple(array("I", b"".join(hashlib.blake2b(token.encode(), person=person).digest() for person in _PERSONS)))
+
+def similarity_tokens(question: str, answer: str = "") -> Set[str]:
+    """Content words of a question and its correct answer, crudely singularized"""
+    words = re.sub(r"[^\w\s]", " ", f"{question} {answer}".lower()).split()
+    return {
+        word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+        for word in words if word not in STOPWORDS
+    }
+
+def minhash(tokens: Iterable[str]) -> Tuple[int, ...]:
+    """NUM_PERM-value MinHash signature of a token set"""
+    return tuple(map(min, zip(*map(_token_hashes, tokens))))
+
+def topic_key(topic: str) -> str:
+    return " ".join(topic.lower().split())
+
+class _TopicIndex:
+    """
+    One topic's signatures, packed: signature i fills signatures[i*NUM_PERM:(i+1)*NUM_PERM].
+    Each band has a dict from the hash of the band's bytes to the newest
+    slot in that bucket, and older slots are chained through `chain`
+    (slot * bands + band -> next slot, -1 at the end). A question costs
+    under 2KB instead of a tuple of ints plus a tuple key per band.
+    """
+    __slots__ = ("ids", "slots", "signatures", "chain", "heads", "free")
+
+    def __init__(self, bands: int):
+        self.ids: List[Optional[str]] = []
+        self.slots: Dict[str, int] = {}
+        self.signatures = array("I")
+        self.chain = array("i")
+        self.heads: List[Dict[int, int]] = [{} for _ in range(bands)]
+        self.free: List[int] = []
+
+class NearDuplicateIndex:
+    """
+    In-memory MinHash/LSH index of question signatures, one per topic.
+
+    A question's signature is the MinHash of the content words in its text
+    and correct answer, so "Which food is a good source of protein?" and
+    "What food is a good protein source?" (same answer) collide. Signatures
+    are split into `bands` bands; questions sharing any band are candidates,
+    and a candidate whose estimated Jaccard similarity is at least
+    `threshold` is a near duplicate. With 16 bands of 4 rows, pairs at 0.7
+    similarity become candidates ~99% of the time.
+
+    The index only holds what it has been given: the database loads a
+    topic's stored signatures the first time that topic is checked and adds
+    new ones as questions are stored. A threshold of 0 disables checks.
+    """
+
+    def __init__(self, threshold: float = None, bands: int = 16):
+        self.threshold = threshold if threshold is not None else float(os.getenv("MCQ_NEAR_DUPLICATE_THRESHOLD", "0.7"))
+        self.bands = bands
+        self.rows = NUM_PERM // bands
+
+        self._topics: Dict[str, _TopicIndex] = {}
+        self._lock = threading.Lock()
+        self.checks = 0
+        self.matches = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    @staticmethod
+    def signature(item: MCQItem) -> Tuple[int, ...]:
+        answer = next((option.text for option in item.options if option.is_correct), "")
+        return minhash(similarity_tokens(item.question, answer))
+
+    def _band_keys(self, blob: bytes) -> List[int]:
+        # Hash collisions only add candidates, which are then compared in full
+        width = self.rows * 4
+        return [hash(blob[band * width:(band + 1) * width]) for band in range(self.bands)]
+
+    def is_loaded(self, topic: str) -> bool:
+        return topic_key(topic) in self._topics
+
+    def load(self, topic: str, rows: Iterable[Tuple[str, bytes]]):
+        """Index a topic's stored (question id, signature blob) rows"""
+        key = topic_key(topic)
+        with self._lock:
+            self._topics.setdefault(key, _TopicIndex(self.bands))
+            for question_id, blob in rows:
+                if len(blob) == NUM_PERM * 4:
+                    self._add(key, question_id, blob)
+
+    def find(self, topic: str, signature: Tuple[int, ...]) -> Optional[Tuple[str, float]]:
+        """Most similar indexed question of the topic at or above the threshold, as (id, similarity)"""
+        if not signature:
+            return None
+        with self._lock:
+            self.checks += 1
+            index = self._topics.get(topic_key(topic))
+            if not index or not index.slots:
+                return None
+
+            candidates = set()
+            for band, band_key in enumerate(self._band_keys(self.to_blob(signature))):
+                slot = index.heads[band].get(band_key, -1)
+                while slot >= 0:
+                    candidates.add(slot)
+                    slot = index.chain[slot * self.bands + band]
+
+            best = None
+            for slot in candidates:
+                other = index.signatures[slot * NUM_PERM:(slot + 1) * NUM_PERM]
+                similarity = sum(map(operator.eq, signature, other)) / NUM_PERM
+                if similarity >= self.threshold and (best is None or similarity > best[1]):
+                    best = (index.ids[slot], similarity)
+            if best:
+                self.matches += 1
+            return best
+
+    def add(self, topic: str, question_id: str, signature: Tuple[int, ...]):
+        if not signature:
+            return
+        with self._lock:
+            self._add(topic_key(topic), question_id, self.to_blob(signature))
+
+    def _add(self, key: str, question_id: str, blob: bytes):
+        index = self._topics.setdefault(key, _TopicIndex(self.bands))
+        if question_id in index.slots:
+            return
+        if index.free:
+            slot = index.free.pop()
+            index.ids[slot] = question_id
+            index.signatures[slot * NUM_PERM:(slot + 1) * NUM_PERM] = array("I", blob)
+        else:
+            slot = len(index.ids)
+            index.ids.append(question_id)
+            index.signatures.frombytes(blob)
+            index.chain.extend([-1] * self.bands)
+        index.slots[question_id] = slot
+        for band, band_key in enumerate(self._band_keys(blob)):
+            index.chain[slot * self.bands + band] = index.heads[band].get(band_key, -1)
+            index.heads[band][band_key] = slot
+
+    def remove(self, question_id: str):
+        with self._lock:
+            index = next((index for index in self._topics.values() if question_id in index.slots), None)
+            if not index:
+                return
+            slot = index.slots.pop(question_id)
+            blob = index.signatures[slot * NUM_PERM:(slot + 1) * NUM_PERM].tobytes()
+            for band, band_key in enumerate(self._band_keys(blob)):
+                # Unlink the slot from its bucket's chain
+                following = index.chain[slot * self.bands + band]
+                previous, current = -1, index.heads[band].get(band_key, -1)
+                while current >= 0 and current != slot:
+                    previous, current = current, index.chain[current * self.bands + band]
+                if current != slot:
+                    continue
+                if previous >= 0:
+                    index.chain[previous * self.bands + band] = following
+                elif following >= 0:
+                    index.heads[band][band_key] = following
+                else:
+                    del index.heads[band][band_key]
+            index.ids[slot] = None
+            index.free.append(slot)
+
+    @staticmethod
+    def to_blob(signature: Tuple[int, ...]) -> bytes:
+        return array("I", signature).tobytes()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "threshold": self.threshold,
+                "topics_loaded": len(self._topics),
+                "indexed": sum(len(index.slots) for index in self._topics.values()),
+                "checks": self.checks,
+                "matches": self.matches
+            }
@@ -0,0 +1,101 @@
+import json
+import re
+from typing import Any, List, Optional
+
+# Characters that can change the parser state outside / inside a string
+_STRUCTURAL = re.compile(r'[\[\]{}"\\]')
+_STRING_END = re.compile(r'["\\]')
+
+class JSONArrayStream:
+    """
+    Incremental parser for a JSON array that arrives in pieces.
+
+    feed() returns every element completed by the new text, as soon as its
+    closing brace arrives, without waiting for the rest of the array.
+    Anything before the opening bracket (markdown fences, a sentence of
+    preamble) and after the closing one is ignored. Only the structural
+    characters are visited, using a regex, and the buffer is trimmed after
+    each element, so the total work stays linear in the response length.
+    Object and array elements are returned; top-level scalars are skipped
+    and elements that fail to decode are counted in `errors`.
+
+    With decode=False the raw text of each element is returned instead.
+    `start` and `end` are the offsets of the array in the fed text.
+    """
+
+    def __init__(self, decode: bool = True):
+        self.decode = decode
+        self.started = False
+        self.done = False
+        self.start: Optional[int] = None
+        self.end: Optional[int] = None
+        self.errors = 0
+
+        self._buffer = ""
+        self._offset = 0  # Position of _buffer[0] in everything fed so far
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._element_start: Optional[int] = None
+
+    def feed(self, text: str) -> List[Any]:
+        """Add text; returns the elements it completed"""
+        if self.done:
+            return []
+
+        self._buffer += text
+        buffer = self._buffer
+        pos = self._pos
+        elements = []
+
+        while True:
+            match = (_STRING_END if self._in_string else _STRUCTURAL).search(buffer, pos)
+            if not match:
+                pos = max(pos, len(buffer))
+                break
+            char = match.group()
+            index = match.start()
+            pos = index + 1
+
+            if char == "\\":
+                pos = index + 2  # Skip the escaped character, even if it hasn't arrived yet
+            elif self._in_string:
+                self._in_string = False
+            elif not self.started:
+                if char == "[":
+                    self.started = True
+                    self.start = self._offset + index
+            elif char == '"':
+                self._in_string = True
+            elif char in "[{":
+                if self._depth == 0:
+                    self._element_start = index
+                self._depth += 1
+            elif self._depth == 0:
+                if char == "]":
+                    self.done = True
+                    self.end = self._offset + pos
+                    break
+            else:
+                self._depth -= 1
+                if self._depth == 0 and self._element_start is not None:
+                    self._emit(buffer[self._element_start:pos], elements)
+                    self._element_start = None
+
+        # Keep only what an unfinished element still needs
+        keep = self._element_start if self._element_start is not None else min(pos, len(buffer))
+        self._buffer = buffer[keep:]
+        self._offset += keep
+        self._pos = pos - keep
+        if self._element_start is not None:
+            self._element_start = 0
+        return elements
+
+    def _emit(self, raw: str, elements: List[Any]):
+        if not self.decode:
+            elements.append(raw)
+            return
+        try:
+            elements.append(json.loads(raw))
+        except ValueError:
+            self.errors += 1
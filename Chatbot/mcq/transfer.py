@@ -0,0 +1,47 @@
+"""
+Bulk import/export of the question bank as JSONL (see bank_io.py).
+
+    python -m mcq.transfer export questions.jsonl.gz [--db mcq_database.db] [--topic T] [--difficulty D]
+    python -m mcq.transfer import questions.jsonl.gz [--db mcq_database.db] [--batch-size N] [--skip-near-duplicate-check]
+
+Exports to a path ending in .gz are compressed; imports detect gzip by content
+and screen every question with MCQModerator (MCQ_MODERATION_ACTION applies).
+"""
+import argparse
+import sys
+import time
+from .models import Difficulty
+from .database import MCQDatabase
+from .bank_io import export_file, import_file
+
+def main():
+    parser = argparse.ArgumentParser(description="Import or export the MCQ question bank as JSONL")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("path", help="JSONL file; .gz is compressed")
+    parser.add_argument("--db", default="mcq_database.db")
+    parser.add_argument("--topic", help="export only this topic")
+    parser.add_argument("--difficulty", choices=[difficulty.value for difficulty in Difficulty],
+                        help="export only this difficulty")
+    parser.add_argument("--batch-size", type=int, help="questions per import transaction")
+    parser.add_argument("--skip-near-duplicate-check", action="store_true",
+                        help="only reject exact duplicates (faster for banks known to be clean); "
+                             "index them later with python -m mcq.backfill_signatures")
+    args = parser.parse_args()
+
+    db = MCQDatabase(args.db)
+    began = time.perf_counter()
+    if args.command == "export":
+        difficulty = Difficulty(args.difficulty) if args.difficulty else None
+        count = export_file(db, args.path, args.topic, difficulty)
+        print(f"Exported {count} questions in {time.perf_counter() - began:.1f}s")
+    else:
+        report = import_file(db, args.path, args.batch_size, not args.skip_near_duplicate_check)
+        for error in report.errors:
+            print(error, file=sys.stderr)
+        print(f"Read {report.lines} lines in {time.perf_counter() - began:.1f}s: {report.stored} stored, "
+              f"{report.duplicates} duplicates, {report.invalid} invalid, {report.rejected} rejected, "
+              f"{report.flagged} flagged, {report.failed} failed")
+    db.close()
+
+if __name__ == "__main__":
+    main()
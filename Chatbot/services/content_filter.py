@@ -1,6 +1,52 @@
 import re
+import os
+import hashlib
+import threading
+from collections import OrderedDict
 from typing import Tuple, List
 
+# Patterns of the form \b(word|other phrase)\b are merged into a single trie
+LITERAL_GROUP = re.compile(r"^\\b\(([a-z0-9 '\-|]+)\)\\b$")
+
+def _trie_regex(words: List[str]) -> str:
+    """Build a prefix-factored regex for a list of literal words"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def emit(node: dict) -> str:
+        alternatives = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not alternatives:
+            return ""
+        body = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return emit(trie)
+
+def combine_patterns(patterns: List[str]) -> "re.Pattern":
+    """
+    Combine all patterns into one regex, meant to be searched on lowercased text.
+    Literal word lists become one trie-shaped group; anything else is kept as-is
+    (case-insensitive) in the alternation.
+    """
+    literals = []
+    others = []
+    for pattern in patterns:
+        match = LITERAL_GROUP.match(pattern)
+        if match:
+            literals.extend(match.group(1).split("|"))
+        else:
+            others.append(f"(?i:{pattern})")
+
+    alternatives = others
+    if literals:
+        alternatives = [rf"\b{_trie_regex(literals)}\b"] + others
+
+    return re.compile("|".join(alternatives) or r"(?!)")
+
 class ContentFilter:
     def __init__(self):
         # Define inappropriate content patterns
@@ -17,8 +63,18 @@ class ContentFilter:
             r'\b(racist|homophob|transphob|sexist)\b',
         ]
 
+        # Verdict cache: repeated messages/responses skip the regex scan entirely.
+        # Entries are keyed by ruleset version + content hash, so bumping the
+        # version (see set_patterns) invalidates everything cached before it.
+        self.ruleset_version = 0
+        self.verdict_cache_size = int(os.getenv("FILTER_CACHE_SIZE", "10000"))
+        self.verdict_cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._cache_lock = threading.Lock()
+
         # Compile regex patterns
-        self.compiled_patterns = [re.compile(pattern, re.IGNORECASE) for pattern in self.inappropriate_patterns]
+        self._compile_patterns()
 
         # Safe topics for teens
         self.safe_topics = [
@@ -28,18 +84,55 @@ class ContentFilter:
             'career', 'college', 'future', 'goals', 'dreams'
         ]
 
+    def _compile_patterns(self):
+        """Compile the current ruleset and invalidate cached verdicts"""
+        self.compiled_patterns = [re.compile(pattern, re.IGNORECASE) for pattern in self.inappropriate_patterns]
+        # All patterns in one regex so a text is screened with a single search
+        self.combined_pattern = combine_patterns(self.inappropriate_patterns)
+
+        with self._cache_lock:
+            self.ruleset_version += 1
+            self.verdict_cache.clear()
+
+    def set_patterns(self, patterns: List[str]):
+        """Replace the inappropriate content patterns (bumps the ruleset version)"""
+        self.inappropriate_patterns = list(patterns)
+        self._compile_patterns()
+
+    def add_pattern(self, pattern: str):
+        """Add an inappropriate content pattern (bumps the ruleset version)"""
+        self.set_patterns(self.inappropriate_patterns + [pattern])
+
+    def _verdict_key(self, content: str) -> str:
+        """Generate a verdict cache key for the current ruleset"""
+        return f"{self.ruleset_version}:{hashlib.md5(content.encode()).hexdigest()}"
+
     def is_safe_content(self, content: str) -> bool:
         """
         Check if content is safe for teens
         """
-        content_lower = content.lower()
+        key = self._verdict_key(content)
 
-        # Check for inappropriate patterns
-        for pattern in self.compiled_patterns:
-            if pattern.search(content_lower):
-                return False
+        with self._cache_lock:
+            verdict = self.verdict_cache.get(key)
+            if verdict is not None:
+                self.verdict_cache.move_to_end(key)
+                self.cache_hits += 1
+                return verdict
+            self.cache_misses += 1
 
-        return True
+        verdict = self._scan(content)
+
+        with self._cache_lock:
+            self.verdict_cache[key] = verdict
+            if len(self.verdict_cache) > self.verdict_cache_size:
+                self.verdict_cache.popitem(last=False)
+
+        return verdict
+
+    def _scan(self, content: str) -> bool:
+        """Run the regex patterns over content (uncached)"""
+        return self.combined_pattern.search(content.lower()) is None
 
     def filter_response(self, response: str) -> Tuple[str, bool]:
         """
@@ -83,4 +176,22 @@ class ContentFilter:
             if pattern.search(content_lower):
                 violations.append(f"Pattern {i+1} matched")
 
-        return violations
\ No newline at end of file
+        return violations
+
+    def get_cache_stats(self) -> dict:
+        """Get verdict cache statistics"""
+        with self._cache_lock:
+            lookups = self.cache_hits + self.cache_misses
+            return {
+                "ruleset_version": self.ruleset_version,
+                "size": len(self.verdict_cache),
+                "max_size": self.verdict_cache_size,
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+                "hit_rate": self.cache_hits / lookups if lookups else 0.0
+            }
+
+    def clear_cache(self):
+        """Clear cached verdicts (counters are kept)"""
+        with self._cache_lock:
+            self.verdict_cache.clear()
\ No newline at end of file
@@ -1,9 +1,10 @@
 import google.generativeai as genai
 import os
-from typing import Optional, Dict, List
+from typing import AsyncIterator, Optional, Dict, List, Tuple
 import time
 import re
 from dotenv import load_dotenv
+from services.topic_classifier import TopicClassifier
 
 load_dotenv()
 
@@ -60,20 +61,31 @@ class GeminiService:
             'injuries_violence': ['safety', 'bullying', 'fight', 'accident', 'emergency', 'first aid'],
             'growing_healthy': ['growth', 'development', 'teen years', 'adolescence', 'maturing']
         }
+        self.topic_classifier = TopicClassifier(self.health_topics)
+
+        # How each topic is named to users and in quiz questions
+        self.topic_names = {
+            'nutrition': 'Nutrition',
+            'sanitation': 'Sanitation',
+            'health': 'Health',
+            'substance_abuse': 'Substance Abuse Prevention',
+            'healthy_lifestyle': 'Healthy Lifestyle',
+            'reproductive_health': 'Reproductive Health',
+            'hiv_prevention': 'HIV Prevention',
+            'injuries_violence': 'Injuries and Violence',
+            'growing_healthy': 'Growing Up Healthy'
+        }
 
         # Conversation context storage
         self.conversation_context = {}
 
     def identify_topic(self, message: str) -> Optional[str]:
         """Identify the health topic from the user's message"""
-        message_lower = message.lower()
-
-        for topic, keywords in self.health_topics.items():
-            for keyword in keywords:
-                if keyword in message_lower:
-                    return topic
+        return self.topic_classifier.classify(message)
 
-        return None
+    def identify_topics(self, messages: List[str]) -> List[Optional[str]]:
+        """Identify the health topic for a batch of messages or log lines"""
+        return self.topic_classifier.classify_batch(messages)
 
     def get_topic_prompt(self, topic: str, message: str) -> str:
         """Get specialized prompt for each health topic"""
@@ -336,6 +348,28 @@ Provide a helpful, age-appropriate response that promotes health and wellness.
             print(f"Gemini API error: {e}")
             return "I'm experiencing technical difficulties. Please try again later."
 
+    async def stream_structured(self, prompt: str, response_schema: dict, temperature: float = 0.4,
+                                max_output_tokens: int = 4096) -> AsyncIterator[Tuple[str, int]]:
+        """
+        Stream a prompt in JSON mode, constrained to `response_schema`.
+        No topic routing or conversation context is added. Yields each text
+        chunk as it arrives with the tokens used so far (0 if not reported).
+        """
+        response = await self.model.generate_content_async(
+            prompt,
+            stream=True,
+            generation_config={
+                "response_mime_type": "application/json",
+                "response_schema": response_schema,
+                "temperature": temperature,
+                "max_output_tokens": max_output_tokens
+            }
+        )
+        async for chunk in response:
+            usage = getattr(chunk, "usage_metadata", None)
+            text = chunk.text if chunk.parts else ""  # The last chunk may carry only usage
+            yield text, getattr(usage, "total_token_count", 0) if usage else 0
+
     def get_follow_up_questions(self, topic: str) -> List[str]:
         """Get suggested follow-up questions for a topic"""
         follow_ups = {
@@ -0,0 +1,106 @@
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Tokens are runs of letters/digits (apostrophes kept so "don't" stays one
+# word; quote marks around a word are trimmed in tokenize())
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+def stem(token: str) -> str:
+    """
+    Very light suffix stripping so "drinking"/"drinks" match "drink" while
+    unrelated words such as "safety" never collapse onto "safe".
+    """
+    # Plurals first, so "feelings" and "feeling" both go on to lose "-ing"
+    if len(token) > 4 and token.endswith('ies'):
+        token = token[:-3] + 'y'
+    elif len(token) > 4 and token.endswith('es'):
+        token = token[:-2]
+    elif len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        token = token[:-1]
+
+    if len(token) > 5 and token.endswith('ing'):
+        token = token[:-3]
+    elif len(token) > 4 and token.endswith('ed'):
+        token = token[:-2]
+
+    if len(token) > 3 and token.endswith('e'):
+        token = token[:-1]
+
+    return token
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, split on word boundaries, trim quote marks and stem"""
+    tokens = (token.strip("'") for token in TOKEN_PATTERN.findall(text.lower()))
+    return [stem(token) for token in tokens if token]
+
+class TopicClassifier:
+    """
+    Precompiled keyword classifier for health topics.
+
+    Keywords (single words or phrases) are stored in a token trie, so a message
+    is classified with a single left-to-right pass over its tokens. Every topic
+    is scored; phrases weigh as many points as they have words.
+    """
+
+    def __init__(self, topics: Dict[str, List[str]]):
+        self.topics = list(topics.keys())
+        self._topic_rank = {topic: rank for rank, topic in enumerate(self.topics)}
+        # Trie node: {"children": {token: node}, "topics": [topic, ...]}
+        self._trie = {"children": {}, "topics": []}
+
+        for topic, keywords in topics.items():
+            for keyword in keywords:
+                self._add_keyword(tokenize(keyword), topic)
+
+    def _add_keyword(self, tokens: List[str], topic: str):
+        if not tokens:
+            return
+
+        node = self._trie
+        for token in tokens:
+            node = node["children"].setdefault(token, {"children": {}, "topics": []})
+
+        if topic not in node["topics"]:
+            node["topics"].append(topic)
+
+    def score(self, message: str) -> Dict[str, Tuple[int, int]]:
+        """
+        Score every topic for a message.
+        Returns: {topic: (score, first_match_position)}
+        """
+        tokens = tokenize(message)
+        scores: Dict[str, Tuple[int, int]] = {}
+        root_children = self._trie["children"]
+
+        for start in range(len(tokens)):
+            node = root_children.get(tokens[start])
+            length = 1
+            while node is not None:
+                for topic in node["topics"]:
+                    score, first = scores.get(topic, (0, start))
+                    scores[topic] = (score + length, first)
+                if start + length >= len(tokens):
+                    break
+                node = node["children"].get(tokens[start + length])
+                length += 1
+
+        return scores
+
+    def classify(self, message: str) -> Optional[str]:
+        """
+        Return the best matching topic, or None.
+        Ties are broken by earliest match in the message, then by topic order.
+        """
+        scores = self.score(message)
+        if not scores:
+            return None
+
+        return min(
+            scores,
+            key=lambda topic: (-scores[topic][0], scores[topic][1], self._topic_rank[topic])
+        )
+
+    def classify_batch(self, messages: Iterable[str]) -> List[Optional[str]]:
+        """Classify many messages (e.g. log lines) at once"""
+        classify = self.classify
+        return [classify(message) for message in messages]
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests for the content filter's verdict cache (no Gemini API key or server needed)
+Run directly or with pytest
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.content_filter import ContentFilter
+
+def test_pattern_updates_invalidate_verdicts():
+    content_filter = ContentFilter()
+    message = "Is vaping bad for my lungs?"
+    assert content_filter.is_safe_content(message)
+    assert content_filter.is_safe_content(message), "second check is served from the cache"
+    version = content_filter.get_cache_stats()["ruleset_version"]
+
+    content_filter.add_pattern(r'\b(vaping|vape)\b')
+    assert content_filter.get_cache_stats()["ruleset_version"] == version + 1
+    assert not content_filter.is_safe_content(message), "cached safe verdict must not survive add_pattern"
+    assert content_filter.filter_response(message)[1]
+
+    content_filter.set_patterns([r'\b(smoking)\b'])
+    assert content_filter.is_safe_content(message), "cached unsafe verdict must not survive set_patterns"
+    assert content_filter.is_safe_content("I want to kill this exam")
+    assert not content_filter.is_safe_content("Is smoking cool?")
+    print("✅ pattern updates invalidate cached verdicts")
+
+def test_verdict_cache_bound_and_counters():
+    content_filter = ContentFilter()
+    content_filter.verdict_cache_size = 3
+
+    for i in range(10):
+        content_filter.is_safe_content(f"message number {i}")
+    stats = content_filter.get_cache_stats()
+    assert stats["size"] == 3 and stats["max_size"] == 3
+    assert stats["hits"] == 0 and stats["misses"] == 10
+
+    # Hits refresh an entry, so the least recently used one is evicted next
+    content_filter.is_safe_content("message number 7")
+    content_filter.is_safe_content("message number 10")
+    content_filter.is_safe_content("message number 7")
+    content_filter.is_safe_content("message number 8")
+    stats = content_filter.get_cache_stats()
+    assert stats["size"] == 3
+    assert stats["hits"] == 2 and stats["misses"] == 12, "message 8 was evicted by message 10"
+    assert stats["hit_rate"] == 2 / 14
+
+    content_filter.clear_cache()
+    stats = content_filter.get_cache_stats()
+    assert stats["size"] == 0 and stats["hits"] == 2, "clearing keeps the counters"
+    print("✅ verdict cache stays bounded and counts hits and misses")
+
+if __name__ == "__main__":
+    test_pattern_updates_invalidate_verdicts()
+    test_verdict_cache_bound_and_counters()
+    print("\n🎉 Content filter tests passed")
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+CPU hot path regression gate: benchmarks/hot_paths.py's calibrated comparison
+against benchmarks/baseline.json (no Gemini API key or server needed)
+Run directly or with pytest
+"""
+
+import os
+import sys
+import logging
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from benchmarks.hot_paths import baseline_ratio, build_cases, load_baseline, measure
+from utils.logger import logger
+
+MARGIN = float(os.getenv("HOT_PATHS_MARGIN", "0.25"))
+MIN_TIME = 0.1
+ROUNDS = 7
+
+def test_hot_paths_against_baseline():
+    baseline = load_baseline()
+    assert baseline, "record one with python benchmarks/hot_paths.py --save-baseline"
+    logger.setLevel(logging.WARNING)
+
+    regressions = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, (fn, calls) in build_cases(workdir).items():
+            ratio = baseline_ratio(measure(fn, calls, MIN_TIME, ROUNDS), baseline.get(name))
+            if ratio is not None and ratio < 1 - MARGIN:
+                # Confirm before failing, so one noisy measurement isn't a regression
+                ratio = max(ratio, baseline_ratio(measure(fn, calls, MIN_TIME, ROUNDS), baseline.get(name)))
+            if ratio is not None and ratio < 1 - MARGIN:
+                regressions.append(f"{name}: {(ratio - 1) * 100:+.1f}%")
+
+    assert not regressions, f"slower than baseline (relative to calibration) by more than {MARGIN:.0%}: {regressions}"
+    print("✅ hot paths within margin of baseline")
+
+if __name__ == "__main__":
+    test_hot_paths_against_baseline()
@@ -0,0 +1,880 @@
+#!/usr/bin/env python3
+"""
+Tests for the MCQ database layer (no Gemini API key or server needed)
+Run directly or with pytest
+"""
+
+import os
+import sys
+import json
+import asyncio
+import gzip
+import tempfile
+import threading
+import uuid
+import datetime
+import sqlite3
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+# Fixtures are templated ("Question 1", "Question 2", ...), which near-duplicate
+# detection would rightly reject; test_near_duplicates enables it explicitly
+os.environ.setdefault("MCQ_NEAR_DUPLICATE_THRESHOLD", "0")
+
+from mcq import database as mcq_database
+from mcq import MCQDatabase, MCQItem, MCQPublicItem, MCQService, AttemptRequest, GenerateRequest, Difficulty
+from mcq.sampler import QuestionSampler, SeenFilter
+from mcq.executor import DBExecutor
+from mcq.attempt_log import AttemptLog
+from mcq.question_cache import QuestionCache
+from mcq.refill import RefillWorker
+from mcq.retention import AttemptRetention, iter_archive
+from mcq.bank_io import JSONLReader, MAX_LINE_BYTES, export_file, import_file
+
+def make_item(question: str, topic: str = "nutrition", difficulty: Difficulty = Difficulty.EASY, correct: str = "B") -> MCQItem:
+    return MCQItem(
+        id=str(uuid.uuid4()),
+        topic=topic,
+        difficulty=difficulty,
+        question=question,
+        options=[{"label": label, "text": f"Option {label}", "is_correct": label == correct} for label in "ABCD"],
+        explanation=f"{correct} is correct",
+        distractor_rationale=["Why A", "Why B", "Why C", "Why D"],
+        source="GENERATED",
+        estimated_confidence=0.9
+    )
+
+def new_database() -> MCQDatabase:
+    workdir = tempfile.mkdtemp()
+    return MCQDatabase(os.path.join(workdir, "test.db"))
+
+def test_store_and_fetch():
+    db = new_database()
+    item = make_item("Which food is a good source of protein?")
+
+    assert db.store_question(item)
+    assert not db.store_question(item), "duplicate question should be rejected"
+
+    fetched = db.get_question_by_id(item.id)
+    assert fetched is not None and fetched.get_correct_label() == "B"
+    assert db.get_next_question("nutrition", Difficulty.EASY).id == item.id
+    assert db.get_next_question("health") is None
+    print("✅ store and fetch")
+
+def test_legacy_migrations():
+    # A bank created before question_hash / public_json existed
+    path = os.path.join(tempfile.mkdtemp(), "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE questions (
+            id TEXT PRIMARY KEY, topic TEXT NOT NULL, difficulty TEXT NOT NULL, question TEXT NOT NULL,
+            options TEXT NOT NULL, explanation TEXT NOT NULL, distractor_rationale TEXT NOT NULL,
+            source TEXT NOT NULL, confidence REAL NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, approved BOOLEAN DEFAULT FALSE
+        )
+    ''')
+    texts = ["Why drink water?", "How much sleep do teens need?", "why drink WATER"]
+    items = [make_item(text) for text in texts]
+    conn.executemany('INSERT INTO questions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)', [
+        (item.id, item.topic, item.difficulty.value, item.question,
+         json.dumps([option.model_dump() for option in item.options]), item.explanation,
+         json.dumps(item.distractor_rationale), item.source, item.estimated_confidence, f"2024-01-0{i + 1}")
+        for i, item in enumerate(items)
+    ])
+    conn.commit()
+    conn.close()
+
+    batch_size = mcq_database.MIGRATION_BATCH_SIZE
+    mcq_database.MIGRATION_BATCH_SIZE = 1  # Exercise paging
+    try:
+        db = MCQDatabase(path)
+    finally:
+        mcq_database.MIGRATION_BATCH_SIZE = batch_size
+    rows = dict(db.connections.connection().execute("SELECT id, question_hash FROM questions").fetchall())
+    assert rows[items[0].id] and rows[items[1].id] and rows[items[2].id] is None, "the oldest copy keeps the hash"
+    assert json.loads(db.get_public_payloads([items[1].id])[items[1].id])["question"] == texts[1]
+
+    # Later starts don't scan the bank again
+    statements = []
+    db.connections.connection().set_trace_callback(statements.append)
+    db.init_database()
+    db.connections.connection().set_trace_callback(None)
+    assert not [sql for sql in statements if sql.lstrip().startswith("SELECT") and "FROM questions" in sql]
+    db.close()
+    print("✅ legacy schema migrations backfill once")
+
+def test_bulk_store_dedup():
+    db = new_database()
+    first = make_item("Which food is a good source of protein?")
+    db.store_question(first)
+
+    batch = [
+        make_item("How much sleep do teens need?"),
+        make_item("which food is a GOOD source of protein"),   # normalized duplicate of stored row
+        make_item("How much sleep do teens need ?"),          # duplicate within the batch
+        make_item("Why is breakfast important?"),
+    ]
+    report = db.store_questions(batch)
+
+    assert report.stored == [batch[0].id, batch[3].id]
+    assert report.duplicates == [batch[1].id, batch[2].id]
+    assert not report.failed
+    print("✅ bulk store with dedup")
+
+def test_connection_settings():
+    db = new_database()
+    conn = db.connections.connection()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+    assert db.connections.connection() is conn, "connection should be reused within a thread"
+    print("✅ connection settings")
+
+def test_next_question_plans():
+    db = new_database()
+    for topic in (None, "nutrition"):
+        for difficulty in (None, Difficulty.HARD):
+            plan = " ".join(db.explain_next_question(topic, difficulty))
+            assert "USING INDEX" in plan and "TEMP B-TREE" not in plan, plan
+    print("✅ next-question query plans use indexes")
+
+def test_sampler_does_not_repeat():
+    db = new_database()
+    items = [make_item(f"Healthy habit question number {i}?") for i in range(12)]
+    db.store_questions(items)
+    db.record_attempt(AttemptRequest(question_id=items[0].id, selected="A", user_id="alice"), False)
+
+    sampler = QuestionSampler(db)
+    served = [sampler.next_question_id("nutrition", Difficulty.EASY, "alice") for _ in range(11)]
+    assert len(set(served)) == 11 and items[0].id not in served, "unseen questions should come first"
+    assert sampler.next_question_id("nutrition", Difficulty.EASY, "alice") is not None, "repeats once all are seen"
+
+    extra = make_item("A brand new question about water?")
+    db.store_questions([extra])
+    sampler.add_questions([extra.id])
+    assert sampler.next_question_id("nutrition", Difficulty.EASY, "alice") == extra.id
+    assert sampler.next_question_id("health", None, "alice") is None
+    assert sampler._seen["alice"].size_bits == 1024, "light users get a small filter"
+
+    # Empty pools aren't cached and loaded pools are bounded, so made-up topics don't leak memory
+    for i in range(50):
+        sampler.next_question_id(f"made-up-{i}", None)
+    assert ("health", None) not in sampler._pools and len(sampler._pools) == 1
+    sampler.max_pools = 2
+    for difficulty in (None, Difficulty.EASY):
+        sampler.next_question_id(None, difficulty)
+    assert list(sampler._pools) == [(None, None), (None, "easy")], "least recently used pool is dropped"
+
+    # Seen filters start small and add bigger filters as they fill
+    seen = SeenFilter(max_bits=8192, initial_bits=1024)
+    for rowid in range(1, 401):
+        seen.add(rowid)
+    assert seen.size_bits == 1024 + 2048 + 4096, "grows up to the 8192-bit budget"
+    assert all(rowid in seen for rowid in range(1, 401))
+    assert sum(rowid in seen for rowid in range(1000, 11000)) < 300, "false positives stay rare"
+    print("✅ per-user sampler serves unseen questions")
+
+def test_batch_quiz_and_attempts():
+    db = new_database()
+    items = [make_item(f"Quiz question about fruit number {i}?") for i in range(6)]
+    db.store_questions(items)
+
+    sampler = QuestionSampler(db)
+    quiz = sampler.next_question_ids("nutrition", Difficulty.EASY, "bob", count=4)
+    assert len(quiz) == 4 and len(set(quiz)) == 4
+    rest = sampler.next_question_ids("nutrition", Difficulty.EASY, "bob", count=10)
+    assert len(rest) == 6 and set(quiz[:2]) < set(rest), "capped at pool size, unseen first"
+    assert set(rest[:2]).isdisjoint(quiz)
+
+    found = db.get_questions_by_ids([items[0].id, "missing", items[1].id])
+    assert set(found) == {items[0].id, items[1].id}
+
+    graded = [(AttemptRequest(question_id=item.id, selected="B", user_id="bob"), True) for item in items[:3]]
+    assert db.record_attempts(graded)
+    assert db.get_analytics()["attempt_stats"] == [("nutrition", 1, 3)]
+    print("✅ batch quiz fetch and bulk attempts")
+
+def test_executor_lanes():
+    db = new_database()
+    item = make_item("How much water should teens drink?")
+    db.store_question(item)
+    executor = DBExecutor(read_workers=4, write_workers=1, max_pending=2)
+    lock = threading.Lock()
+    running = {"write": 0, "max_write": 0, "read": 0, "max_read": 0}
+    release = threading.Event()
+
+    def tracked(kind: str, fn=None, wait: bool = False):
+        with lock:
+            running[kind] += 1
+            running[f"max_{kind}"] = max(running[f"max_{kind}"], running[kind])
+        try:
+            if wait:
+                assert release.wait(5)
+            else:
+                threading.Event().wait(0.02)
+            return (threading.current_thread().name, fn() if fn else None)
+        finally:
+            with lock:
+                running[kind] -= 1
+
+    async def scenario():
+        # Writes run one at a time on the single writer thread
+        results = await asyncio.gather(*[executor.write(tracked, "write") for _ in range(5)])
+        assert running["max_write"] == 1
+        assert all(name.startswith("mcq-db-write") for name, _ in results)
+
+        # Reads (against the real database) still complete while a write is in progress
+        blocked_write = asyncio.ensure_future(executor.write(tracked, "write", wait=True))
+        await asyncio.sleep(0.05)
+        name, found = await asyncio.wait_for(
+            executor.read(tracked, "read", lambda: db.get_question_by_id(item.id)), timeout=2
+        )
+        assert name.startswith("mcq-db-read") and found.id == item.id
+        assert running["write"] == 1, "the write is still running"
+
+        # Each lane admits at most max_pending calls; the rest wait on the event loop
+        blocked_reads = [asyncio.ensure_future(executor.read(tracked, "read", wait=True)) for _ in range(4)]
+        await asyncio.sleep(0.05)
+        assert running["read"] == 2 and running["max_read"] == 2
+        release.set()
+        await asyncio.gather(blocked_write, *blocked_reads)
+        assert running["max_read"] == 2 and running["read"] == running["write"] == 0
+
+    asyncio.run(scenario())
+    executor.shutdown()
+    print("✅ executor read/write lanes")
+
+def test_attempt_log_batches_and_replays():
+    db = new_database()
+    item = make_item("How many hours of sleep do teens need?")
+    db.store_question(item)
+    journal = os.path.join(os.path.dirname(db.db_path), "attempts.journal")
+    count_attempts = lambda: db.connections.connection().execute("SELECT COUNT(*) FROM attempts").fetchone()[0]
+
+    async def crash_before_flush():
+        log = AttemptLog(db, DBExecutor(), journal_path=journal, flush_interval=60)
+        await log.start()
+        for i in range(5):
+            await log.record(AttemptRequest(question_id=item.id, selected="B", user_id=f"u{i}"), True)
+        assert count_attempts() == 0 and log.get_stats()["pending"] == 5
+        # Simulate a crash: the flusher never runs and close() is never called
+        log._task.cancel()
+
+    async def restart_and_flush():
+        log = AttemptLog(db, DBExecutor(), journal_path=journal, batch_size=3, flush_interval=60)
+        await log.start()
+        assert count_attempts() == 5, "journaled attempts are replayed on start"
+        for i in range(7):
+            await log.record(AttemptRequest(question_id=item.id, selected="A", user_id=f"v{i}"), False)
+        await log.close()
+        assert log.batches == 3, "7 attempts flush as batches of 3"
+
+    asyncio.run(crash_before_flush())
+    asyncio.run(restart_and_flush())
+    assert count_attempts() == 12
+    assert os.path.getsize(journal) == 0, "journal is truncated once flushed"
+
+    # Under sustained load the journal is cut at the last flushed row, not only when idle
+    async def sustained_load():
+        log = AttemptLog(db, DBExecutor(), journal_path=journal, batch_size=50, flush_interval=60, fsync=True)
+        log.COMPACT_BYTES = 4096
+        await log.start()
+        for i in range(200):
+            await log.record(AttemptRequest(question_id=item.id, selected="C", user_id=f"w{i}"), False)
+            if i % 50 == 49:
+                await asyncio.sleep(0.05)  # Let the flusher write the batch
+                assert log.get_stats()["journal_bytes"] < 50 * 200, "flushed rows are dropped from the journal"
+        assert os.path.getsize(journal) == log.get_stats()["journal_bytes"]
+        log._task.cancel()
+
+    async def restart():
+        log = AttemptLog(db, DBExecutor(), journal_path=journal)
+        await log.start()
+        await log.close()
+
+    asyncio.run(sustained_load())
+    asyncio.run(restart())
+    assert count_attempts() == 212, "unflushed rows are replayed from the compacted journal"
+
+    # Replaying the same journal rows again is a no-op
+    rows = db.connections.connection().execute(
+        "SELECT id, question_id, selected, correct, user_id, created_at FROM attempts"
+    ).fetchall()
+    assert db.insert_attempt_rows(rows) and count_attempts() == 212
+    print("✅ write-behind attempt log batches, journals and replays")
+
+def test_analytics_rollups():
+    db = new_database()
+    items = [
+        make_item("Which fruit has the most vitamin C?", topic="nutrition"),
+        make_item("How often should you wash your hands?", topic="sanitation", difficulty=Difficulty.HARD),
+        make_item("Is skipping breakfast a good idea?", topic="nutrition", difficulty=Difficulty.MEDIUM),
+    ]
+    db.store_questions(items)
+    rows = [
+        (str(uuid.uuid4()), items[0].id, "B", True, "u1", "2026-03-01 09:00:00"),
+        (str(uuid.uuid4()), items[0].id, "A", False, "u2", "2026-03-02 09:00:00"),
+        (str(uuid.uuid4()), items[1].id, "B", True, "u1", "2026-03-02 10:00:00"),
+        (str(uuid.uuid4()), items[2].id, "B", True, "u3", "2026-03-05 10:00:00"),
+    ]
+    db.insert_attempt_rows(rows)
+
+    analytics = db.get_analytics()
+    assert analytics["questions_by_topic"] == [("nutrition", "easy", 1), ("nutrition", "medium", 1), ("sanitation", "hard", 1)]
+    assert analytics["attempt_stats"] == [("nutrition", 0, 1), ("nutrition", 1, 2), ("sanitation", 1, 1)]
+
+    assert db.get_analytics(topic="sanitation") == {
+        "questions_by_topic": [("sanitation", "hard", 1)],
+        "attempt_stats": [("sanitation", 1, 1)]
+    }
+    windowed = db.get_analytics(topic="nutrition", since="2026-03-02", until="2026-03-04")
+    assert windowed["attempt_stats"] == [("nutrition", 0, 1)]
+    assert db.get_question_stats([items[0].id]) == {items[0].id: {"attempts": 2, "correct": 1}}
+
+    # Triggers and a full rebuild agree, including after deletes
+    with db.connections.transaction() as conn:
+        conn.execute("DELETE FROM attempts WHERE id = ?", (rows[0][0],))
+    incremental = db.get_analytics(since="2026-01-01")
+    assert db.rebuild_rollups()
+    assert db.get_analytics(since="2026-01-01") == incremental
+    assert incremental["attempt_stats"] == [("nutrition", 0, 1), ("nutrition", 1, 1), ("sanitation", 1, 1)]
+    print("✅ analytics rollups")
+
+def test_question_cache():
+    db = new_database()
+    items = [make_item(f"Which snack is healthiest, option set {i}?", correct="CDAB"[i % 4]) for i in range(4)]
+    db.store_questions(items)
+    cache = QuestionCache(db, max_items=2)
+
+    assert cache.get(items[0].id).id == items[0].id
+    assert set(cache.get_many([item.id for item in items])) == {item.id for item in items}
+    assert len(cache.items) == 2, "item cache is bounded"
+
+    record = cache.grading(items[1].id)
+    assert record.correct_label == "D" and record.explanation == "D is correct"
+    assert cache.grading(items[1].id) is record
+    assert cache.grading("missing") is None
+    stats = cache.get_stats()["grading"]
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+    db.record_attempt(AttemptRequest(question_id=items[1].id, selected="D", user_id="u1"), True)
+    assert db.delete_question(items[1].id)
+    cache.invalidate(items[1].id)
+    assert cache.grading(items[1].id) is None and cache.get(items[1].id) is None
+    assert not db.delete_question(items[1].id)
+    assert db.get_analytics()["attempt_stats"] == []
+    print("✅ question cache")
+
+def test_public_payloads():
+    db = new_database()
+    item = make_item("Which drink is best after sports?")
+    db.store_question(item)
+
+    payload = db.get_public_payloads([item.id])[item.id]
+    public = MCQPublicItem.model_validate_json(payload)
+    assert public == item.to_public() and "is_correct" not in payload and "explanation" not in payload
+
+    # Stored with the row, so it survives a reopen (older banks are backfilled, see test_legacy_migrations)
+    reopened = MCQDatabase(db.db_path)
+    assert reopened.get_public_payloads([item.id])[item.id] == payload
+    print("✅ pre-serialized public payloads")
+
+class FakeGemini:
+    """Stands in for GeminiService: returns `batch` generated questions per call"""
+    health_topics = {"nutrition": [], "substance_abuse": []}
+    topic_names = {"nutrition": "Nutrition", "substance_abuse": "Substance Abuse Prevention"}
+
+    def __init__(self, batch: int = 3, delay: float = 0):
+        self.batch = batch
+        self.delay = delay
+        self.calls = []
+        self.prompts = []
+        self.pieces = 0
+
+    def _response(self, prompt: str) -> str:
+        self.calls.append(prompt)
+        items = []
+        for i in range(self.batch):
+            item = make_item(f"Generated question {len(self.calls)}-{i}?").model_dump(mode="json")
+            del item["topic"], item["difficulty"]  # filled in from the request
+            items.append(item)
+        return json.dumps(items)
+
+    async def stream_structured(self, prompt, response_schema, temperature=0.4, max_output_tokens=4096):
+        """Streams the response in small pieces, fenced like a chatty model would"""
+        self.prompts.append((prompt, response_schema, temperature))
+        await asyncio.sleep(self.delay)
+        text = f"```json\n{self._response(prompt)}\n```"
+        for start in range(0, len(text), 16):
+            self.pieces += 1
+            await asyncio.sleep(0)
+            yield text[start:start + 16], 500 if start + 16 >= len(text) else 0
+
+def new_service(gemini: FakeGemini) -> MCQService:
+    return MCQService(gemini, db_path=new_database().db_path)
+
+def test_refill_worker():
+    service = new_service(FakeGemini())
+    worker = RefillWorker(service, ["nutrition"], enabled=True, low_watermark=3, batch_size=3,
+                          tokens_per_hour=1000)
+
+    async def refill():
+        depths = await worker.pool_depths()
+        assert set(depths) == {("nutrition", d.value) for d in Difficulty} and not any(depths.values())
+        assert await worker.run_once() == 3
+        assert await worker.run_once() == 3
+        assert await worker.run_once() == 0 and worker.skipped_budget == 1, "token budget stops refills"
+
+        service.active_generations = 1
+        worker.tokens_per_hour = 10 ** 6
+        assert await worker.run_once() == 0 and worker.skipped_busy == 1, "yields to interactive generation"
+
+    asyncio.run(refill())
+    assert service.db.get_pool_depths() == {("nutrition", "easy"): 3, ("nutrition", "hard"): 3}
+
+    # The service's own worker generates under topic display names, as users request them
+    assert service.refill_worker.topics == ["Nutrition", "Substance Abuse Prevention"]
+    service.active_generations = 0
+    service.refill_worker.low_watermark = 1
+    assert asyncio.run(service.refill_worker.run_once()) == 3
+    assert service.get_next_question("Nutrition", Difficulty.EASY).topic == "Nutrition"
+    service.close()
+    print("✅ refill worker")
+
+def test_generation_jobs():
+    service = new_service(FakeGemini(batch=4, delay=0.05))
+    request = GenerateRequest(topic="Nutrition", difficulty=Difficulty.MEDIUM, count=4)
+
+    async def run_job():
+        job = service.jobs.submit(request)
+        duplicate = service.jobs.submit(GenerateRequest(topic="  nutrition ", difficulty=Difficulty.MEDIUM, count=4))
+        assert duplicate is job, "identical pending jobs are merged"
+        assert job.to_status().status == "pending"
+
+        events = [event async for event in service.jobs.events(job)]
+        kinds = [event["event"] for event in events]
+        assert kinds == ["status", "item", "item", "item", "item", "status"], kinds
+        assert events[-1]["data"]["status"] == "done" and events[-1]["data"]["stored"] == 4
+
+        status = service.jobs.get(job.job_id).to_status()
+        assert status.status == "done" and len(status.items) == 4
+        assert service.jobs.submit(request) is not job, "finished jobs are not reused"
+        await service.jobs.stop()
+
+    asyncio.run(run_job())
+    service.close()
+    print("✅ generation jobs")
+
+def test_chunked_generation():
+    import hashlib
+    import re
+    import time
+
+    class ChunkGemini(FakeGemini):
+        """
+        Answers each prompt with its requested count. Like a low-temperature
+        model, the same prompt always gets the same questions, and every
+        first-round chunk also repeats one common question.
+        """
+        def _response(self, prompt):
+            self.calls.append(prompt)
+            count = int(re.search(r"exactly (\d+)", prompt).group(1))
+            key = hashlib.sha1(prompt.encode()).hexdigest()[:8]
+            items = [make_item(f"Chunk question {key}-{i}?").model_dump(mode="json") for i in range(count)]
+            if "Do NOT repeat" not in prompt:
+                items[0] = make_item("What is the same question everyone asks?").model_dump(mode="json")
+            return json.dumps(items)
+
+    gemini = ChunkGemini(delay=0.2)
+    service = new_service(gemini)
+    request = GenerateRequest(topic="nutrition", difficulty=Difficulty.EASY, count=20)
+
+    started = time.perf_counter()
+    items = asyncio.run(service.generate_mcqs(request))
+    elapsed = time.perf_counter() - started
+
+    assert len(items) == 20 and len({item.question for item in items}) == 20
+    assert len(gemini.calls) == 5, "4 chunks of 5, then one top-up for the 3 repeated questions"
+    assert len(set(gemini.calls[:4])) == 4 and all("Focus on" in prompt for prompt in gemini.calls), \
+        "concurrent chunks get different angles"
+    assert "exactly 3" in gemini.calls[-1] and "Do NOT repeat" in gemini.calls[-1]
+    assert elapsed < 0.2 * 3, f"chunks should run concurrently ({elapsed:.2f}s)"
+    assert service.split_count(12, 5) == [5, 5, 2]
+    service.close()
+    print("✅ chunked generation with top-ups")
+
+def test_near_duplicates():
+    import time
+    from mcq.similarity import NearDuplicateIndex
+
+    db = new_database()
+    db.near_duplicates = NearDuplicateIndex(threshold=0.7)
+    original = make_item("Which food is a good source of protein?")
+    report = db.store_questions([
+        original,
+        make_item("What food is a good protein source?"),
+        make_item("What food is a good protein source?", topic="sleep"),
+        make_item("How many hours of sleep do teens need each night?"),
+    ])
+    assert len(report.stored) == 3 and len(report.duplicates) == 1, "rewording on the same topic is rejected"
+    assert not db.store_question(make_item("Which food is a good protein source?")), "checked against stored questions"
+
+    # A fresh index (e.g. after a restart) loads the stored signatures
+    signature = NearDuplicateIndex.signature(make_item("Good protein sources: which food?"))
+    fresh = MCQDatabase(db.db_path)
+    fresh.near_duplicates = NearDuplicateIndex(threshold=0.7)
+    with fresh.connections.transaction() as conn:
+        fresh._load_signatures(conn, "nutrition")
+    started = time.perf_counter()
+    match = fresh.near_duplicates.find("Nutrition", signature)
+    assert match and match[0] == original.id
+    assert time.perf_counter() - started < 0.001
+
+    # Deleting a question drops its signature
+    assert db.delete_question(original.id)
+    assert db.near_duplicates.find("nutrition", signature) is None
+    assert db.store_question(make_item("Which foods are good protein sources?"))
+
+    # Questions sharing buckets are chained; removing one keeps the others findable
+    index = NearDuplicateIndex(threshold=0.7)
+    for question_id in ("a", "b", "c"):
+        index.add("nutrition", question_id, signature)
+    index.remove("b")
+    assert index.find("nutrition", signature)[0] in ("a", "c")
+    index.remove("c")
+    index.remove("a")
+    assert index.find("nutrition", signature) is None and index.get_stats()["indexed"] == 0
+    index.add("nutrition", "d", signature)
+    assert index.find("nutrition", signature) == ("d", 1.0), "freed slots are reused"
+
+    # Backfill indexes questions stored before the index existed and reports near duplicates
+    legacy = new_database()
+    legacy.store_questions([make_item("Why is breakfast important for teens?"),
+                            make_item("Why is breakfast so important for a teen?")])
+    assert legacy.backfill_signatures() == {"indexed": 0, "near_duplicates": []}, "no-op while checks are disabled"
+    legacy.near_duplicates = NearDuplicateIndex(threshold=0.7)
+    result = legacy.backfill_signatures(batch_size=1)
+    assert result["indexed"] == 2 and len(result["near_duplicates"]) == 1
+    assert legacy.backfill_signatures()["indexed"] == 0, "backfill only runs once per question"
+    print("✅ near-duplicate detection")
+
+def test_full_text_search():
+    db = new_database()
+    protein = [make_item(f"Which food is a good source of protein for athlete {i}?") for i in range(5)]
+    sleep = make_item("How many hours of sleep do teens need?", topic="sleep", difficulty=Difficulty.HARD)
+    db.store_questions(protein + [sleep])
+
+    def ids(payloads):
+        return [json.loads(payload)["id"] for payload in payloads]
+
+    # Keyset pages cover every match exactly once
+    seen, cursor = [], None
+    while True:
+        payloads, cursor = db.search_questions("proteins", limit=2, cursor=cursor)
+        seen += ids(payloads)
+        if not cursor:
+            break
+    assert sorted(seen) == sorted(item.id for item in protein), "stemmed match, paged without gaps or repeats"
+    assert "is_correct" not in db.search_questions("protein")[0][0], "only public payloads are returned"
+
+    assert ids(db.search_questions("teen* sleep", topic="sleep", difficulty=Difficulty.HARD)[0]) == [sleep.id]
+    assert db.search_questions("sleep", topic="nutrition") == ([], None)
+    assert db.search_questions('" OR ( NEAR') == ([], None), "operators in user input are not interpreted"
+
+    # The index follows deletes through the triggers
+    db.delete_question(sleep.id)
+    assert db.search_questions("sleep") == ([], None)
+
+    try:
+        db.search_questions("protein", cursor="not-a-cursor")
+        assert False, "bad cursor should raise"
+    except ValueError:
+        pass
+    print("✅ full-text search")
+
+def test_bank_import_export():
+    db = new_database()
+    items = [make_item(f"Question {i} about healthy habits?", topic=["nutrition", "sleep"][i % 2]) for i in range(7)]
+    db.store_questions(items)
+    workdir = tempfile.mkdtemp()
+
+    # Export -> import round trip, compressed, through batches smaller than the bank
+    path = os.path.join(workdir, "bank.jsonl.gz")
+    assert export_file(db, path, page_size=3) == 7
+    target = new_database()
+    report = import_file(target, path, batch_size=2)
+    assert (report.lines, report.stored, report.duplicates, report.invalid) == (7, 7, 0, 0)
+    assert target.get_question_by_id(items[3].id) == items[3], "answers and rationale survive the round trip"
+    assert import_file(target, path).duplicates == 7, "re-importing is a no-op"
+
+    sleep_path = os.path.join(workdir, "sleep.jsonl")
+    assert export_file(db, sleep_path, topic="sleep") == 3
+
+    # Invalid lines are counted and reported by line number; blank lines are skipped
+    two_correct = make_item("Which is the odd one out?").model_dump()
+    two_correct["options"][0]["is_correct"] = True
+    bad_path = os.path.join(workdir, "bad.jsonl")
+    with open(bad_path, "w") as out:
+        out.write(make_item("Is breakfast important?").model_dump_json() + "\n\n")
+        out.write("{not json\n")
+        out.write(json.dumps(two_correct) + "\n")
+        out.write(make_item("Should you stretch after exercise?").model_dump_json())  # no final newline
+    report = import_file(target, bad_path)
+    assert (report.lines, report.stored, report.invalid) == (4, 2, 2)
+    assert report.errors[0].startswith("line 3:") and report.errors[1].startswith("line 4:")
+
+    # Imported questions are moderated like generated ones
+    from mcq.moderation import MCQModerator
+    unsafe_path = os.path.join(workdir, "unsafe.jsonl")
+    unsafe = [make_item("Where can teens buy drugs?"), make_item("Is cocaine addictive?")]
+    with open(unsafe_path, "w") as out:
+        out.write(make_item("How much water should you drink?").model_dump_json() + "\n")
+        out.write(unsafe[0].model_dump_json() + "\n")
+    report = import_file(target, unsafe_path)
+    assert (report.stored, report.rejected) == (1, 1) and report.errors[0].startswith("line 2: rejected by moderation")
+    assert target.get_question_by_id(unsafe[0].id) is None
+    with open(unsafe_path, "w") as out:
+        out.write(unsafe[1].model_dump_json() + "\n")
+    report = import_file(target, unsafe_path, moderator=MCQModerator(action="flag"))
+    assert (report.stored, report.flagged) == (0, 1) and report.errors[0].startswith("line 1: flagged")
+    assert target.search_questions("cocaine") == ([], None), "flagged imports are not served"
+
+    # Gzip is detected by content, even fed a byte at a time and as concatenated members
+    payload = gzip.compress(b'{"a": 1}\n{"b"') + gzip.compress(b': 2}')
+    reader = JSONLReader()
+    lines = [line for i in range(len(payload)) for line in reader.feed(payload[i:i + 1])] + reader.close()
+    assert lines == [b'{"a": 1}', b'{"b": 2}']
+    reader = JSONLReader()
+    lines = reader.feed(b"x" * (MAX_LINE_BYTES + 10)) + reader.feed(b"yy\nok\n") + reader.close()
+    assert lines == [b"x" * MAX_LINE_BYTES, b"ok"], "over-long lines are cut off, not buffered"
+
+    # A compression bomb is rejected once it inflates past the limit, a piece at a time
+    bomb = gzip.compress(b"\n" * (64 << 20))
+    reader = JSONLReader(max_inflated_bytes=4 << 20)
+    try:
+        reader.feed(bomb)
+        assert False, "expected ValueError"
+    except ValueError as e:
+        assert "exceeds" in str(e) and reader.inflated <= 5 << 20
+    reader = JSONLReader(max_inflated_bytes=len(payload) * 10)
+    assert reader.feed(payload) + reader.close() == [b'{"a": 1}', b'{"b": 2}']
+
+    # The service streams the same format in and out
+    service = new_service(FakeGemini())
+
+    async def round_trip():
+        async def chunks():
+            with open(path, "rb") as source:
+                while True:
+                    chunk = source.read(100)
+                    if not chunk:
+                        return
+                    yield chunk
+        report = await service.import_jsonl(chunks(), batch_size=3)
+        exported = b"".join([chunk async for chunk in service.export_jsonl(compress=True, page_size=2)])
+        return report, exported
+
+    report, exported = asyncio.run(round_trip())
+    assert report.stored == 7
+
+    async def upload_bomb():
+        async def chunks():
+            yield bomb
+        try:
+            await service.import_jsonl(chunks())
+        except ValueError:
+            return True
+        return False
+
+    os.environ["MCQ_IMPORT_MAX_INFLATED_BYTES"] = str(1 << 20)
+    try:
+        assert asyncio.run(upload_bomb()), "the endpoint rejects oversized gzip uploads"
+    finally:
+        del os.environ["MCQ_IMPORT_MAX_INFLATED_BYTES"]
+    assert sorted(json.loads(line)["id"] for line in gzip.decompress(exported).splitlines()) == sorted(item.id for item in items)
+    service.close()
+    db.close()
+    target.close()
+    print("✅ bank import/export")
+
+def test_attempt_retention():
+    db = new_database()
+    assert db.get_storage_stats()["auto_vacuum"] == "incremental", "new databases can shrink"
+    items = [make_item(f"Retention question {i}?", topic=["nutrition", "sleep"][i % 2]) for i in range(4)]
+    db.store_questions(items)
+    rows = [(str(uuid.uuid4()), items[i % 4].id, "B", i % 3 != 0, f"u{i}", created_at) for i, created_at in enumerate(
+        ["2026-01-01 08:00:00"] * 3 + ["2026-01-02 23:59:59"] * 2 + ["2026-02-20 12:00:00"]
+    )]
+    db.insert_attempt_rows(rows)
+    analytics = db.get_analytics()
+    stats = db.get_question_stats([item.id for item in items])
+
+    archive_dir = tempfile.mkdtemp()
+    executor = DBExecutor(read_workers=1, write_workers=1)
+    retention = AttemptRetention(db, executor, retention_days=30, archive_dir=archive_dir, batch_size=2)
+    # A run that stopped after archiving Jan 1 but before deleting it
+    first_path, _ = retention.archive_day("2026-01-01", "2026-01-02", db.max_attempt_rowid())
+
+    result = asyncio.run(retention.run_once(today=datetime.date(2026, 2, 25)))
+    assert result["cutoff"] == "2026-01-26"
+    assert (result["days"], result["archived"], result["deleted"]) == (2, 5, 5)
+    assert [os.path.basename(path) for path in result["files"]] == ["attempts-2026-01-01.1.jsonl.gz", "attempts-2026-01-02.jsonl.gz"]
+    assert os.path.dirname(first_path) == os.path.join(archive_dir, "2026-01")
+
+    # Only the recent attempt is left, but analytics still count the archived ones
+    remaining = db.connections.connection().execute("SELECT id FROM attempts").fetchall()
+    assert remaining == [(rows[5][0],)]
+    assert db.get_analytics() == analytics
+    assert db.get_question_stats([item.id for item in items]) == stats
+    assert db.get_analytics(since="2026-01-01", until="2026-01-01")["attempt_stats"] == [("nutrition", 0, 1), ("nutrition", 1, 1), ("sleep", 1, 1)]
+
+    archived = list(iter_archive(archive_dir))
+    assert sorted(record["id"] for record in archived) == sorted(row[0] for row in rows[:5]), "parts are deduped by id"
+    assert archived[0]["topic"] == "nutrition" and archived[0]["correct"] is False
+    assert [record["created_at"][:10] for record in iter_archive(archive_dir, since="2026-01-02")] == ["2026-01-02"] * 2
+
+    assert asyncio.run(retention.run_once(today=datetime.date(2026, 2, 25)))["days"] == 0
+    # Deletes outside the retention job still update the rollups
+    assert db.delete_question(items[1].id)
+    assert sum(count for _, _, count in db.get_analytics()["attempt_stats"]) == 6 - 1
+    executor.shutdown()
+    db.close()
+    print("✅ attempt retention")
+
+def test_stream_parser():
+    from mcq.stream_parser import JSONArrayStream
+
+    elements = [{"q": 'Brackets ]} and "quotes" {[', "path": "C:\\tmp"}, {"q": "Ünïcode"}, [1, 2]]
+    text = "Here you go:\n```json\n" + json.dumps(elements + [3, "s]"]) + "\n```\n[9]"
+    for size in (1, 2, 5, len(text)):
+        stream = JSONArrayStream()
+        parsed = []
+        for start in range(0, len(text), size):
+            parsed.extend(stream.feed(text[start:start + size]))
+        assert parsed == elements, f"piece size {size}: {parsed}"
+        assert stream.done and json.loads(text[stream.start:stream.end])[:3] == elements
+
+    stream = JSONArrayStream()
+    assert stream.feed('[{"a": 1}, {oops}, {"b"') == [{"a": 1}] and stream.errors == 1
+    assert stream.feed(': 2}') == [{"b": 2}] and not stream.done
+    print("✅ streaming JSON array parser")
+
+def test_structured_generation():
+    from mcq.service import MCQ_RESPONSE_SCHEMA
+
+    item_schema = MCQ_RESPONSE_SCHEMA["items"]
+    assert "$ref" not in json.dumps(MCQ_RESPONSE_SCHEMA), "Gemini schemas can't use references"
+    assert not {"id", "topic", "difficulty"} & set(item_schema["properties"])
+    assert {"question", "options", "explanation"} <= set(item_schema["required"])
+    assert item_schema["properties"]["options"]["items"]["properties"]["is_correct"]["type"] == "boolean"
+
+    gemini = FakeGemini(batch=3)
+    service = new_service(gemini)
+    stored_after = []
+
+    async def on_item(item):
+        stored_after.append(gemini.pieces)
+
+    items, tokens = asyncio.run(service.request_mcqs("Sleep", Difficulty.HARD, 2, avoid=["Old question?"],
+                                                     on_item=on_item))
+    prompt, schema, temperature = gemini.prompts[0]
+    assert len(items) == 2 and tokens == 500, "a fenced, chunked response parses and is capped at count"
+    assert all(item.topic == "Sleep" and item.difficulty == Difficulty.HARD for item in items)
+    assert stored_after[0] < stored_after[1] < gemini.pieces, "items are handed over while still streaming"
+    assert schema is MCQ_RESPONSE_SCHEMA and temperature == service.temperature
+    assert "JSON" not in prompt and "- Old question?" in prompt
+    service.close()
+    print("✅ structured generation")
+
+def test_flagged_moderation():
+    from mcq.moderation import MCQModerator
+
+    service = new_service(FakeGemini())
+    service.moderator = MCQModerator(action="flag")
+    clean = make_item("How many servings of fruit should teens eat a day?")
+    unsafe = make_item("Which drug is cocaine made from?", difficulty=Difficulty.HARD)
+
+    stored = asyncio.run(service.store_items([clean, unsafe]))
+    assert stored == [clean], "flagged items are not returned as generated"
+    with service.db.connections.transaction() as conn:
+        flags = dict(conn.execute("SELECT id, flagged FROM questions"))
+    assert flags == {clean.id: 0, unsafe.id: 1}, "flagged items are kept for review"
+
+    # ...but never served
+    assert service.db.get_next_question("nutrition", Difficulty.HARD) is None
+    assert service.sampler.next_question_ids("nutrition", None, "u1", 5) == [clean.id]
+    assert service.db.search_questions("cocaine")[0] == []
+    assert QuestionSampler(service.db).next_question_ids(difficulty=Difficulty.HARD) == []
+
+    service.moderator = MCQModerator(action="drop")
+    dropped = make_item("Why is cocaine dangerous?")
+    assert asyncio.run(service.store_items([dropped])) == []
+    assert service.db.get_question_by_id(dropped.id) is None
+    service.close()
+    print("✅ flagged items are stored but not served")
+
+def test_coalesced_generation():
+    gemini = FakeGemini(batch=5, delay=0.1)
+    service = new_service(gemini)
+    streamed = []
+
+    async def overlapping():
+        return await asyncio.gather(
+            service.generate_mcqs(GenerateRequest(topic="Sleep", difficulty=Difficulty.EASY, count=2)),
+            service.generate_mcqs(GenerateRequest(topic=" sleep ", difficulty=Difficulty.EASY, count=5),
+                                  on_item=streamed.append),
+            service.generate_mcqs(GenerateRequest(topic="Sleep", difficulty=Difficulty.HARD, count=1)),
+        )
+
+    small, large, other = asyncio.run(overlapping())
+    assert len(gemini.calls) == 2, "same topic/difficulty share one call; other difficulty gets its own"
+    assert len(large) == 5 and small == large[:2] and len(other) == 1
+    assert streamed == large
+    assert service.coalescer.get_stats() == {"in_flight": 0, "flights": 2, "coalesced": 1}
+    service.close()
+    print("✅ coalesced generation")
+
+def test_concurrent_attempts():
+    db = new_database()
+    item = make_item("How much water should teens drink each day?")
+    db.store_question(item)
+
+    def answer(user: int):
+        for _ in range(20):
+            db.record_attempt(AttemptRequest(question_id=item.id, selected="B", user_id=f"u{user}"), True)
+            assert db.get_question_by_id(item.id) is not None
+
+    threads = [threading.Thread(target=answer, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    analytics = db.get_analytics()
+    assert analytics["attempt_stats"] == [("nutrition", 1, 80)]
+    db.close()
+    print("✅ concurrent attempts")
+
+if __name__ == "__main__":
+    test_store_and_fetch()
+    test_legacy_migrations()
+    test_bulk_store_dedup()
+    test_connection_settings()
+    test_next_question_plans()
+    test_sampler_does_not_repeat()
+    test_batch_quiz_and_attempts()
+    test_executor_lanes()
+    test_attempt_log_batches_and_replays()
+    test_analytics_rollups()
+    test_question_cache()
+    test_public_payloads()
+    test_refill_worker()
+    test_generation_jobs()
+    test_chunked_generation()
+    test_near_duplicates()
+    test_full_text_search()
+    test_bank_import_export()
+    test_attempt_retention()
+    test_stream_parser()
+    test_structured_generation()
+    test_flagged_moderation()
+    test_coalesced_generation()
+    test_concurrent_attempts()
+    print("\n🎉 MCQ database tests passed")
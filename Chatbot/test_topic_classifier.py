@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tests for the keyword topic classifier (no Gemini API key or server needed)
+Run directly or with pytest
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.topic_classifier import TopicClassifier, stem, tokenize
+
+TOPICS = {
+    'substance_abuse': ['drugs', 'alcohol', 'smoking', 'peer pressure', 'drink'],
+    'healthy_lifestyle': ['exercise', 'sports', 'habits'],
+    'hiv_prevention': ['safe', 'protection', 'safe sex'],
+    'injuries_violence': ['safety', 'bullying', 'first aid'],
+}
+
+def test_stemming():
+    assert stem("drinking") == stem("drinks") == stem("drink")
+    assert stem("feelings") == stem("feeling") == stem("feel")
+    assert stem("changes") == stem("change") and stem("classes") == stem("class")
+    assert stem("safety") != stem("safe"), "safety must not collapse onto safe"
+    assert tokenize("Don't DRINK!") == ["don't", "drink"]
+    print("✅ stemming keeps word families together and apart")
+
+def test_quoted_tokens():
+    assert tokenize("'drugs'") == tokenize("drugs")
+    assert tokenize("'' ' don't'") == ["don't"]
+    classifier = TopicClassifier(TOPICS)
+    assert classifier.classify("what are 'drugs' anyway?") == "substance_abuse"
+    print("✅ quote marks around words are trimmed")
+
+def test_classify():
+    classifier = TopicClassifier(TOPICS)
+    assert classifier.classify("Is it safe?") == "hiv_prevention"
+    assert classifier.classify("Road safety tips") == "injuries_violence"
+    assert classifier.classify("My friends keep drinking at parties") == "substance_abuse"
+    assert classifier.classify("What's the weather like?") is None
+    # Phrases weigh as many points as they have words
+    assert classifier.classify("bullying and safe sex") == "hiv_prevention"
+    print("✅ classify picks the best-scoring topic")
+
+def test_tie_breaking():
+    classifier = TopicClassifier(TOPICS)
+    # One point each: the earliest match in the message wins...
+    assert classifier.classify("sports or drugs") == "healthy_lifestyle"
+    assert classifier.classify("drugs or sports") == "substance_abuse"
+    # ...then topic order, for keywords shared by two topics
+    shared = TopicClassifier({'first': ['helmet'], 'second': ['helmet']})
+    assert shared.classify("wear a helmet") == "first"
+    print("✅ ties go to the earliest match, then topic order")
+
+def test_classify_batch():
+    classifier = TopicClassifier(TOPICS)
+    messages = ["I love sports", "", "is it safe", "first aid kit", "nothing here"]
+    assert classifier.classify_batch(messages) == [classifier.classify(message) for message in messages]
+    assert classifier.classify_batch(iter(messages)) == [
+        "healthy_lifestyle", None, "hiv_prevention", "injuries_violence", None
+    ]
+    print("✅ classify_batch matches classify")
+
+if __name__ == "__main__":
+    test_stemming()
+    test_quoted_tokens()
+    test_classify()
+    test_tie_breaking()
+    test_classify_batch()
+    print("\n🎉 Topic classifier tests passed")